@@ -0,0 +1,189 @@
+"""
+Bloom filter of the archive's (size, partial hash) keys.
+
+Most files of a phone dump are not in the archive yet. Before duplicate
+detection reads whole files that have a same-size archived file, it asks
+this filter whether a file with the same size and the same first 64 KiB is
+archived. "No" is definite, so such files skip the archive comparison (and,
+without a same-size file in the batch, all hashing). "Maybe" costs one
+exact lookup; about 1% of new files get it needlessly.
+
+The filter takes about 1.2 bytes per key and is sized for twice the
+archive's files (4.8 MB for 2M files); it is kept next to the catalog.
+Written files are added as they are recorded, with keys the executor takes
+from the bytes it copies, so it is rebuilt only when it is missing, belongs
+to an older catalog build or has more keys than it was sized for.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from itertools import islice
+import math
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Iterable
+
+from media_archiver.throttle import RateLimiter
+
+
+# File name next to the catalog.
+ARCHIVE_FILTER_NAME = "archive.bloom"
+# Bytes read from the start of a file for its key.
+PARTIAL_BYTES = 64 * 1024
+FALSE_POSITIVE_RATE = 0.01
+# Keys a new filter has room for, at least (and twice the archive's files).
+MIN_CAPACITY = 100_000
+
+_MAGIC = b"MAFILT01"
+# number of hash functions, bits, keys added, capacity, catalog generation
+_HEADER = struct.Struct("<IQQQd")
+_BUILD_BATCH = 1024
+
+
+def filter_key(size: int, head: bytes) -> bytes:
+    """Filter key of a file of `size` bytes starting with `head` (up to 64 KiB)."""
+    return size.to_bytes(8, "little") + blake2b(head[:PARTIAL_BYTES], digest_size=16).digest()
+
+
+def partial_key(path: Path, limiter: RateLimiter | None = None) -> bytes | None:
+    """Filter key of a file: its size and a hash of its first 64 KiB."""
+    try:
+        with path.open("rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            head = handle.read(PARTIAL_BYTES)
+    except OSError:
+        return None
+    if limiter is not None and head:
+        limiter.acquire(nbytes=len(head))
+    return filter_key(size, head)
+
+
+class ArchiveFilter:
+    """A Bloom filter; add() and might_contain() are safe to call from several threads."""
+
+    def __init__(
+        self,
+        capacity: int,
+        *,
+        generation: float = 0.0,
+        false_positive_rate: float = FALSE_POSITIVE_RATE,
+    ) -> None:
+        bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        self._init(
+            num_hashes=max(1, round(bits / capacity * math.log(2))),
+            bits=bytearray((bits + 7) // 8),
+            count=0,
+            capacity=capacity,
+            generation=generation,
+        )
+
+    def _init(
+        self,
+        *,
+        num_hashes: int,
+        bits: bytearray,
+        count: int,
+        capacity: int,
+        generation: float,
+    ) -> None:
+        self._num_hashes = num_hashes
+        self._bits = bits
+        self._num_bits = len(bits) * 8
+        self.count = count
+        self.capacity = capacity
+        # built_at of the catalog the filter was built from.
+        self.generation = generation
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    @property
+    def saturated(self) -> bool:
+        """More keys than planned: the false-positive rate is above target."""
+        return self.count > self.capacity
+
+    def _positions(self, key: bytes) -> list[int]:
+        digest = blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self._num_bits for index in range(self._num_hashes)]
+
+    def add(self, key: bytes) -> None:
+        positions = self._positions(key)
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+            self.dirty = True
+
+    def might_contain(self, key: bytes) -> bool:
+        """False only if `key` was never added."""
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with self._lock:
+            with temp_path.open("wb") as handle:
+                handle.write(_MAGIC)
+                handle.write(
+                    _HEADER.pack(
+                        self._num_hashes,
+                        self._num_bits,
+                        self.count,
+                        self.capacity,
+                        self.generation,
+                    )
+                )
+                handle.write(self._bits)
+            os.replace(temp_path, path)
+            self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path) -> "ArchiveFilter | None":
+        """The filter stored at `path`; None if it is missing or unreadable."""
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        if not data.startswith(_MAGIC) or len(data) < len(_MAGIC) + _HEADER.size:
+            return None
+        num_hashes, num_bits, count, capacity, generation = _HEADER.unpack_from(data, len(_MAGIC))
+        bits = bytearray(data[len(_MAGIC) + _HEADER.size:])
+        if len(bits) * 8 != num_bits:
+            return None
+        archive_filter = cls.__new__(cls)
+        archive_filter._init(
+            num_hashes=num_hashes,
+            bits=bits,
+            count=count,
+            capacity=capacity,
+            generation=generation,
+        )
+        return archive_filter
+
+
+def build_filter(
+    paths: Iterable[Path],
+    *,
+    file_count: int,
+    generation: float,
+    workers: int = 8,
+    limiter: RateLimiter | None = None,
+) -> ArchiveFilter:
+    """A filter of `paths` (reading 64 KiB of each), sized for growth."""
+    archive_filter = ArchiveFilter(
+        max(MIN_CAPACITY, 2 * file_count),
+        generation=generation,
+    )
+    iterator = iter(paths)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while batch := list(islice(iterator, _BUILD_BATCH)):
+            for key in pool.map(lambda path: partial_key(path, limiter), batch):
+                if key is not None:
+                    archive_filter.add(key)
+    return archive_filter
@@ -0,0 +1,275 @@
+"""
+asyncio driver for the staged pipeline.
+
+Runs the same stage functions as pipeline.StagedPipeline, but schedules
+them as tasks: blocking filesystem calls are offloaded to a bounded thread
+pool and every stage is limited by its own semaphore. SIGINT stops the
+intake of new files cooperatively; work already handed to the executor is
+finished, so the report only contains completed, consistent entries.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import signal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from media_archiver.catalog import ArchiveCatalog
+from media_archiver.config import AppConfig, SourceConfig
+from media_archiver.pipeline import (
+    DecisionExecutor,
+    PipelineResult,
+    Planner,
+    ResolvedFile,
+    ResultSink,
+    resolve_file,
+)
+from media_archiver.profiling import StageProfiler
+from media_archiver.progress import Progress
+from media_archiver.reporter import ExecutionResult
+from media_archiver.scanner import FileInfo
+from media_archiver.sorter import SortDecision
+from media_archiver.sources import SourceScanner, source_roots
+from media_archiver.telemetry import Telemetry
+from media_archiver.throttle import RateLimiter
+
+
+_T = TypeVar("_T")
+_SCAN_BATCH = 64
+
+
+def _next_batch(items: Iterator, size: int) -> list:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+class AsyncPipeline:
+    def __init__(
+        self,
+        *,
+        config: AppConfig,
+        apply: bool,
+        limiter: RateLimiter | None = None,
+        current_time: datetime | None = None,
+        progress: Progress | None = None,
+        telemetry: Telemetry | None = None,
+        sink: ResultSink | None = None,
+        catalog: ArchiveCatalog | None = None,
+    ) -> None:
+        self._config = config
+        self._limiter = limiter
+        self._progress = progress
+        self._telemetry = telemetry
+        self._sink = sink
+        self._planner = Planner(
+            config=config,
+            current_time=current_time if current_time is not None else datetime.now(),
+            progress=progress,
+            telemetry=telemetry,
+            catalog=catalog,
+        )
+        self._executor = DecisionExecutor(
+            config=config,
+            apply=apply,
+            limiter=limiter,
+            progress=progress,
+            telemetry=telemetry,
+            catalog=catalog,
+        )
+        options = config.pipeline
+        self._queue_size = options.queue_size
+        self._pool = ThreadPoolExecutor(
+            max_workers=options.blocking_workers,
+            thread_name_prefix="media-archiver-async",
+        )
+        self._stop: asyncio.Event | None = None
+        self._resolve_slots: asyncio.Semaphore | None = None
+        self._execute_slots: asyncio.Semaphore | None = None
+
+    def request_stop(self) -> None:
+        """Stop taking new files; in-flight work is completed."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self, sources: Iterable[SourceConfig | Path]) -> PipelineResult:
+        options = self._config.pipeline
+        self._stop = asyncio.Event()
+        self._resolve_slots = asyncio.Semaphore(options.resolve_workers)
+        self._execute_slots = asyncio.Semaphore(options.execute_workers)
+        scanner = SourceScanner(
+            sources,
+            limiter=self._limiter,
+            buffer_size=self._queue_size,
+            progress=self._progress,
+            telemetry=self._telemetry,
+        )
+        restore_signal = self._install_sigint_handler()
+        try:
+            collected = await self._drive(scanner)
+            results = [result for _, result in sorted(collected, key=lambda item: item[0])]
+            results = await self._blocking(self._executor.finish, results)
+        finally:
+            restore_signal()
+            self._executor.close()
+            self._pool.shutdown(wait=True)
+
+        return PipelineResult(
+            results=results,
+            cleanup_candidates=set(self._executor.cleanup_candidates),
+            interrupted=self._stop.is_set(),
+            sources=scanner.states,
+            deferred_errors=self._executor.deferred_errors(),
+        )
+
+    async def _blocking(self, func: Callable[..., _T], *args) -> _T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(func, *args))
+
+    async def _drive(self, scanner: SourceScanner) -> list[tuple[int, ExecutionResult]]:
+        scanned = iter(scanner)
+        resolving: deque[tuple[int, asyncio.Task]] = deque()
+        executing: set[asyncio.Task] = set()
+        collected: list[tuple[int, ExecutionResult]] = []
+        sequence = 0
+        if self._progress is not None:
+            self._progress.watch_queue("resolving", lambda: len(resolving))
+            self._progress.watch_queue("executing", lambda: len(executing))
+
+        try:
+            while not self._stop.is_set():
+                batch = await self._blocking(_next_batch, scanned, _SCAN_BATCH)
+                if not batch:
+                    break
+                for item in batch:
+                    resolving.append((sequence, asyncio.create_task(self._resolve(item))))
+                    sequence += 1
+                # Backpressure: plan in scan order once enough work is queued.
+                while len(resolving) >= self._queue_size and not self._stop.is_set():
+                    await self._plan_next(resolving, executing, collected)
+                await self._drain_executing(executing, collected, limit=self._queue_size)
+
+            while resolving and not self._stop.is_set():
+                await self._plan_next(resolving, executing, collected)
+        finally:
+            await self._blocking(scanned.close)
+            pending = [task for _, task in resolving]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            # Copies already handed to the executor always run to completion.
+            await self._drain_executing(executing, collected, limit=0)
+
+        return collected
+
+    async def _resolve(self, info: FileInfo) -> ResolvedFile | None:
+        async with self._resolve_slots:
+            resolved = await self._blocking(
+                resolve_file,
+                info,
+                self._config.paths.archive_root,
+                self._telemetry,
+            )
+        if self._progress is not None:
+            self._progress.count("resolve", "files")
+        return resolved
+
+    async def _plan_next(
+        self,
+        resolving: deque[tuple[int, asyncio.Task]],
+        executing: set[asyncio.Task],
+        collected: list[tuple[int, ExecutionResult]],
+    ) -> None:
+        sequence, task = resolving.popleft()
+        resolved = await task
+        if resolved is None:
+            return
+        decision = await self._blocking(self._planner.plan, resolved)
+        self._executor.announce(decision)
+        executing.add(
+            asyncio.create_task(
+                self._execute(sequence, decision, resolved.info.size_bytes, collected)
+            )
+        )
+
+    async def _execute(
+        self,
+        sequence: int,
+        decision: SortDecision,
+        size_bytes: int,
+        collected: list[tuple[int, ExecutionResult]],
+    ) -> None:
+        async with self._execute_slots:
+            result = await self._blocking(self._executor.execute, decision, size_bytes)
+        if self._sink is not None:
+            self._sink(result)
+        else:
+            collected.append((sequence, result))
+
+    async def _drain_executing(
+        self,
+        executing: set[asyncio.Task],
+        collected: list[tuple[int, ExecutionResult]],
+        *,
+        limit: int,
+    ) -> None:
+        while len(executing) > limit:
+            done, _ = await asyncio.wait(executing, return_when=asyncio.FIRST_COMPLETED)
+            executing.difference_update(done)
+            for task in done:
+                task.result()
+
+    def _install_sigint_handler(self) -> Callable[[], None]:
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.request_stop)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass
+        else:
+            return lambda: loop.remove_signal_handler(signal.SIGINT)
+
+        # Windows event loops have no add_signal_handler.
+        try:
+            previous = signal.signal(
+                signal.SIGINT,
+                lambda signum, frame: loop.call_soon_threadsafe(self.request_stop),
+            )
+        except ValueError:
+            # Not on the main thread: leave signal handling to the caller.
+            return lambda: None
+        return lambda: signal.signal(signal.SIGINT, previous)
+
+
+def run_async_pipeline(
+    *,
+    config: AppConfig,
+    apply: bool,
+    limiter: RateLimiter | None = None,
+    progress: Progress | None = None,
+    telemetry: Telemetry | None = None,
+    profiler: StageProfiler | None = None,
+    sink: ResultSink | None = None,
+    catalog: ArchiveCatalog | None = None,
+) -> PipelineResult:
+    pipeline = AsyncPipeline(
+        config=config,
+        apply=apply,
+        limiter=limiter,
+        progress=progress,
+        telemetry=telemetry,
+        sink=sink,
+        catalog=catalog,
+    )
+    if profiler is None:
+        return asyncio.run(pipeline.run(source_roots(config)))
+    # The stages run in the event loop's executor threads: sample all of them.
+    with profiler.stage("pipeline", all_threads=True):
+        return asyncio.run(pipeline.run(source_roots(config)))
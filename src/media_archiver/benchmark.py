@@ -0,0 +1,495 @@
+"""
+Benchmarks of the hot paths against a synthetic tree.
+
+Run with `python -m media_archiver.benchmark`. Every measurement of every
+stage runs in a fresh spawned process, so stages cannot warm each other's
+caches and the peak RSS reported for a stage is that of a process which only
+prepared and ran that stage (setup such as the scan feeding `resolve_datetime`
+is included in the RSS, not in the time). The page cache is shared, so file
+reads are warm after the tree has been generated.
+
+The end-to-end run is also broken down by the run's own telemetry
+(`run_pipeline.scan`, `run_pipeline.plan`, ...; busy time summed over the
+workers of a stage). `--output` saves a result that `--baseline` later reruns
+and compares stage by stage (see regression.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable
+
+from media_archiver.cli import run_pipeline
+from media_archiver.config import (
+    AppConfig,
+    BehaviorConfig,
+    DuplicateConfig,
+    NamingConfig,
+    PathsConfig,
+    ProgressConfig,
+    ReportingConfig,
+)
+from media_archiver.datetime_resolver import resolve_datetime
+from media_archiver.deduplicator import find_duplicates
+from media_archiver.pipeline import resolve_file, run_staged_pipeline
+from media_archiver.regression import (
+    compare_results,
+    format_comparison,
+    load_baseline,
+    regressions,
+    save_baseline,
+)
+from media_archiver.renamer import generate_filename
+from media_archiver.reporter import ReportConfig, build_report, to_json
+from media_archiver.scanner import FileInfo, scan_directories
+from media_archiver.synthetic import SIZE_DISTRIBUTIONS, SyntheticSpec, generate_tree
+
+
+STAGES = (
+    "scan_directories",
+    "resolve_datetime",
+    "generate_filename",
+    "find_duplicates",
+    "build_report",
+    "run_pipeline",
+)
+
+
+@dataclass(frozen=True)
+class StageResult:
+    name: str
+    # Files handled per repetition.
+    items: int
+    seconds: list[float]
+    peak_rss_bytes: int | None
+
+    @property
+    def median_seconds(self) -> float:
+        return statistics.median(self.seconds)
+
+    @property
+    def files_per_second(self) -> float:
+        return self.items / max(self.median_seconds, 1e-9)
+
+    def to_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "seconds": [round(value, 6) for value in self.seconds],
+            "median_seconds": round(self.median_seconds, 6),
+            "files_per_second": round(self.files_per_second, 1),
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+
+
+@dataclass(frozen=True)
+class BenchmarkRun:
+    spec: SyntheticSpec
+    repetitions: int
+    apply: bool
+    stages: list[StageResult]
+
+    def to_dict(self) -> dict:
+        return {
+            "spec": asdict(self.spec),
+            "repetitions": self.repetitions,
+            "apply": self.apply,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stages": {stage.name: stage.to_dict() for stage in self.stages},
+        }
+
+
+def _peak_rss_bytes() -> int | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _config(inbox: Path, archive: Path, reports: Path, *, dry_run: bool) -> AppConfig:
+    return AppConfig(
+        paths=PathsConfig(archive_root=archive, unsorted=inbox, report_output=reports),
+        behavior=BehaviorConfig(dry_run=dry_run, move_files=False, normalize_month_folders=True),
+        naming=NamingConfig(
+            month_format="MM_Month",
+            filename_format="YYYY-MM-DD_HH-mm-ss",
+            preserve_original_filename=False,
+        ),
+        duplicates=DuplicateConfig(detect=True, mode="report-only"),
+        reporting=ReportingConfig(markdown=True, json=True, verbose=False),
+        progress=ProgressConfig(tty=False),
+    )
+
+
+def _scanned(inbox: Path) -> list[FileInfo]:
+    return scan_directories([inbox]).supported
+
+
+# Each setup prepares the inputs of one stage (untimed) and returns the timed
+# workload. A workload returns the number of files it handled and optional
+# sub-stage timings in seconds.
+Workload = Callable[[], tuple[int, dict[str, float]]]
+
+
+def _setup_scan(inbox: Path, archive: Path, scratch: Path, apply: bool) -> Workload:
+    return lambda: (len(scan_directories([inbox]).supported), {})
+
+
+def _setup_resolve(inbox: Path, archive: Path, scratch: Path, apply: bool) -> Workload:
+    files = _scanned(inbox)
+
+    def run() -> tuple[int, dict[str, float]]:
+        for info in files:
+            resolve_datetime(
+                filename=info.name,
+                exif_datetime=None,
+                fs_modified=datetime.fromtimestamp(info.modified_timestamp),
+            )
+        return len(files), {}
+
+    return run
+
+
+def _setup_naming(inbox: Path, archive: Path, scratch: Path, apply: bool) -> Workload:
+    resolved = [resolve_file(info, archive) for info in _scanned(inbox)]
+    resolved = [item for item in resolved if item is not None]
+
+    def run() -> tuple[int, dict[str, float]]:
+        # Mirrors the Planner: one set of planned names per target folder.
+        planned: dict[Path, set[str]] = defaultdict(set)
+        for item in resolved:
+            names = planned[item.target_dir]
+            names.add(
+                generate_filename(
+                    original_name=item.info.name,
+                    resolved_datetime=item.resolution.datetime,
+                    source=item.resolution.source,
+                    existing_names=names,
+                )
+            )
+        return len(resolved), {}
+
+    return run
+
+
+def _setup_duplicates(inbox: Path, archive: Path, scratch: Path, apply: bool) -> Workload:
+    files = _scanned(inbox)
+    resolved = {}
+    for info in files:
+        item = resolve_file(info, archive)
+        if item is not None:
+            resolved[info.absolute_path] = item.resolution.datetime
+
+    def run() -> tuple[int, dict[str, float]]:
+        find_duplicates(files=files, resolved_datetimes=resolved)
+        return len(files), {}
+
+    return run
+
+
+def _setup_report(inbox: Path, archive: Path, scratch: Path, apply: bool) -> Workload:
+    config = _config(inbox, archive, scratch / "reports", dry_run=True)
+    results = run_staged_pipeline(config=config, apply=False).results
+
+    def run() -> tuple[int, dict[str, float]]:
+        report = build_report(
+            results=results,
+            config=ReportConfig(dry_run=True, move_files=False),
+            timestamp="2000-01-01_00-00-00",
+        )
+        to_json(report)
+        return len(results), {}
+
+    return run
+
+
+def _setup_pipeline(inbox: Path, archive: Path, scratch: Path, apply: bool) -> Workload:
+    if apply:
+        # Copy mode into a private copy of the archive, so every repetition
+        # starts from the same state and the inbox is never touched.
+        target = scratch / "archive"
+        shutil.copytree(archive, target)
+        archive = target
+    config = _config(inbox, archive, scratch / "reports", dry_run=not apply)
+    files = len(_scanned(inbox))
+
+    def run() -> tuple[int, dict[str, float]]:
+        _, json_path = run_pipeline(config, apply=apply)
+        # The run's own telemetry attributes the end-to-end time to stages.
+        summary = json.loads(json_path.read_text(encoding="utf-8"))["summary"]
+        stages = summary.get("timings", {}).get("stage", {})
+        return files, {name: values["seconds"] for name, values in stages.items()}
+
+    return run
+
+
+_SETUPS = {
+    "scan_directories": _setup_scan,
+    "resolve_datetime": _setup_resolve,
+    "generate_filename": _setup_naming,
+    "find_duplicates": _setup_duplicates,
+    "build_report": _setup_report,
+    "run_pipeline": _setup_pipeline,
+}
+
+
+def _measure(
+    stage: str,
+    inbox: Path,
+    archive: Path,
+    scratch: Path,
+    apply: bool,
+) -> tuple[float, int, int | None, dict[str, float]]:
+    """Runs in the spawned process: (seconds, items, peak RSS bytes, sub-stages)."""
+    scratch.mkdir(parents=True)
+    workload = _SETUPS[stage](inbox, archive, scratch, apply)
+    start = time.perf_counter()
+    items, parts = workload()
+    seconds = time.perf_counter() - start
+    return seconds, items, _peak_rss_bytes(), parts
+
+
+def run_benchmarks(
+    spec: SyntheticSpec,
+    *,
+    workdir: Path | None = None,
+    stages: tuple[str, ...] = STAGES,
+    repetitions: int = 1,
+    apply: bool = False,
+) -> BenchmarkRun:
+    """
+    Generate `spec` and measure `stages`, each `repetitions` times.
+
+    The tree is generated below `workdir` (which must not contain one yet) and
+    kept there; without a workdir a temporary directory is used and removed.
+    """
+    unknown = set(stages) - set(_SETUPS)
+    if unknown:
+        raise ValueError(f"unknown benchmark stages: {sorted(unknown)}")
+    if repetitions < 1:
+        raise ValueError("repetitions must be >= 1")
+
+    temporary = workdir is None
+    root = Path(tempfile.mkdtemp(prefix="media-archiver-bench-")) if temporary else workdir
+    try:
+        tree = generate_tree(spec, root / "tree")
+        results: list[StageResult] = []
+        context = get_context("spawn")
+        for stage in stages:
+            seconds: list[float] = []
+            parts: dict[str, list[float]] = {}
+            items = 0
+            peak_rss: int | None = None
+            for repetition in range(repetitions):
+                scratch = root / "scratch" / f"{stage}_{repetition}"
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    elapsed, items, rss, breakdown = pool.submit(
+                        _measure, stage, tree.inbox, tree.archive, scratch, apply
+                    ).result()
+                shutil.rmtree(scratch, ignore_errors=True)
+                seconds.append(elapsed)
+                for name, value in breakdown.items():
+                    parts.setdefault(name, []).append(value)
+                if rss is not None:
+                    peak_rss = max(peak_rss or 0, rss)
+            results.append(
+                StageResult(name=stage, items=items, seconds=seconds, peak_rss_bytes=peak_rss)
+            )
+            # Sub-stages (e.g. run_pipeline.plan) present in every repetition.
+            for name, values in sorted(parts.items()):
+                if len(values) == repetitions:
+                    results.append(
+                        StageResult(
+                            name=f"{stage}.{name}",
+                            items=items,
+                            seconds=values,
+                            peak_rss_bytes=None,
+                        )
+                    )
+        return BenchmarkRun(spec=spec, repetitions=repetitions, apply=apply, stages=results)
+    finally:
+        if temporary:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def format_table(run: BenchmarkRun) -> str:
+    lines = [
+        f"{'stage':<24} {'files':>8} {'median s':>10} {'files/s':>12} {'peak RSS MB':>12}",
+    ]
+    for stage in run.stages:
+        rss = "-" if stage.peak_rss_bytes is None else f"{stage.peak_rss_bytes / 2**20:.1f}"
+        lines.append(
+            f"{stage.name:<24} {stage.items:>8} {stage.median_seconds:>10.4f} "
+            f"{stage.files_per_second:>12.1f} {rss:>12}"
+        )
+    return "\n".join(lines)
+
+
+def _parse_pattern_mix(value: str) -> tuple[tuple[str, int], ...]:
+    # "camera=5,whatsapp=2,plain=1"
+    mix = []
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix.append((name.strip(), int(weight or 1)))
+    return tuple(mix)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    defaults = SyntheticSpec()
+    parser = argparse.ArgumentParser(
+        prog="python -m media_archiver.benchmark",
+        description="Benchmark media-archiver stages on a deterministic synthetic tree",
+    )
+    parser.add_argument("--files", type=int, default=defaults.files)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument(
+        "--size-distribution",
+        choices=sorted(SIZE_DISTRIBUTIONS),
+        default=defaults.size_distribution,
+    )
+    parser.add_argument("--mean-size", type=int, default=defaults.mean_size)
+    parser.add_argument("--max-size", type=int, default=defaults.max_size)
+    parser.add_argument(
+        "--pattern-mix",
+        type=_parse_pattern_mix,
+        default=defaults.pattern_mix,
+        help="Weights per filename pattern, e.g. camera=5,video=1,whatsapp=2,dashed=1,plain=1",
+    )
+    parser.add_argument("--duplicate-ratio", type=float, default=defaults.duplicate_ratio)
+    parser.add_argument("--burst-ratio", type=float, default=defaults.burst_ratio)
+    parser.add_argument("--burst-size", type=int, default=defaults.burst_size)
+    parser.add_argument("--folders", type=int, default=defaults.folders)
+    parser.add_argument("--archive-files", type=int, default=defaults.archive_files)
+    parser.add_argument("--archived-ratio", type=float, default=defaults.archived_ratio)
+    parser.add_argument(
+        "--stage",
+        action="append",
+        choices=STAGES,
+        dest="stages",
+        help="Stage to run (repeatable); default: all",
+    )
+    parser.add_argument(
+        "--repetitions",
+        type=int,
+        help="Runs per stage; the median is reported (default: 1, or the baseline's)",
+    )
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Let run_pipeline copy into a scratch copy of the archive instead of a dry run",
+    )
+    parser.add_argument("--workdir", type=Path, help="Keep the generated tree here")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Write the results as JSON (usable as a baseline)",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        help="Rerun the baseline's spec and stages and fail on regressions",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=10.0,
+        help="Allowed slowdown of a stage's median in percent (default: 10)",
+    )
+    parser.add_argument(
+        "--noise-floor",
+        type=float,
+        default=0.01,
+        help="Changes below this many seconds are treated as noise (default: 0.01)",
+    )
+    return parser.parse_args(argv)
+
+
+def spec_from_args(args: argparse.Namespace) -> SyntheticSpec:
+    return SyntheticSpec(
+        files=args.files,
+        seed=args.seed,
+        size_distribution=args.size_distribution,
+        mean_size=args.mean_size,
+        max_size=args.max_size,
+        pattern_mix=args.pattern_mix,
+        duplicate_ratio=args.duplicate_ratio,
+        burst_ratio=args.burst_ratio,
+        burst_size=args.burst_size,
+        folders=args.folders,
+        archive_files=args.archive_files,
+        archived_ratio=args.archived_ratio,
+    )
+
+
+def spec_from_dict(values: dict) -> SyntheticSpec:
+    values = dict(values)
+    values["pattern_mix"] = tuple(tuple(pair) for pair in values["pattern_mix"])
+    return SyntheticSpec(**values)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    try:
+        baseline = None
+        spec = spec_from_args(args)
+        stages = tuple(args.stages or STAGES)
+        repetitions = args.repetitions or 1
+        apply = args.apply
+        if args.baseline is not None:
+            # Only a run of the same workload is comparable.
+            baseline = load_baseline(args.baseline)
+            spec = spec_from_dict(baseline["spec"])
+            stages = tuple(name for name in baseline["stages"] if name in STAGES)
+            repetitions = args.repetitions or baseline["repetitions"]
+            apply = baseline["apply"]
+        run = run_benchmarks(
+            spec,
+            workdir=args.workdir,
+            stages=stages,
+            repetitions=repetitions,
+            apply=apply,
+        )
+    except (ValueError, KeyError, TypeError, OSError) as exc:
+        print(f"Benchmark error: {exc}", file=sys.stderr)
+        return 2
+
+    print(format_table(run))
+    if args.output is not None:
+        save_baseline(args.output, run.to_dict())
+    if baseline is None:
+        return 0
+
+    comparisons = compare_results(
+        baseline,
+        run.to_dict(),
+        max_regression_percent=args.max_regression,
+        noise_floor_seconds=args.noise_floor,
+    )
+    print()
+    print(format_comparison(comparisons))
+    failed = regressions(comparisons)
+    if failed:
+        names = ", ".join(item.stage for item in failed)
+        print(f"Performance regression in: {names}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
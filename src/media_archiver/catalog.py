@@ -0,0 +1,807 @@
+"""
+Persistent catalog of the files already in the archive.
+
+One SQLite row per archived file: path (relative to the archive root), size,
+mtime, inode, content hash (computed lazily, on first use) and the resolved
+capture datetime with its source and confidence. The executor records every
+file it writes, so the catalog stays current without walking the archive;
+when the catalog is missing it is rebuilt by walking the year folders in
+parallel.
+
+Lookups by target path go through a per-directory name set that is loaded
+once per directory and run. Before a directory is trusted its mtime is
+compared with the one recorded in the catalog: files added or removed behind
+the tool's back change it, and such a directory is re-read and corrected.
+So planning costs one stat per target directory instead of one per file.
+
+Dry runs open the catalog read-only: corrected listings are kept in memory
+for the run, and neither the catalog nor the archive filter is written.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from hashlib import sha256
+from itertools import chain
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path, PurePosixPath
+from typing import Iterable, Iterator
+
+from media_archiver.archive_filter import ArchiveFilter, build_filter, partial_key
+from media_archiver.datetime_resolver import resolve_datetime
+from media_archiver.models import ConfidenceLevel, DateTimeResolution, DateTimeSource
+from media_archiver.telemetry import Telemetry, measure
+from media_archiver.throttle import RateLimiter
+
+
+# Relative to the archive root; hidden entries are never catalogued.
+DEFAULT_CATALOG_PATH = Path(".media-archiver") / "catalog.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    content_hash TEXT,
+    hashed_at REAL,
+    capture_datetime TEXT,
+    datetime_source TEXT,
+    confidence TEXT
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files(directory);
+CREATE INDEX IF NOT EXISTS files_size ON files(size_bytes);
+CREATE INDEX IF NOT EXISTS files_content_hash ON files(content_hash);
+CREATE INDEX IF NOT EXISTS files_hashed_at ON files(hashed_at, path);
+CREATE INDEX IF NOT EXISTS files_capture_datetime ON files(capture_datetime, path);
+CREATE INDEX IF NOT EXISTS files_datetime_source ON files(datetime_source, capture_datetime);
+CREATE INDEX IF NOT EXISTS files_confidence ON files(confidence, capture_datetime);
+CREATE INDEX IF NOT EXISTS files_extension ON files(extension, capture_datetime);
+"""
+
+_UPSERT = (
+    "INSERT INTO files (path, directory, name, extension, size_bytes, mtime_ns, inode, "
+    "content_hash, hashed_at, capture_datetime, datetime_source, confidence) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(path) DO UPDATE SET directory = excluded.directory, name = excluded.name, "
+    "extension = excluded.extension, size_bytes = excluded.size_bytes, "
+    "mtime_ns = excluded.mtime_ns, inode = excluded.inode, "
+    "content_hash = excluded.content_hash, hashed_at = excluded.hashed_at, "
+    "capture_datetime = excluded.capture_datetime, "
+    "datetime_source = excluded.datetime_source, confidence = excluded.confidence"
+)
+_FILE_COLUMNS = (
+    "path, size_bytes, mtime_ns, inode, content_hash, hashed_at, capture_datetime, "
+    "datetime_source, confidence"
+)
+
+# Pending rows written at once.
+_BATCH_ROWS = 1000
+_HASH_CHUNK_BYTES = 1024 * 1024
+# Names written by the renamer: YYYY-MM-DD_HH-mm-ss[_NN].ext
+_CANONICAL_NAME = re.compile(r"^(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})(?:_\d+)?\.[^.]+$")
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    # Relative to the archive root, with "/" separators.
+    path: str
+    size_bytes: int
+    mtime_ns: int
+    inode: int
+    content_hash: str | None = None
+    # Wall-clock time the content hash was computed or last verified.
+    hashed_at: float | None = None
+    capture_datetime: datetime | None = None
+    datetime_source: DateTimeSource | None = None
+    confidence: ConfidenceLevel | None = None
+
+
+@dataclass(frozen=True)
+class CatalogQuery:
+    # Capture datetime range: captured_from <= datetime < captured_before.
+    captured_from: datetime | None = None
+    captured_before: datetime | None = None
+    # Each non-empty tuple matches any of its values.
+    sources: tuple[DateTimeSource, ...] = ()
+    confidences: tuple[ConfidenceLevel, ...] = ()
+    # Lowercase, with the dot: ".mp4"
+    extensions: tuple[str, ...] = ()
+    min_size: int | None = None
+    max_size: int | None = None
+    limit: int | None = None
+
+
+def _entry_from_row(row: tuple) -> CatalogEntry:
+    path, size, mtime_ns, inode, content_hash, hashed_at, captured, source, confidence = row
+    return CatalogEntry(
+        path=path,
+        size_bytes=size,
+        mtime_ns=mtime_ns,
+        inode=inode,
+        content_hash=content_hash,
+        hashed_at=hashed_at,
+        capture_datetime=datetime.fromisoformat(captured) if captured else None,
+        datetime_source=DateTimeSource(source) if source else None,
+        confidence=ConfidenceLevel(confidence) if confidence else None,
+    )
+
+
+def _row(entry: CatalogEntry) -> tuple:
+    relative = PurePosixPath(entry.path)
+    directory = relative.parent.as_posix()
+    return (
+        entry.path,
+        "" if directory == "." else directory,
+        relative.name,
+        relative.suffix.lower(),
+        entry.size_bytes,
+        entry.mtime_ns,
+        entry.inode,
+        entry.content_hash,
+        entry.hashed_at,
+        entry.capture_datetime.isoformat() if entry.capture_datetime else None,
+        entry.datetime_source.value if entry.datetime_source else None,
+        entry.confidence.value if entry.confidence else None,
+    )
+
+
+def archived_resolution(name: str, mtime: float) -> DateTimeResolution:
+    """Capture datetime of a file found in the archive, from its canonical name."""
+    match = _CANONICAL_NAME.match(name)
+    if match:
+        return DateTimeResolution(
+            datetime=datetime.strptime(match.group(1), "%Y-%m-%d_%H-%M-%S"),
+            source=DateTimeSource.FILENAME,
+            confidence=ConfidenceLevel.MEDIUM,
+        )
+    return resolve_datetime(
+        filename=name,
+        exif_datetime=None,
+        fs_modified=datetime.fromtimestamp(mtime),
+    )
+
+
+def _entry_from_stat(
+    relative: str,
+    stat_result: os.stat_result,
+    resolution: DateTimeResolution | None,
+    content_hash: str | None = None,
+) -> CatalogEntry:
+    if resolution is None:
+        resolution = archived_resolution(PurePosixPath(relative).name, stat_result.st_mtime)
+    return CatalogEntry(
+        path=relative,
+        size_bytes=stat_result.st_size,
+        mtime_ns=stat_result.st_mtime_ns,
+        inode=stat_result.st_ino,
+        content_hash=content_hash,
+        hashed_at=time.time() if content_hash else None,
+        capture_datetime=resolution.datetime,
+        datetime_source=resolution.source,
+        confidence=resolution.confidence,
+    )
+
+
+def _read_directory(
+    directory: Path,
+    relative: str,
+) -> tuple[int, list[CatalogEntry], list[tuple[Path, str]]]:
+    """(directory mtime, file entries, subdirectories) of one archive directory."""
+    entries: list[CatalogEntry] = []
+    subdirectories: list[tuple[Path, str]] = []
+    mtime_ns = directory.stat().st_mtime_ns
+    with os.scandir(directory) as iterator:
+        for item in iterator:
+            if item.name.startswith("."):
+                continue
+            child = f"{relative}/{item.name}" if relative else item.name
+            try:
+                if item.is_dir(follow_symlinks=False):
+                    subdirectories.append((Path(item.path), child))
+                elif item.is_file(follow_symlinks=False):
+                    entries.append(_entry_from_stat(child, item.stat(), None))
+            except OSError:
+                continue
+    return mtime_ns, entries, subdirectories
+
+
+def _name_key(name: str) -> str:
+    # On Windows "IMG_1.JPG" and "img_1.jpg" are the same file, as they are
+    # for the renamer's collision check.
+    return os.path.normcase(name)
+
+
+def _file_names(directory: Path) -> set[str]:
+    """Names of the files _read_directory() would catalog, without stat calls."""
+    with os.scandir(directory) as iterator:
+        return {
+            item.name
+            for item in iterator
+            if not item.name.startswith(".") and item.is_file(follow_symlinks=False)
+        }
+
+
+def _walk(directory: Path, relative: str) -> list[tuple[str, int, list[CatalogEntry]]]:
+    """Every directory below `directory` with its mtime and files."""
+    found: list[tuple[str, int, list[CatalogEntry]]] = []
+    pending = [(directory, relative)]
+    while pending:
+        path, name = pending.pop()
+        try:
+            mtime_ns, entries, subdirectories = _read_directory(path, name)
+        except OSError:
+            continue
+        found.append((name, mtime_ns, entries))
+        pending.extend(subdirectories)
+    return found
+
+
+class ArchiveCatalog:
+    """
+    The catalog of one archive root; safe to share between threads.
+
+    Writes are buffered and committed in batches and by flush()/close().
+    A `read_only` catalog must exist; refreshed listings are kept in
+    memory and computed hashes are not stored.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        archive_root: Path,
+        *,
+        telemetry: Telemetry | None = None,
+        read_only: bool = False,
+    ) -> None:
+        self.path = path
+        self.archive_root = archive_root
+        self.read_only = read_only
+        self._telemetry = telemetry
+        if read_only:
+            self._connection = _connect_read_only(path, check_same_thread=False)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                str(path), timeout=30.0, isolation_level=None, check_same_thread=False
+            )
+            self._connection.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        # Bloom filter of (size, partial hash) keys, kept current by record().
+        self.archive_filter: ArchiveFilter | None = None
+        self._filter_path: Path | None = None
+        self._names: dict[str, set[str]] = {}
+        self._pending: list[tuple] = []
+        self._touched: set[str] = set()
+
+    def __enter__(self) -> "ArchiveCatalog":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def built(self) -> bool:
+        """False until a complete rebuild has been committed."""
+        return self.built_at is not None
+
+    @property
+    def built_at(self) -> float | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'built_at'"
+            ).fetchone()
+        return float(row[0]) if row is not None else None
+
+    def use_filter(self, path: Path, *, workers: int = 8, limiter: RateLimiter | None = None) -> None:
+        """
+        Load the archive filter stored at `path`, or build it when it is
+        missing, saturated or from another catalog build. Saved whenever
+        catalog rows are committed. A read-only catalog uses a current
+        filter only and never builds one.
+        """
+        built_at = self.built_at or 0.0
+        archive_filter = ArchiveFilter.load(path)
+        if (
+            archive_filter is None
+            or archive_filter.saturated
+            or archive_filter.generation != built_at
+        ):
+            if self.read_only:
+                return
+            with self._lock:
+                self._flush_locked()
+                file_count = self._connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            with measure(self._telemetry, "catalog.build_filter"):
+                archive_filter = build_filter(
+                    (self.archive_root / relative for relative in self.verification_order()),
+                    file_count=file_count,
+                    generation=built_at,
+                    workers=workers,
+                    limiter=limiter,
+                )
+            archive_filter.save(path)
+        self.archive_filter = archive_filter
+        self._filter_path = path
+
+    def relative(self, path: Path) -> str | None:
+        """Catalog key of `path`; None outside the archive root."""
+        try:
+            return path.relative_to(self.archive_root).as_posix()
+        except ValueError:
+            return None
+
+    def rebuild(self, *, workers: int = 8) -> int:
+        """Walk the archive (one worker per top-level folder) and replace all rows."""
+        try:
+            top = _read_directory(self.archive_root, "")
+        except FileNotFoundError:
+            top = (0, [], [])
+        mtime_ns, root_entries, subdirectories = top
+        count = 0
+        with self._lock, measure(self._telemetry, "catalog.rebuild"):
+            self._flush_locked()
+            self._names.clear()
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ("files", "directories", "meta"):
+                    self._connection.execute(f"DELETE FROM {table}")
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    # Each top-level folder is inserted as soon as its walk completes.
+                    walks = pool.map(lambda item: _walk(*item), subdirectories)
+                    for batch in chain([[("", mtime_ns, root_entries)]], walks):
+                        for relative, directory_mtime, entries in batch:
+                            self._connection.execute(
+                                "INSERT INTO directories (path, mtime_ns) VALUES (?, ?)",
+                                (relative, directory_mtime),
+                            )
+                            self._connection.executemany(_UPSERT, [_row(e) for e in entries])
+                            count += len(entries)
+                self._connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('built_at', ?)", (str(time.time()),)
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return count
+
+    def names_in(self, directory: Path) -> set[str]:
+        """
+        Names of the files in an archive directory, case-folded where the
+        platform's file names are case-insensitive (do not modify).
+        """
+        relative = self.relative(directory)
+        if relative is None:
+            raise ValueError(f"not inside the archive: {directory}")
+        relative = "" if relative == "." else relative
+        with self._lock:
+            names = self._names.get(relative)
+            if names is None:
+                names = {_name_key(name) for name in self._load_directory(directory, relative)}
+                self._names[relative] = names
+            return names
+
+    def contains(self, path: Path) -> bool:
+        """Whether `path` exists; the filesystem is asked for paths outside the archive."""
+        if self.relative(path) is None:
+            return path.exists()
+        return _name_key(path.name) in self.names_in(path.parent)
+
+    def forget(self, directories: Iterable[Path]) -> None:
+        """Drop cached directory listings, e.g. after another host wrote there."""
+        with self._lock:
+            for directory in directories:
+                relative = self.relative(directory)
+                if relative is not None:
+                    self._names.pop("" if relative == "." else relative, None)
+
+    def record(
+        self,
+        path: Path,
+        *,
+        resolution: DateTimeResolution | None = None,
+        content_hash: str | None = None,
+        filter_key: bytes | None = None,
+    ) -> None:
+        """
+        Add or update the file just written at `path`. Its archive filter key
+        is read from the file unless the writer passes `filter_key`.
+        """
+        relative = self.relative(path)
+        if relative is None:
+            return
+        try:
+            with measure(self._telemetry, "fs.stat"):
+                stat_result = path.stat()
+        except OSError:
+            # Unknown state: the directory is read again on its next lookup.
+            self._invalidate(PurePosixPath(relative).parent.as_posix())
+            raise
+        entry = _entry_from_stat(relative, stat_result, resolution, content_hash)
+        if filter_key is None:
+            self._add_to_filter([path])
+        elif self.archive_filter is not None:
+            self.archive_filter.add(filter_key)
+        row = _row(entry)
+        with self._lock:
+            self._pending.append(row)
+            self._touched.add(row[1])
+            names = self._names.get(row[1])
+            if names is not None:
+                names.add(_name_key(row[2]))
+            if len(self._pending) >= _BATCH_ROWS:
+                self._flush_locked()
+
+    def get(self, path: Path | str) -> CatalogEntry | None:
+        relative = path if isinstance(path, str) else self.relative(path)
+        if relative is None:
+            return None
+        with self._lock:
+            self._flush_locked()
+            row = self._connection.execute(
+                f"SELECT {_FILE_COLUMNS} FROM files WHERE path = ?", (relative,)
+            ).fetchone()
+        return _entry_from_row(row) if row is not None else None
+
+    def with_size(self, size_bytes: int) -> list[CatalogEntry]:
+        with self._lock:
+            self._flush_locked()
+            rows = self._connection.execute(
+                f"SELECT {_FILE_COLUMNS} FROM files WHERE size_bytes = ? ORDER BY path",
+                (size_bytes,),
+            ).fetchall()
+        return [_entry_from_row(row) for row in rows]
+
+    def content_hash(self, entry: CatalogEntry, limiter: RateLimiter | None = None) -> str | None:
+        """
+        The entry's SHA-256, computed and stored on first use. A stored hash
+        is recomputed when the file's size or mtime no longer match.
+        """
+        path = self.archive_root / entry.path
+        try:
+            stat_result = path.stat()
+        except OSError:
+            return None
+        unchanged = (
+            stat_result.st_size == entry.size_bytes and stat_result.st_mtime_ns == entry.mtime_ns
+        )
+        if entry.content_hash is not None and unchanged:
+            return entry.content_hash
+        with measure(self._telemetry, "fs.hash"):
+            content_hash = hash_file(path, limiter)
+        if content_hash is not None:
+            self.store_hash(entry.path, content_hash, stat_result)
+        return content_hash
+
+    def store_hash(self, path: str, content_hash: str, stat_result: os.stat_result) -> None:
+        """Store a hash just read from the file at relative `path`, verified now."""
+        if self.read_only:
+            return
+        with self._lock:
+            self._flush_locked()
+            self._connection.execute(
+                "UPDATE files SET content_hash = ?, hashed_at = ?, size_bytes = ?, "
+                "mtime_ns = ?, inode = ? WHERE path = ?",
+                (
+                    content_hash,
+                    time.time(),
+                    stat_result.st_size,
+                    stat_result.st_mtime_ns,
+                    stat_result.st_ino,
+                    path,
+                ),
+            )
+
+    def verification_order(self) -> Iterator[str]:
+        """Relative paths, never hashed first, then longest since last verified."""
+        self.flush()
+        connection = _connect_read_only(self.path)
+        try:
+            # NULLs sort first: files never hashed come before all others.
+            cursor = connection.execute("SELECT path FROM files ORDER BY hashed_at, path")
+            while rows := cursor.fetchmany(_BATCH_ROWS):
+                for (path,) in rows:
+                    yield path
+        finally:
+            connection.close()
+
+    def totals(self, prefix: str) -> tuple[int, int]:
+        """(files, bytes) below the relative folder `prefix`, e.g. "2019"."""
+        with self._lock:
+            self._flush_locked()
+            files, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM files "
+                "WHERE directory = ? OR (directory >= ? AND directory < ?)",
+                (prefix, f"{prefix}/", f"{prefix}0"),
+            ).fetchone()
+        return files, size
+
+    def entries(self) -> Iterator[CatalogEntry]:
+        """All entries in path order."""
+        with self._lock:
+            self._flush_locked()
+            rows = self._connection.execute(
+                f"SELECT {_FILE_COLUMNS} FROM files ORDER BY path"
+            ).fetchall()
+        for row in rows:
+            yield _entry_from_row(row)
+
+    def flush(self) -> None:
+        if self.read_only:
+            return
+        with self._lock:
+            self._flush_locked()
+            self._record_directory_mtimes()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is None:
+                return
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        self._save_filter()
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._connection.executemany(_UPSERT, rows)
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def _save_filter(self) -> None:
+        # Saved before the rows are committed: after a crash the filter may
+        # hold keys of uncommitted rows (a harmless "maybe"), never miss
+        # committed ones.
+        if self.archive_filter is not None and self.archive_filter.dirty:
+            self.archive_filter.save(self._filter_path)
+
+    def _add_to_filter(self, paths: Iterable[Path]) -> None:
+        if self.archive_filter is None:
+            return
+        for path in paths:
+            with measure(self._telemetry, "fs.partial_hash"):
+                key = partial_key(path)
+            if key is not None:
+                self.archive_filter.add(key)
+
+    def _invalidate(self, relative: str) -> None:
+        relative = "" if relative == "." else relative
+        with self._lock:
+            self._names.pop(relative, None)
+            if not self.read_only:
+                self._connection.execute("DELETE FROM directories WHERE path = ?", (relative,))
+
+    def _record_directory_mtimes(self) -> None:
+        # A directory's new mtime is only recorded when its listing is exactly
+        # the catalogued files: a file another tool added after our writes,
+        # or one we wrote but failed to record, leaves the old mtime in place,
+        # so the next lookup re-reads the directory.
+        touched, self._touched = self._touched, set()
+        stale: list[tuple[str]] = []
+        current: list[tuple[str, int]] = []
+        for relative in sorted(touched):
+            directory = self.archive_root / relative
+            try:
+                # Stat before listing: a later change leaves the mtime behind.
+                mtime_ns = directory.stat().st_mtime_ns
+                names = _file_names(directory)
+            except OSError:
+                stale.append((relative,))
+                continue
+            rows = self._connection.execute(
+                "SELECT name FROM files WHERE directory = ?", (relative,)
+            ).fetchall()
+            if names == {name for (name,) in rows}:
+                current.append((relative, mtime_ns))
+            else:
+                stale.append((relative,))
+                self._names.pop(relative, None)
+        self._connection.executemany("DELETE FROM directories WHERE path = ?", stale)
+        self._connection.executemany(
+            "INSERT INTO directories (path, mtime_ns) VALUES (?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+            current,
+        )
+
+    def _load_directory(self, directory: Path, relative: str) -> set[str]:
+        try:
+            with measure(self._telemetry, "fs.stat"):
+                mtime_ns = directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            return set()
+        self._flush_locked()
+        recorded = self._connection.execute(
+            "SELECT mtime_ns FROM directories WHERE path = ?", (relative,)
+        ).fetchone()
+        if recorded is not None and recorded[0] == mtime_ns:
+            rows = self._connection.execute(
+                "SELECT name FROM files WHERE directory = ?", (relative,)
+            ).fetchall()
+            return {name for (name,) in rows}
+        return self._refresh_directory(directory, relative)
+
+    def _refresh_directory(self, directory: Path, relative: str) -> set[str]:
+        """Re-read a directory changed outside the tool and correct its rows."""
+        if self._telemetry is not None:
+            self._telemetry.count("catalog_refreshed_directories")
+        with measure(self._telemetry, "catalog.refresh"):
+            mtime_ns, entries, _ = _read_directory(directory, relative)
+        names = {PurePosixPath(entry.path).name for entry in entries}
+        if self.read_only:
+            # Kept for this run only; a later apply run corrects the rows.
+            return names
+        known = {
+            path: (size, file_mtime, inode)
+            for path, size, file_mtime, inode in self._connection.execute(
+                "SELECT path, size_bytes, mtime_ns, inode FROM files WHERE directory = ?",
+                (relative,),
+            )
+        }
+        # Unchanged files keep their stored hash and datetime.
+        changed = [
+            _row(entry)
+            for entry in entries
+            if known.get(entry.path) != (entry.size_bytes, entry.mtime_ns, entry.inode)
+        ]
+        self._add_to_filter(self.archive_root / row[0] for row in changed)
+        present = {entry.path for entry in entries}
+        self._save_filter()
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._connection.executemany(_UPSERT, changed)
+            self._connection.executemany(
+                "DELETE FROM files WHERE path = ?",
+                [(path,) for path in known if path not in present],
+            )
+            self._connection.execute(
+                "INSERT INTO directories (path, mtime_ns) VALUES (?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+                (relative, mtime_ns),
+            )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        return names
+
+
+def _connect_read_only(path: Path, *, check_same_thread: bool = True) -> sqlite3.Connection:
+    return sqlite3.connect(
+        f"{path.resolve().as_uri()}?mode=ro",
+        uri=True,
+        timeout=30.0,
+        isolation_level=None,
+        check_same_thread=check_same_thread,
+    )
+
+
+def _where(query: CatalogQuery) -> tuple[str, list]:
+    clauses: list[str] = []
+    values: list = []
+    if query.captured_from is not None:
+        clauses.append("capture_datetime >= ?")
+        values.append(query.captured_from.isoformat())
+    if query.captured_before is not None:
+        clauses.append("capture_datetime < ?")
+        values.append(query.captured_before.isoformat())
+    for column, options in (
+        ("datetime_source", [source.value for source in query.sources]),
+        ("confidence", [confidence.value for confidence in query.confidences]),
+        ("extension", list(query.extensions)),
+    ):
+        if options:
+            clauses.append(f"{column} IN ({', '.join('?' * len(options))})")
+            values.extend(options)
+    if query.min_size is not None:
+        clauses.append("size_bytes >= ?")
+        values.append(query.min_size)
+    if query.max_size is not None:
+        clauses.append("size_bytes <= ?")
+        values.append(query.max_size)
+    if not clauses:
+        return "", values
+    return " WHERE " + " AND ".join(clauses), values
+
+
+def query_catalog(path: Path, query: CatalogQuery) -> Iterator[CatalogEntry]:
+    """Matching entries by capture datetime, streamed from the catalog at `path`."""
+    if not path.is_file():
+        raise FileNotFoundError(f"Catalog not found: {path}")
+    where, values = _where(query)
+    sql = f"SELECT {_FILE_COLUMNS} FROM files{where} ORDER BY capture_datetime, path"
+    if query.limit is not None:
+        sql += " LIMIT ?"
+        values.append(query.limit)
+    connection = _connect_read_only(path)
+    try:
+        for row in connection.execute(sql, values):
+            yield _entry_from_row(row)
+    finally:
+        connection.close()
+
+
+def catalog_entry_to_dict(entry: CatalogEntry) -> dict:
+    return {
+        "path": entry.path,
+        "size_bytes": entry.size_bytes,
+        "mtime_ns": entry.mtime_ns,
+        "content_hash": entry.content_hash,
+        "hashed_at": entry.hashed_at,
+        "capture_datetime": (
+            entry.capture_datetime.isoformat() if entry.capture_datetime else None
+        ),
+        "datetime_source": entry.datetime_source.value if entry.datetime_source else None,
+        "confidence": entry.confidence.value if entry.confidence else None,
+    }
+
+
+def hash_file(path: Path, limiter: RateLimiter | None = None) -> str | None:
+    """SHA-256 of a file read in 1 MiB chunks; None if it cannot be read."""
+    try:
+        hasher = sha256()
+        with path.open("rb") as handle:
+            while True:
+                chunk = handle.read(_HASH_CHUNK_BYTES)
+                if not chunk:
+                    break
+                if limiter is not None:
+                    limiter.acquire(nbytes=len(chunk))
+                hasher.update(chunk)
+        return hasher.hexdigest()
+    except OSError:
+        return None
+
+
+def open_catalog(
+    path: Path,
+    archive_root: Path,
+    *,
+    build_workers: int = 8,
+    filter_path: Path | None = None,
+    telemetry: Telemetry | None = None,
+    read_only: bool = False,
+) -> ArchiveCatalog:
+    """
+    Open the catalog at `path`, rebuilding it when it is missing or
+    incomplete, with the archive filter at `filter_path` if one is given.
+    A `read_only` catalog is never built; FileNotFoundError if it is missing
+    or incomplete.
+    """
+    if read_only and not path.is_file():
+        raise FileNotFoundError(f"Catalog not found: {path}")
+    catalog = ArchiveCatalog(path, archive_root, telemetry=telemetry, read_only=read_only)
+    try:
+        if not catalog.built:
+            if read_only:
+                raise FileNotFoundError(f"Catalog is incomplete: {path}")
+            catalog.rebuild(workers=build_workers)
+        if filter_path is not None:
+            catalog.use_filter(filter_path, workers=build_workers)
+    except BaseException:
+        catalog.close()
+        raise
+    return catalog
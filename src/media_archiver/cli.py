@@ -1,17 +1,58 @@
 import argparse
-from collections import defaultdict
-from datetime import datetime
+from contextlib import ExitStack, nullcontext
+from dataclasses import replace
+from datetime import datetime, timedelta
+import json
+import sqlite3
 import sys
+import time
 from pathlib import Path
 
+from media_archiver.archive_filter import ARCHIVE_FILTER_NAME
+from media_archiver.async_pipeline import run_async_pipeline
+from media_archiver.catalog import (
+    DEFAULT_CATALOG_PATH,
+    ArchiveCatalog,
+    CatalogQuery,
+    catalog_entry_to_dict,
+    open_catalog,
+    query_catalog,
+)
+from media_archiver.coordination import run_cooperative_pipeline
 from media_archiver.config import load_config, ConfigError, AppConfig
-from media_archiver.datetime_resolver import resolve_datetime
-from media_archiver.executor import execute_decision
-from media_archiver.month_normalizer import normalize_month_folder
-from media_archiver.renamer import ensure_unique_name, generate_filename
-from media_archiver.reporter import ExecutionResult, ReportConfig, build_report, write_reports
-from media_archiver.scanner import scan_directories
-from media_archiver.sorter import SortDecision, build_sort_decision
+from media_archiver.markdown_report import YearlyMarkdownWriter, write_yearly_markdown
+from media_archiver.metrics import write_textfile
+from media_archiver.models import ConfidenceLevel, DateTimeSource
+from media_archiver.pipeline import PipelineResult, ResultSink, run_staged_pipeline
+from media_archiver.profiling import StageProfiler
+from media_archiver.progress import Progress, ProgressMonitor
+from media_archiver.report_diff import (
+    STATUS_NEWLY_FAILING,
+    STATUSES,
+    diff_entries,
+    diff_inputs,
+    diff_to_dict,
+    format_diff,
+)
+from media_archiver.report_store import (
+    EntryQuery,
+    SqliteReportWriter,
+    query_entries,
+    stored_entry_to_dict,
+    write_sqlite_report,
+)
+from media_archiver.reporter import (
+    ReportConfig,
+    StreamingReportWriter,
+    build_report,
+    write_reports,
+)
+from media_archiver.scrub import ScrubCheckpoint, scrub_archive
+from media_archiver.scanner import SUPPORTED_IMAGE_EXTENSIONS, SUPPORTED_VIDEO_EXTENSIONS
+from media_archiver.sharding import run_sharded_pipeline
+from media_archiver.sources import source_roots
+from media_archiver.telemetry import Telemetry
+from media_archiver.throttle import RateLimiter
 
 
 def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
@@ -31,27 +72,180 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         help="Apply changes to filesystem (default is dry-run)",
     )
 
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write sampled profiles and tracemalloc output per stage next to the reports",
+    )
+
+    return parser.parse_args(argv)
+
+
+def parse_report_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="media-archiver report",
+        description="Inspect stored reports",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", help="Look up entries in the SQLite report database")
+    query.add_argument(
+        "--db",
+        help="Report database (defaults to reporting.sqlite of the config)",
+    )
+    query.add_argument("--config", help="Path to config.yaml, used when --db is not given")
+    query.add_argument("--source", help="Exact source path")
+    query.add_argument("--name", help="Source file name, e.g. IMG_1234.jpg")
+    query.add_argument("--target", help="Exact target path")
+    query.add_argument("--action", help="copy, move or skip")
+    query.add_argument("--reason", help="Reason, or error prefix such as copy_failed")
+    runs = query.add_mutually_exclusive_group()
+    runs.add_argument("--run", type=int, help="Only this run id")
+    runs.add_argument("--latest", action="store_true", help="Only the latest run")
+    query.add_argument("--limit", type=int, help="Maximum number of entries")
+    query.add_argument(
+        "--format",
+        choices=("table", "jsonl"),
+        default="table",
+        help="Output format (default: table)",
+    )
+
+    diff = commands.add_parser(
+        "diff",
+        help="Compare two reports (JSON, JSON Lines or SQLite runs)",
+    )
+    diff.add_argument("old", help="Older report, or report database")
+    diff.add_argument("new", help="Newer report, or report database")
+    diff.add_argument("--old-run", type=int, help="Run id in the old database")
+    diff.add_argument("--new-run", type=int, help="Run id in the new database (default: latest)")
+    diff.add_argument(
+        "--status",
+        action="append",
+        choices=STATUSES,
+        help="Only show these changes (repeatable)",
+    )
+    diff.add_argument(
+        "--format",
+        choices=("table", "jsonl"),
+        default="table",
+        help="Output format (default: table)",
+    )
+    diff.add_argument(
+        "--fail-on-new-errors",
+        action="store_true",
+        help="Exit with status 1 when files fail that did not fail before",
+    )
+
+    return parser.parse_args(argv)
+
+
+def parse_scrub_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="media-archiver scrub",
+        description="Re-hash archived files and compare them with the catalog",
+    )
+    parser.add_argument(
+        "--config",
+        help="Path to config.yaml (defaults to ./config.yaml or next to executable)",
+    )
+    parser.add_argument("--workers", type=int, help="Files hashed at once (default: scrub.workers)")
+    parser.add_argument(
+        "--bytes-per-second",
+        type=int,
+        help="Read budget (default: scrub.bytes_per_second)",
+    )
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        help="Stop after reading this many bytes; the next scrub resumes (default: scrub.max_bytes)",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Start a new pass even if the previous one is unfinished",
+    )
     return parser.parse_args(argv)
 
 
-_MONTH_NAMES = {
-    1: "Januar",
-    2: "Februar",
-    3: "Maerz",
-    4: "April",
-    5: "Mai",
-    6: "Juni",
-    7: "Juli",
-    8: "August",
-    9: "September",
-    10: "Oktober",
-    11: "November",
-    12: "Dezember",
-}
+def _date_range(value: str) -> tuple[datetime, datetime]:
+    """[start, end) of a year (2019), month (2019-07) or day (2019-07-14)."""
+    for pattern, unit in (("%Y-%m-%d", "day"), ("%Y-%m", "month"), ("%Y", "year")):
+        try:
+            start = datetime.strptime(value, pattern)
+        except ValueError:
+            continue
+        if unit == "day":
+            return start, start + timedelta(days=1)
+        if unit == "month":
+            return start, (start + timedelta(days=32)).replace(day=1)
+        return start, start.replace(year=start.year + 1)
+    raise argparse.ArgumentTypeError(f"expected YYYY, YYYY-MM or YYYY-MM-DD: {value}")
+
 
+def _extension(value: str) -> str:
+    value = value.lower()
+    return value if value.startswith(".") else f".{value}"
 
-def _month_name_from_datetime(value: datetime) -> str:
-    return _MONTH_NAMES[value.month]
+
+def parse_query_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="media-archiver query",
+        description="Find archived files in the catalog",
+    )
+    parser.add_argument(
+        "--config",
+        help="Path to config.yaml (defaults to ./config.yaml or next to executable)",
+    )
+    parser.add_argument(
+        "--date",
+        type=_date_range,
+        help="Captured in this year, month or day: 2019, 2019-07 or 2019-07-14",
+    )
+    parser.add_argument(
+        "--from",
+        dest="captured_from",
+        type=datetime.fromisoformat,
+        help="Captured at or after this ISO datetime",
+    )
+    parser.add_argument(
+        "--before",
+        type=datetime.fromisoformat,
+        help="Captured before this ISO datetime",
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        choices=[source.value for source in DateTimeSource],
+        help="Where the capture datetime came from (repeatable)",
+    )
+    parser.add_argument(
+        "--confidence",
+        action="append",
+        choices=[level.value for level in ConfidenceLevel],
+        help="Confidence of the capture datetime (repeatable)",
+    )
+    types = parser.add_mutually_exclusive_group()
+    types.add_argument(
+        "--extension",
+        action="append",
+        type=_extension,
+        help="File extension, e.g. mp4 (repeatable)",
+    )
+    types.add_argument(
+        "--kind",
+        choices=("image", "video"),
+        help="Only supported image or video extensions",
+    )
+    parser.add_argument("--min-size", type=int, help="Minimum size in bytes")
+    parser.add_argument("--max-size", type=int, help="Maximum size in bytes")
+    parser.add_argument("--limit", type=int, help="Maximum number of files")
+    parser.add_argument(
+        "--format",
+        choices=("paths", "jsonl"),
+        default="paths",
+        help="Output format (default: paths)",
+    )
+    return parser.parse_args(argv)
 
 
 def _current_timestamp() -> str:
@@ -80,9 +274,9 @@ def resolve_config_path(explicit: str | None) -> Path:
     )
 
 
-def _cleanup_empty_dirs(root: Path, candidates: set[Path]) -> None:
+def _cleanup_empty_dirs(roots: set[Path], candidates: set[Path]) -> None:
     for directory in sorted(candidates, key=lambda p: len(p.parts), reverse=True):
-        if directory == root:
+        if directory in roots:
             continue
         try:
             if directory.exists() and directory.is_dir() and not any(directory.iterdir()):
@@ -91,105 +285,453 @@ def _cleanup_empty_dirs(root: Path, candidates: set[Path]) -> None:
             continue
 
 
-def run_pipeline(config: AppConfig, apply: bool) -> tuple[Path | None, Path | None]:
-    scan_result = scan_directories([config.paths.unsorted])
+def _build_rate_limiter(config: AppConfig) -> RateLimiter | None:
+    limiter = RateLimiter(
+        bytes_per_second=config.throttle.bytes_per_second,
+        ops_per_second=config.throttle.ops_per_second,
+        control_file=config.throttle.control_file,
+    )
+    return limiter if limiter.enabled else None
 
-    planned_names: dict[Path, set[str]] = defaultdict(set)
-    execution_results: list[ExecutionResult] = []
 
-    current_time = datetime.now()
+def _profiled(profiler: StageProfiler | None, name: str, *, all_threads: bool = False):
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name, all_threads=all_threads)
 
-    cleanup_candidates: set[Path] = set()
 
-    for info in scan_result.supported:
-        resolution = resolve_datetime(
-            filename=info.name,
-            exif_datetime=None,
-            fs_modified=datetime.fromtimestamp(info.modified_timestamp),
-        )
+def _catalog_path(config: AppConfig) -> Path:
+    return config.catalog.path or config.paths.archive_root / DEFAULT_CATALOG_PATH
 
-        month_folder = normalize_month_folder(
-            _month_name_from_datetime(resolution.datetime)
-        )
-        if month_folder is None:
-            continue
 
-        target_dir = config.paths.archive_root / f"{resolution.datetime.year:04d}" / month_folder
-        existing_names = planned_names[target_dir]
+def _missing_catalog(path: Path) -> str | None:
+    """Why the catalog at `path` cannot be used, or None; never builds one."""
+    if path.is_file():
+        return None
+    return f"no catalog at {path}; run an import with catalog.enabled set first"
 
-        if config.naming.preserve_original_filename:
-            canonical_name = ensure_unique_name(
-                original_name=info.name,
-                existing_names=existing_names,
+
+def _open_catalog(
+    config: AppConfig,
+    apply: bool,
+    telemetry: Telemetry,
+) -> ArchiveCatalog | None:
+    """
+    The archive catalog, if enabled. Dry runs open an existing, complete
+    one read-only and never build or write it.
+    """
+    if not config.catalog.enabled:
+        return None
+    path = _catalog_path(config)
+    filter_path = path.with_name(ARCHIVE_FILTER_NAME) if config.catalog.filter else None
+    if filter_path is not None and not apply and not filter_path.exists():
+        filter_path = None
+    try:
+        return open_catalog(
+            path,
+            config.paths.archive_root,
+            build_workers=config.catalog.build_workers,
+            filter_path=filter_path,
+            telemetry=telemetry,
+            read_only=not apply,
+        )
+    except FileNotFoundError:
+        if apply:
+            raise
+        return None
+
+
+def _run_driver(
+    config: AppConfig,
+    apply: bool,
+    progress: Progress,
+    telemetry: Telemetry,
+    profiler: StageProfiler | None,
+    sink: ResultSink | None = None,
+    catalog: ArchiveCatalog | None = None,
+) -> PipelineResult:
+    options = {
+        "config": config,
+        "apply": apply,
+        "limiter": _build_rate_limiter(config),
+        "progress": progress,
+        "telemetry": telemetry,
+        "sink": sink,
+        "catalog": catalog,
+    }
+    # Multi-process and multi-host drivers are profiled as a whole, across
+    # the threads of this process (worker processes are not sampled).
+    if config.coordination.queue_file is not None:
+        with _profiled(profiler, "pipeline", all_threads=True):
+            return run_cooperative_pipeline(**options)
+    if config.pipeline.driver == "processes":
+        with _profiled(profiler, "pipeline", all_threads=True):
+            return run_sharded_pipeline(**options)
+    if config.pipeline.driver == "asyncio":
+        return run_async_pipeline(**options, profiler=profiler)
+    return run_staged_pipeline(**options, profiler=profiler)
+
+
+def run_pipeline(
+    config: AppConfig,
+    apply: bool,
+    profile: bool = False,
+) -> tuple[Path | None, Path | None]:
+    telemetry = Telemetry()
+    profiler = None
+    if profile:
+        profiler = StageProfiler(config.paths.report_output / f"{_current_timestamp()}_profile")
+    with profiler if profiler is not None else nullcontext():
+        catalog = _open_catalog(config, apply, telemetry)
+        with catalog if catalog is not None else nullcontext():
+            paths = _run_and_report(config, apply, telemetry, profiler, catalog)
+
+    if config.metrics.textfile is not None:
+        try:
+            write_textfile(config.metrics.textfile, telemetry, finished_at=time.time())
+        except OSError as exc:
+            print(f"WARNING: could not write metrics file: {exc}", file=sys.stderr)
+    return paths
+
+
+def _run_and_report(
+    config: AppConfig,
+    apply: bool,
+    telemetry: Telemetry,
+    profiler: StageProfiler | None,
+    catalog: ArchiveCatalog | None = None,
+) -> tuple[Path | None, Path | None]:
+    reporting = config.reporting
+    report_config = ReportConfig(dry_run=not apply, move_files=config.behavior.move_files)
+    prefix = "dry_run" if not apply else "apply"
+    yearly_markdown = reporting.markdown and reporting.markdown_layout == "per_year"
+    writer = None
+    if reporting.streaming and (reporting.markdown or reporting.json or reporting.sqlite):
+        writer = StreamingReportWriter(
+            output_dir=config.paths.report_output,
+            prefix=prefix,
+            timestamp=_current_timestamp(),
+            config=report_config,
+            write_markdown=reporting.markdown and not yearly_markdown,
+            write_jsonl=reporting.json,
+            spill_entries=reporting.spill_entries,
+            compression=reporting.compression,
+        )
+
+    with writer if writer is not None else nullcontext():
+        progress = Progress()
+        with ProgressMonitor(
+            progress,
+            stream=sys.stderr if config.progress.tty else None,
+            status_file=config.progress.status_file,
+            interval=config.progress.interval_seconds,
+        ):
+            result = _run_driver(
+                config,
+                apply,
+                progress,
+                telemetry,
+                profiler,
+                sink=writer.add if writer is not None else None,
+                catalog=catalog,
+            )
+        if catalog is not None:
+            catalog.flush()
+        if result.interrupted:
+            print(
+                "WARNING: interrupted; the report covers completed files only.",
+                file=sys.stderr,
             )
-        else:
-            canonical_name = generate_filename(
-                original_name=info.name,
-                resolved_datetime=resolution.datetime,
-                source=resolution.source,
-                existing_names=existing_names,
+        for unit in result.lost_leases:
+            print(
+                f"WARNING: lease on {unit} was lost to another worker; "
+                "its files may be processed twice.",
+                file=sys.stderr,
             )
 
-        planned_names[target_dir].add(canonical_name)
-        target_path = target_dir / canonical_name
+        if apply and result.cleanup_candidates:
+            roots = {source.path for source in source_roots(config)}
+            _cleanup_empty_dirs(roots, result.cleanup_candidates)
+
+        if writer is not None:
+            with (
+                _profiled(profiler, "report"),
+                telemetry.measure("stage.report"),
+                ExitStack() as stack,
+            ):
+                timestamp = writer.summary().timestamp
+                stores = []
+                if yearly_markdown:
+                    markdown = stack.enter_context(
+                        YearlyMarkdownWriter(
+                            output_dir=config.paths.report_output,
+                            base_name=f"{timestamp}_{prefix}",
+                            details=reporting.markdown_details,
+                            catalog=catalog,
+                        )
+                    )
+                    stores.append(markdown)
+                if reporting.sqlite is not None:
+                    stores.append(
+                        stack.enter_context(
+                            SqliteReportWriter(
+                                reporting.sqlite,
+                                timestamp=timestamp,
+                                dry_run=report_config.dry_run,
+                                move_files=report_config.move_files,
+                            )
+                        )
+                    )
+                markdown_path, jsonl_path = writer.finish(
+                    deferred_errors=result.deferred_errors,
+                    telemetry=telemetry,
+                    stores=stores,
+                )
+                if yearly_markdown:
+                    markdown_path = markdown.index_path
+                return markdown_path, jsonl_path
+
+    with _profiled(profiler, "report"), telemetry.measure("stage.report"):
+        report = build_report(
+            results=result.results,
+            config=report_config,
+            timestamp=_current_timestamp(),
+        )
 
-        if resolution.datetime > current_time:
-            decision = SortDecision(
-                source=info.absolute_path,
-                target_dir=target_dir,
-                target_path=target_path,
-                action="skip",
-                reason="future_date",
+    markdown_path: Path | None = None
+    json_path: Path | None = None
+    if (reporting.markdown and not yearly_markdown) or reporting.json:
+        markdown_path, json_path = write_reports(
+            report=report,
+            output_dir=config.paths.report_output,
+            prefix=prefix,
+            write_markdown=reporting.markdown and not yearly_markdown,
+            write_json=reporting.json,
+            telemetry=telemetry,
+            compression=reporting.compression,
+        )
+    if yearly_markdown:
+        with telemetry.measure("cpu.to_markdown"):
+            markdown_path = write_yearly_markdown(
+                report,
+                output_dir=config.paths.report_output,
+                prefix=prefix,
+                details=reporting.markdown_details,
+                catalog=catalog,
             )
-        else:
-            target_exists = target_path.exists()
-            decision = build_sort_decision(
-                archive_root=config.paths.archive_root,
-                source_path=info.absolute_path,
-                resolved_datetime=resolution.datetime,
-                month_folder=month_folder,
-                canonical_name=canonical_name,
-                move_files=config.behavior.move_files,
-                target_exists=target_exists,
+    if reporting.sqlite is not None:
+        summary = replace(report.summary, timings=telemetry.summary())
+        write_sqlite_report(reporting.sqlite, replace(report, summary=summary))
+    return markdown_path, json_path
+
+
+def _report_database(args: argparse.Namespace) -> Path:
+    if args.db:
+        return Path(args.db)
+    config = load_config(resolve_config_path(args.config))
+    if config.reporting.sqlite is None:
+        raise ConfigError("reporting.sqlite is not set; pass --db")
+    return config.reporting.sqlite
+
+
+def _query_reports(args: argparse.Namespace) -> int:
+    try:
+        database = _report_database(args)
+    except (ConfigError, FileNotFoundError) as exc:
+        print(f"Configuration error: {exc}", file=sys.stderr)
+        return 1
+
+    query = EntryQuery(
+        source_path=args.source,
+        source_name=args.name,
+        target_path=args.target,
+        action=args.action,
+        reason=args.reason,
+        run_id=args.run,
+        latest_run=args.latest,
+        limit=args.limit,
+    )
+    try:
+        for item in query_entries(database, query):
+            if args.format == "jsonl":
+                print(json.dumps(stored_entry_to_dict(item), ensure_ascii=False))
+                continue
+            entry = item.entry
+            print(
+                f"{item.run_timestamp}\t{entry.action}\t{entry.reason or '-'}\t"
+                f"{entry.source_path}\t{entry.target_path}"
             )
+    except (FileNotFoundError, sqlite3.Error) as exc:
+        print(f"Report query failed: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
 
-        performed = execute_decision(
-            decision=decision,
-            apply=apply,
+def _diff_reports(args: argparse.Namespace) -> int:
+    newly_failing = 0
+    try:
+        old_entries, new_entries = diff_inputs(
+            Path(args.old), Path(args.new), old_run=args.old_run, new_run=args.new_run
         )
+        for diff in diff_entries(old_entries, new_entries):
+            if diff.status == STATUS_NEWLY_FAILING:
+                newly_failing += 1
+            if args.status and diff.status not in args.status:
+                continue
+            if args.format == "jsonl":
+                print(json.dumps(diff_to_dict(diff), ensure_ascii=False))
+            else:
+                print(format_diff(diff))
+    except (FileNotFoundError, ValueError, OSError, sqlite3.Error) as exc:
+        print(f"Report diff failed: {exc}", file=sys.stderr)
+        return 2
+    if args.fail_on_new_errors and newly_failing:
+        print(f"{newly_failing} newly failing file(s)", file=sys.stderr)
+        return 1
+    return 0
 
-        if performed and decision.action == "move":
-            cleanup_candidates.add(decision.source.parent)
 
-        execution_results.append(
-            ExecutionResult(decision=decision, performed=performed)
-        )
+def report_main(argv: list[str]) -> int:
+    args = parse_report_args(argv)
+    if args.command == "diff":
+        return _diff_reports(args)
+    return _query_reports(args)
 
-    report = build_report(
-        results=execution_results,
-        config=ReportConfig(
-            dry_run=not apply,
-            move_files=config.behavior.move_files,
+
+def scrub_main(argv: list[str]) -> int:
+    args = parse_scrub_args(argv)
+    try:
+        config = load_config(resolve_config_path(args.config))
+    except (ConfigError, FileNotFoundError) as exc:
+        print(f"Configuration error: {exc}", file=sys.stderr)
+        return 1
+
+    options = config.scrub
+    limiter = RateLimiter(
+        bytes_per_second=(
+            args.bytes_per_second
+            if args.bytes_per_second is not None
+            else options.bytes_per_second or config.throttle.bytes_per_second
         ),
-        timestamp=_current_timestamp(),
+        ops_per_second=config.throttle.ops_per_second,
+        control_file=config.throttle.control_file,
+    )
+    telemetry = Telemetry()
+    reporting = config.reporting
+    catalog_path = _catalog_path(config)
+    if not config.catalog.enabled:
+        print("Scrub failed: catalog.enabled is not set", file=sys.stderr)
+        return 1
+    problem = _missing_catalog(catalog_path)
+    if problem is not None:
+        print(f"Scrub failed: {problem}", file=sys.stderr)
+        return 1
+    try:
+        with (
+            open_catalog(
+                catalog_path,
+                config.paths.archive_root,
+                build_workers=config.catalog.build_workers,
+                telemetry=telemetry,
+            ) as catalog,
+            ScrubCheckpoint(catalog_path.with_name("scrub.sqlite")) as checkpoint,
+            StreamingReportWriter(
+                output_dir=config.paths.report_output,
+                prefix="scrub",
+                timestamp=_current_timestamp(),
+                config=ReportConfig(dry_run=False, move_files=False),
+                write_markdown=reporting.markdown,
+                write_jsonl=reporting.json,
+                spill_entries=reporting.spill_entries,
+                compression=reporting.compression,
+            ) as writer,
+        ):
+            result = scrub_archive(
+                catalog,
+                checkpoint,
+                sink=writer.add,
+                workers=args.workers or options.workers,
+                limiter=limiter if limiter.enabled else None,
+                max_bytes=args.max_bytes if args.max_bytes is not None else options.max_bytes,
+                restart=args.restart,
+                telemetry=telemetry,
+            )
+            with telemetry.measure("stage.report"):
+                paths = writer.finish(telemetry=telemetry)
+    except (OSError, sqlite3.Error) as exc:
+        print(f"Scrub failed: {exc}", file=sys.stderr)
+        return 1
+
+    print(
+        f"Scrubbed {result.files} files ({result.bytes_read} bytes): "
+        f"{result.failed} failed, {result.remaining} left in this pass"
+    )
+    for path in paths:
+        if path is not None:
+            print(f"Report written to: {path}")
+    return 1 if result.failed else 0
+
+
+def _catalog_query(args: argparse.Namespace) -> CatalogQuery:
+    starts = [args.date[0]] if args.date else []
+    ends = [args.date[1]] if args.date else []
+    if args.captured_from is not None:
+        starts.append(args.captured_from)
+    if args.before is not None:
+        ends.append(args.before)
+    extensions = set(args.extension or ())
+    if args.kind == "image":
+        extensions = SUPPORTED_IMAGE_EXTENSIONS
+    elif args.kind == "video":
+        extensions = SUPPORTED_VIDEO_EXTENSIONS
+    return CatalogQuery(
+        captured_from=max(starts) if starts else None,
+        captured_before=min(ends) if ends else None,
+        sources=tuple(DateTimeSource(value) for value in args.source or ()),
+        confidences=tuple(ConfidenceLevel(value) for value in args.confidence or ()),
+        extensions=tuple(sorted(extensions)),
+        min_size=args.min_size,
+        max_size=args.max_size,
+        limit=args.limit,
     )
 
-    if apply and cleanup_candidates:
-        _cleanup_empty_dirs(config.paths.unsorted, cleanup_candidates)
 
-    if config.reporting.markdown or config.reporting.json:
-        return write_reports(
-            report=report,
-            output_dir=config.paths.report_output,
-            prefix="dry_run" if not apply else "apply",
-            write_markdown=config.reporting.markdown,
-            write_json=config.reporting.json,
-        )
+def query_main(argv: list[str]) -> int:
+    args = parse_query_args(argv)
+    try:
+        config = load_config(resolve_config_path(args.config))
+    except (ConfigError, FileNotFoundError) as exc:
+        print(f"Configuration error: {exc}", file=sys.stderr)
+        return 1
 
-    return None, None
+    path = _catalog_path(config)
+    problem = _missing_catalog(path)
+    if problem is not None:
+        print(f"Catalog error: {problem}", file=sys.stderr)
+        return 1
+    archive_root = config.paths.archive_root
+    try:
+        for entry in query_catalog(path, _catalog_query(args)):
+            if args.format == "jsonl":
+                print(json.dumps(catalog_entry_to_dict(entry), ensure_ascii=False))
+            else:
+                print(archive_root / entry.path)
+    except (OSError, sqlite3.Error) as exc:
+        print(f"Catalog error: {exc}", file=sys.stderr)
+        return 1
+    return 0
 
 
 def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "report":
+        return report_main(argv[1:])
+    if argv and argv[0] == "scrub":
+        return scrub_main(argv[1:])
+    if argv and argv[0] == "query":
+        return query_main(argv[1:])
+
     args = parse_args(argv)
 
     try:
@@ -209,7 +751,7 @@ def main(argv: list[str] | None = None) -> int:
     mode_label = "apply" if apply else "dry-run"
     print(f"Starting media-archiver ({mode_label})")
 
-    markdown_path, json_path = run_pipeline(config, apply)
+    markdown_path, json_path = run_pipeline(config, apply, profile=args.profile)
 
     if markdown_path:
         print(f"Report written to: {markdown_path}")
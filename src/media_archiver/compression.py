@@ -0,0 +1,47 @@
+"""
+Compressed report files.
+
+Reports may be written as gzip (`.gz`) or xz (`.xz`) streams. Both are
+written and read incrementally through text wrappers, so neither side holds
+the whole (decompressed) report in memory. Readers pick the codec from the
+file suffix.
+"""
+
+from __future__ import annotations
+
+import gzip
+import lzma
+from pathlib import Path
+from typing import IO
+
+
+# compression name -> file suffix
+COMPRESSIONS = {"gzip": ".gz", "xz": ".xz"}
+
+# Fast settings: reports are large, highly repetitive text.
+_GZIP_LEVEL = 6
+_XZ_PRESET = 3
+
+
+def compressed_name(name: str, compression: str | None) -> str:
+    """`name` with the suffix of `compression` appended (`report.json.gz`)."""
+    if compression is None:
+        return name
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unknown compression: {compression}")
+    return name + COMPRESSIONS[compression]
+
+
+def open_text(path: Path, mode: str = "r") -> IO[str]:
+    """Open a (possibly compressed) report for text reading ("r") or writing ("w")."""
+    if mode not in ("r", "w"):
+        raise ValueError(f"unsupported mode: {mode}")
+    if path.suffix == ".gz":
+        if mode == "w":
+            return gzip.open(path, "wt", encoding="utf-8", compresslevel=_GZIP_LEVEL)
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.suffix == ".xz":
+        if mode == "w":
+            return lzma.open(path, "wt", encoding="utf-8", preset=_XZ_PRESET)
+        return lzma.open(path, "rt", encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 import yaml
 
@@ -7,11 +7,29 @@ class ConfigError(Exception):
     pass
 
 
+PIPELINE_DRIVERS = frozenset({"threads", "asyncio", "processes"})
+SHARD_STRATEGIES = frozenset({"top_level", "hash"})
+REPORT_COMPRESSIONS = frozenset({"gzip", "xz"})
+MARKDOWN_LAYOUTS = frozenset({"single", "per_year"})
+MARKDOWN_DETAILS = frozenset({"exceptions", "all"})
+
+
+@dataclass(frozen=True)
+class SourceConfig:
+    path: Path
+    # Higher priorities are planned first and win collision-free names.
+    priority: int = 0
+    # Concurrent stat calls while scanning this source.
+    concurrency: int = 1
+
+
 @dataclass(frozen=True)
 class PathsConfig:
     archive_root: Path
     unsorted: Path
     report_output: Path
+    # Empty: `unsorted` is the only source.
+    sources: tuple[SourceConfig, ...] = ()
 
 
 @dataclass(frozen=True)
@@ -39,6 +57,85 @@ class ReportingConfig:
     markdown: bool
     json: bool
     verbose: bool
+    # Write JSON Lines and Markdown while the run progresses, in bounded memory.
+    streaming: bool = False
+    spill_entries: int = 50_000
+    # SQLite database every run is appended to, for `report query`.
+    sqlite: Path | None = None
+    # gzip or xz for the JSON / JSON Lines reports; None writes plain text.
+    compression: str | None = None
+    # single: one document listing every file; per_year: index + one page per year.
+    markdown_layout: str = "single"
+    # per_year only: list skips and errors ("exceptions") or every file ("all").
+    markdown_details: str = "exceptions"
+
+
+@dataclass(frozen=True)
+class ExecutionConfig:
+    fast_paths: bool = False
+    verify_copies: bool = False
+    directory_workers: int = 8
+
+
+@dataclass(frozen=True)
+class ThrottleConfig:
+    bytes_per_second: int = 0
+    ops_per_second: int = 0
+    control_file: Path | None = None
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    driver: str = "threads"
+    queue_size: int = 256
+    resolve_workers: int = 2
+    execute_workers: int = 4
+    blocking_workers: int = 8
+    processes: int = 1
+    shard_by: str = "top_level"
+
+
+@dataclass(frozen=True)
+class CoordinationConfig:
+    # Shared SQLite work queue; None runs a standalone (single worker) import.
+    queue_file: Path | None = None
+    lease_seconds: int = 60
+
+
+@dataclass(frozen=True)
+class ProgressConfig:
+    tty: bool = True
+    status_file: Path | None = None
+    interval_seconds: int = 1
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    # Prometheus textfile (e.g. in node_exporter's textfile directory).
+    textfile: Path | None = None
+
+
+@dataclass(frozen=True)
+class CatalogConfig:
+    # Persistent index of the archive's files; planning looks targets up there.
+    enabled: bool = False
+    # None keeps it in the archive: <archive_root>/.media-archiver/catalog.sqlite
+    path: Path | None = None
+    # Threads walking the archive when the catalog has to be rebuilt.
+    build_workers: int = 8
+    # Bloom filter of (size, first 64 KiB) keys next to the catalog; lets
+    # duplicate detection skip files that are certainly not archived.
+    filter: bool = False
+
+
+@dataclass(frozen=True)
+class ScrubConfig:
+    # Files hashed at once by `media-archiver scrub`.
+    workers: int = 4
+    # Read budget of the scrub; 0 uses throttle.bytes_per_second.
+    bytes_per_second: int = 0
+    # Bytes read per invocation before the scrub checkpoints and stops; 0: no limit.
+    max_bytes: int = 0
 
 
 @dataclass(frozen=True)
@@ -48,6 +145,14 @@ class AppConfig:
     naming: NamingConfig
     duplicates: DuplicateConfig
     reporting: ReportingConfig
+    execution: ExecutionConfig = field(default_factory=ExecutionConfig)
+    throttle: ThrottleConfig = field(default_factory=ThrottleConfig)
+    pipeline: PipelineConfig = field(default_factory=PipelineConfig)
+    coordination: CoordinationConfig = field(default_factory=CoordinationConfig)
+    progress: ProgressConfig = field(default_factory=ProgressConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    catalog: CatalogConfig = field(default_factory=CatalogConfig)
+    scrub: ScrubConfig = field(default_factory=ScrubConfig)
 
 
 def _require(mapping: dict, key: str):
@@ -64,6 +169,36 @@ def _optional(mapping: dict, key: str, default):
     return mapping.get(key, default)
 
 
+def _optional_int(mapping: dict, key: str, default: int, minimum: int = 0) -> int:
+    value = _optional(mapping, key, default)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ConfigError(f"Invalid config value for {key}: expected integer")
+    if value < minimum:
+        raise ConfigError(f"Invalid config value for {key}: must be >= {minimum}")
+    return value
+
+
+def _load_sources(raw_paths: dict) -> tuple[SourceConfig, ...]:
+    raw_sources = _optional(raw_paths, "sources", None) or []
+    if not isinstance(raw_sources, list):
+        raise ConfigError("Invalid config value for sources: expected list")
+
+    sources: list[SourceConfig] = []
+    for entry in raw_sources:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        sources.append(
+            SourceConfig(
+                path=Path(_require(entry, "path")),
+                priority=_optional_int(entry, "priority", 0),
+                concurrency=_optional_int(entry, "concurrency", 1, minimum=1),
+            )
+        )
+    if len({source.path for source in sources}) != len(sources):
+        raise ConfigError("Invalid config value for sources: duplicate path")
+    return tuple(sources)
+
+
 def load_config(path: Path) -> AppConfig:
     if not path.exists():
         raise ConfigError(f"Config file does not exist: {path}")
@@ -75,10 +210,16 @@ def load_config(path: Path) -> AppConfig:
         raise ConfigError("Invalid config structure: root must be a mapping")
 
     try:
+        sources = _load_sources(raw["paths"])
         paths = PathsConfig(
             archive_root=Path(_require(raw["paths"], "archive_root")),
-            unsorted=Path(_require(raw["paths"], "unsorted")),
+            unsorted=(
+                Path(_optional(raw["paths"], "unsorted", sources[0].path))
+                if sources
+                else Path(_require(raw["paths"], "unsorted"))
+            ),
             report_output=Path(_require(raw["paths"], "report_output")),
+            sources=sources,
         )
 
         behavior = BehaviorConfig(
@@ -102,10 +243,106 @@ def load_config(path: Path) -> AppConfig:
             mode=_require(raw["duplicates"], "mode"),
         )
 
+        sqlite_path = _optional(raw["reporting"], "sqlite", None)
+        compression = _optional(raw["reporting"], "compression", None)
+        if compression is not None and compression not in REPORT_COMPRESSIONS:
+            raise ConfigError(
+                "Invalid config value for compression: expected one of "
+                f"{sorted(REPORT_COMPRESSIONS)}"
+            )
+        markdown_layout = _optional(raw["reporting"], "markdown_layout", "single")
+        if markdown_layout not in MARKDOWN_LAYOUTS:
+            raise ConfigError(
+                "Invalid config value for markdown_layout: expected one of "
+                f"{sorted(MARKDOWN_LAYOUTS)}"
+            )
+        markdown_details = _optional(raw["reporting"], "markdown_details", "exceptions")
+        if markdown_details not in MARKDOWN_DETAILS:
+            raise ConfigError(
+                "Invalid config value for markdown_details: expected one of "
+                f"{sorted(MARKDOWN_DETAILS)}"
+            )
         reporting = ReportingConfig(
             markdown=bool(_require(raw["reporting"], "markdown")),
             json=bool(_require(raw["reporting"], "json")),
             verbose=bool(_require(raw["reporting"], "verbose")),
+            streaming=bool(_optional(raw["reporting"], "streaming", False)),
+            spill_entries=_optional_int(raw["reporting"], "spill_entries", 50_000, minimum=1),
+            sqlite=Path(sqlite_path) if sqlite_path else None,
+            compression=compression,
+            markdown_layout=markdown_layout,
+            markdown_details=markdown_details,
+        )
+
+        raw_execution = _optional(raw, "execution", None) or {}
+        execution = ExecutionConfig(
+            fast_paths=bool(_optional(raw_execution, "fast_paths", False)),
+            verify_copies=bool(_optional(raw_execution, "verify_copies", False)),
+            directory_workers=_optional_int(raw_execution, "directory_workers", 8, minimum=1),
+        )
+
+        raw_throttle = _optional(raw, "throttle", None) or {}
+        control_file = _optional(raw_throttle, "control_file", None)
+        throttle = ThrottleConfig(
+            bytes_per_second=_optional_int(raw_throttle, "bytes_per_second", 0),
+            ops_per_second=_optional_int(raw_throttle, "ops_per_second", 0),
+            control_file=Path(control_file) if control_file else None,
+        )
+
+        raw_pipeline = _optional(raw, "pipeline", None) or {}
+        driver = _optional(raw_pipeline, "driver", "threads")
+        if driver not in PIPELINE_DRIVERS:
+            raise ConfigError(
+                f"Invalid config value for driver: expected one of {sorted(PIPELINE_DRIVERS)}"
+            )
+        shard_by = _optional(raw_pipeline, "shard_by", "top_level")
+        if shard_by not in SHARD_STRATEGIES:
+            raise ConfigError(
+                f"Invalid config value for shard_by: expected one of {sorted(SHARD_STRATEGIES)}"
+            )
+        pipeline = PipelineConfig(
+            driver=driver,
+            queue_size=_optional_int(raw_pipeline, "queue_size", 256, minimum=1),
+            resolve_workers=_optional_int(raw_pipeline, "resolve_workers", 2, minimum=1),
+            execute_workers=_optional_int(raw_pipeline, "execute_workers", 4, minimum=1),
+            blocking_workers=_optional_int(raw_pipeline, "blocking_workers", 8, minimum=1),
+            processes=_optional_int(raw_pipeline, "processes", 1, minimum=1),
+            shard_by=shard_by,
+        )
+
+        raw_coordination = _optional(raw, "coordination", None) or {}
+        queue_file = _optional(raw_coordination, "queue_file", None)
+        coordination = CoordinationConfig(
+            queue_file=Path(queue_file) if queue_file else None,
+            lease_seconds=_optional_int(raw_coordination, "lease_seconds", 60, minimum=3),
+        )
+
+        raw_progress = _optional(raw, "progress", None) or {}
+        status_file = _optional(raw_progress, "status_file", None)
+        progress = ProgressConfig(
+            tty=bool(_optional(raw_progress, "tty", True)),
+            status_file=Path(status_file) if status_file else None,
+            interval_seconds=_optional_int(raw_progress, "interval_seconds", 1, minimum=1),
+        )
+
+        raw_metrics = _optional(raw, "metrics", None) or {}
+        textfile = _optional(raw_metrics, "textfile", None)
+        metrics = MetricsConfig(textfile=Path(textfile) if textfile else None)
+
+        raw_catalog = _optional(raw, "catalog", None) or {}
+        catalog_path = _optional(raw_catalog, "path", None)
+        catalog = CatalogConfig(
+            enabled=bool(_optional(raw_catalog, "enabled", False)),
+            path=Path(catalog_path) if catalog_path else None,
+            build_workers=_optional_int(raw_catalog, "build_workers", 8, minimum=1),
+            filter=bool(_optional(raw_catalog, "filter", False)),
+        )
+
+        raw_scrub = _optional(raw, "scrub", None) or {}
+        scrub = ScrubConfig(
+            workers=_optional_int(raw_scrub, "workers", 4, minimum=1),
+            bytes_per_second=_optional_int(raw_scrub, "bytes_per_second", 0),
+            max_bytes=_optional_int(raw_scrub, "max_bytes", 0),
         )
 
     except KeyError as exc:
@@ -117,4 +354,12 @@ def load_config(path: Path) -> AppConfig:
         naming=naming,
         duplicates=duplicates,
         reporting=reporting,
+        execution=execution,
+        throttle=throttle,
+        pipeline=pipeline,
+        coordination=coordination,
+        progress=progress,
+        metrics=metrics,
+        catalog=catalog,
+        scrub=scrub,
     )
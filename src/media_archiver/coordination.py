@@ -0,0 +1,443 @@
+"""
+Cooperative processing of one import by several processes or hosts.
+
+Work is coordinated through a SQLite database on shared storage. Every
+source directory is one work unit. A unit is leased by one worker at a time,
+and the lease is kept alive by a heartbeat thread. If a worker dies, its
+lease expires and another worker picks the unit up again. Before a unit is
+planned, all of its target directories are claimed in a single transaction
+(all or nothing, so workers cannot deadlock). Collision handling and
+`target_exists` checks therefore never race with another writer. Names
+planned by any worker are shared through the database, so collision
+suffixes continue across workers just like within a single run. A unit
+taken over from a dead worker is planned again without its own earlier
+names, so it gets the same names and files already written are skipped
+as `target_exists`.
+
+SQLite locking depends on the shared filesystem honouring POSIX locks.
+The default rollback journal is used on purpose, because WAL mode does not
+work on network filesystems.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from media_archiver.catalog import ArchiveCatalog
+from media_archiver.config import AppConfig, SourceConfig
+from media_archiver.pipeline import (
+    DecisionExecutor,
+    PipelineResult,
+    Planner,
+    ResultSink,
+    resolve_file,
+)
+from media_archiver.progress import Progress
+from media_archiver.reporter import ExecutionResult
+from media_archiver.scanner import FileInfo, iter_scan
+from media_archiver.sources import planning_order, source_roots
+from media_archiver.telemetry import Telemetry
+from media_archiver.throttle import RateLimiter
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    path TEXT PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'pending',
+    priority INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS claims (
+    target_dir TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    lease_expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS planned_names (
+    target_dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    PRIMARY KEY (target_dir, name)
+);
+"""
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def source_directories(root: Path) -> list[Path]:
+    """All directories below `root` (including it), in sorted order; one work unit each."""
+    if not root.is_dir():
+        return []
+    found = [root]
+    for current, subdirectories, _ in os.walk(root):
+        subdirectories.sort()
+        found.extend(Path(current) / name for name in subdirectories)
+    return sorted(found, key=str)
+
+
+class WorkQueue:
+    """Lease-based queue of source directories plus target directory claims."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        owner: str | None = None,
+        lease_seconds: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        # Wall clock, not monotonic: leases are compared across hosts.
+        self.path = path
+        self.owner = owner if owner is not None else default_owner()
+        self.lease_seconds = lease_seconds
+        self._clock = clock
+        connection = sqlite3.connect(str(path), timeout=30.0)
+        try:
+            connection.executescript(_SCHEMA)
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation; safe to use from any thread.
+        connection = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def seed(self, units: Iterable[Path], priority: int = 0) -> None:
+        """Register work units of one priority; see seed_sources()."""
+        self.seed_sources([(units, priority)])
+
+    def seed_sources(self, sources: Iterable[tuple[Iterable[Path], int]]) -> None:
+        """
+        Register the work units of (units, priority) pairs in one transaction.
+
+        Units already known (from any worker) are kept while the import is in
+        progress. Once every unit is done the import is over, and seeding
+        starts the next one: finished units and planned names are dropped, so
+        a reused queue file does not turn later runs into no-ops.
+        """
+        rows = [(str(unit), priority) for units, priority in sources for unit in units]
+        with self._transaction() as connection:
+            (open_units,) = connection.execute(
+                "SELECT COUNT(*) FROM units WHERE state != 'done'"
+            ).fetchone()
+            if open_units == 0:
+                connection.execute("DELETE FROM units")
+                connection.execute("DELETE FROM planned_names")
+            connection.executemany(
+                "INSERT OR IGNORE INTO units (path, priority) VALUES (?, ?)", rows
+            )
+
+    def holder(self, unit: Path) -> tuple[str, str | None] | None:
+        """(state, owner) of a unit; None if it is not queued."""
+        with self._transaction() as connection:
+            return connection.execute(
+                "SELECT state, owner FROM units WHERE path = ?", (str(unit),)
+            ).fetchone()
+
+    def lease(self) -> Path | None:
+        """Lease the next pending unit, or one whose lease has expired."""
+        now = self._clock()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT path FROM units"
+                " WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?)"
+                " ORDER BY priority DESC, path LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE units SET state = 'leased', owner = ?, lease_expires = ? WHERE path = ?",
+                (self.owner, now + self.lease_seconds, row[0]),
+            )
+        return Path(row[0])
+
+    def heartbeat(self) -> None:
+        """Extend all leases and claims held by this worker."""
+        expires = self._clock() + self.lease_seconds
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE units SET lease_expires = ? WHERE owner = ? AND state = 'leased'",
+                (expires, self.owner),
+            )
+            connection.execute(
+                "UPDATE claims SET lease_expires = ? WHERE owner = ?",
+                (expires, self.owner),
+            )
+
+    def complete(self, unit: Path) -> bool:
+        """Mark a unit done; False if the lease was lost to another worker meanwhile."""
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE units SET state = 'done', owner = NULL"
+                " WHERE path = ? AND owner = ? AND state = 'leased'",
+                (str(unit), self.owner),
+            )
+        return cursor.rowcount == 1
+
+    def remaining(self) -> int:
+        with self._transaction() as connection:
+            (count,) = connection.execute(
+                "SELECT COUNT(*) FROM units WHERE state != 'done'"
+            ).fetchone()
+        return count
+
+    def claim_directories(self, directories: Iterable[Path]) -> bool:
+        """Claim all `directories` at once, or none if another live worker holds one."""
+        now = self._clock()
+        keys = sorted({str(directory) for directory in directories})
+        with self._transaction() as connection:
+            for key in keys:
+                row = connection.execute(
+                    "SELECT owner, lease_expires FROM claims WHERE target_dir = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and row[0] != self.owner and row[1] >= now:
+                    return False
+            connection.executemany(
+                "INSERT OR REPLACE INTO claims (target_dir, owner, lease_expires)"
+                " VALUES (?, ?, ?)",
+                [(key, self.owner, now + self.lease_seconds) for key in keys],
+            )
+        return True
+
+    def planned_names(self, target_dir: Path, *, excluding: Path) -> set[str]:
+        """Names planned in `target_dir` by units other than `excluding`."""
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT name FROM planned_names WHERE target_dir = ? AND unit != ?",
+                (str(target_dir), str(excluding)),
+            ).fetchall()
+        return {name for (name,) in rows}
+
+    def record_planned(self, unit: Path, target_paths: Iterable[Path]) -> None:
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO planned_names (target_dir, name, unit) VALUES (?, ?, ?)",
+                [(str(path.parent), path.name, str(unit)) for path in target_paths],
+            )
+
+    def release_directories(self, directories: Iterable[Path]) -> None:
+        with self._transaction() as connection:
+            connection.executemany(
+                "DELETE FROM claims WHERE target_dir = ? AND owner = ?",
+                [(str(directory), self.owner) for directory in directories],
+            )
+
+
+class _Heartbeat:
+    def __init__(self, queue: WorkQueue, interval: float) -> None:
+        self._queue = queue
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="media-archiver-heartbeat",
+            daemon=True,
+        )
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self._queue.heartbeat()
+            except sqlite3.Error:
+                # Shared storage hiccup: retry on the next beat.
+                continue
+
+
+class CooperativePipeline:
+    """Processes leased source directories until the shared queue is drained."""
+
+    def __init__(
+        self,
+        *,
+        config: AppConfig,
+        apply: bool,
+        queue: WorkQueue,
+        limiter: RateLimiter | None = None,
+        current_time: datetime | None = None,
+        poll_interval: float = 1.0,
+        sleep: Callable[[float], None] = time.sleep,
+        progress: Progress | None = None,
+        telemetry: Telemetry | None = None,
+        sink: ResultSink | None = None,
+        catalog: ArchiveCatalog | None = None,
+    ) -> None:
+        self._config = config
+        self._sink = sink
+        self._queue = queue
+        self._limiter = limiter
+        self._progress = progress
+        self._telemetry = telemetry
+        self._catalog = catalog
+        self._planner = Planner(
+            config=config,
+            current_time=current_time if current_time is not None else datetime.now(),
+            progress=progress,
+            telemetry=telemetry,
+            catalog=catalog,
+        )
+        self._executor = DecisionExecutor(
+            config=config,
+            apply=apply,
+            limiter=limiter,
+            progress=progress,
+            telemetry=telemetry,
+            catalog=catalog,
+        )
+        self._poll_interval = poll_interval
+        self._sleep = sleep
+        self._sources: list[SourceConfig] = []
+
+    def run(self, sources: Iterable[SourceConfig | Path]) -> PipelineResult:
+        self._sources = planning_order(sources)
+        self._queue.seed_sources(
+            (source_directories(source.path), source.priority) for source in self._sources
+        )
+        results: list[ExecutionResult] = []
+        lost_leases: list[Path] = []
+        try:
+            with _Heartbeat(self._queue, self._queue.lease_seconds / 3):
+                while True:
+                    unit = self._queue.lease()
+                    if unit is None:
+                        # Units leased elsewhere may still come back if that worker dies.
+                        if self._queue.remaining() == 0:
+                            break
+                        self._sleep(self._poll_interval)
+                        continue
+                    unit_results = self._process_unit(unit)
+                    if not self._queue.complete(unit):
+                        # The lease expired (e.g. a heartbeat stalled) and another
+                        # worker took the unit over. Our results stay reported:
+                        # their files were written under our directory claims.
+                        lost_leases.append(unit)
+                        if self._telemetry is not None:
+                            self._telemetry.count("lost_leases")
+                    if self._sink is not None:
+                        for result in unit_results:
+                            self._sink(result)
+                    else:
+                        results.extend(unit_results)
+        finally:
+            self._executor.close()
+
+        return PipelineResult(
+            results=self._executor.finish(results),
+            cleanup_candidates=set(self._executor.cleanup_candidates),
+            deferred_errors=self._executor.deferred_errors(),
+            lost_leases=lost_leases,
+        )
+
+    def _concurrency(self, unit: Path) -> int:
+        owners = [source for source in self._sources if unit.is_relative_to(source.path)]
+        if not owners:
+            return 1
+        return max(owners, key=lambda source: len(source.path.parts)).concurrency
+
+    def _process_unit(self, unit: Path) -> list[ExecutionResult]:
+        archive_root = self._config.paths.archive_root
+        resolved = [
+            item
+            for item in (
+                resolve_file(info, archive_root, self._telemetry)
+                for info in iter_scan(
+                    [unit],
+                    self._limiter,
+                    recursive=False,
+                    workers=self._concurrency(unit),
+                    telemetry=self._telemetry,
+                )
+                if isinstance(info, FileInfo)
+            )
+            if item is not None
+        ]
+        if self._progress is not None:
+            self._progress.count("resolve", "files", len(resolved))
+        if not resolved:
+            return []
+
+        directories = sorted({item.target_dir for item in resolved}, key=str)
+        while not self._queue.claim_directories(directories):
+            self._sleep(self._poll_interval)
+        try:
+            if self._catalog is not None:
+                # Other hosts may have written here since the listing was cached.
+                self._catalog.forget(directories)
+            for directory in directories:
+                # A worker that held this unit before and died planned the
+                # same files; its names are free again, so planning repeats
+                # them and finds what it wrote as `target_exists`.
+                self._planner.reserve(
+                    directory, self._queue.planned_names(directory, excluding=unit)
+                )
+            decisions = [self._planner.plan(item) for item in resolved]
+            self._queue.record_planned(unit, (decision.target_path for decision in decisions))
+            for decision in decisions:
+                self._executor.announce(decision)
+            with ThreadPoolExecutor(
+                max_workers=self._config.pipeline.execute_workers
+            ) as pool:
+                return list(
+                    pool.map(
+                        self._executor.execute,
+                        decisions,
+                        [item.info.size_bytes for item in resolved],
+                    )
+                )
+        finally:
+            self._queue.release_directories(directories)
+
+
+def run_cooperative_pipeline(
+    *,
+    config: AppConfig,
+    apply: bool,
+    limiter: RateLimiter | None = None,
+    progress: Progress | None = None,
+    telemetry: Telemetry | None = None,
+    sink: ResultSink | None = None,
+    catalog: ArchiveCatalog | None = None,
+) -> PipelineResult:
+    options = config.coordination
+    queue = WorkQueue(options.queue_file, lease_seconds=options.lease_seconds)
+    return CooperativePipeline(
+        config=config,
+        apply=apply,
+        queue=queue,
+        limiter=limiter,
+        progress=progress,
+        telemetry=telemetry,
+        sink=sink,
+        catalog=catalog,
+    ).run(source_roots(config))
@@ -4,12 +4,14 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from hashlib import sha256
 from pathlib import Path
 from typing import Dict, Iterable, List, Tuple
 
+from media_archiver.archive_filter import partial_key
+from media_archiver.catalog import ArchiveCatalog, CatalogEntry, hash_file
 from media_archiver.scanner import FileInfo
-
+from media_archiver.telemetry import Telemetry, measure
+from media_archiver.throttle import RateLimiter
 
 @dataclass(frozen=True)
 class DuplicateGroup:
@@ -18,58 +20,107 @@ class DuplicateGroup:
     duplicates: List[Path]
 
 
-def _hash_file(path: Path) -> str | None:
-    try:
-        hasher = sha256()
-        with path.open("rb") as handle:
-            while True:
-                chunk = handle.read(1024 * 1024)
-                if not chunk:
-                    break
-                hasher.update(chunk)
-        return hasher.hexdigest()
-    except OSError:
-        return None
-
-
 def _select_original(
     candidates: List[Path],
     resolved_datetimes: Dict[Path, datetime],
+    archived: set[Path] | None = None,
 ) -> Tuple[Path, List[Path]]:
-    def sort_key(path: Path) -> tuple[datetime, str]:
-        return (resolved_datetimes.get(path, datetime.max), str(path))
+    # A copy already in the archive is always the original.
+    def sort_key(path: Path) -> tuple[bool, datetime, str]:
+        in_archive = archived is not None and path in archived
+        return (not in_archive, resolved_datetimes.get(path, datetime.max), str(path))
 
     ordered = sorted(candidates, key=sort_key)
     return ordered[0], ordered[1:]
 
 
+def _maybe_archived(
+    catalog: ArchiveCatalog,
+    group: List[FileInfo],
+    limiter: RateLimiter | None,
+    telemetry: Telemetry | None,
+) -> bool:
+    """False when the archive filter rules out every file of a same-size group."""
+    archive_filter = catalog.archive_filter
+    if archive_filter is None:
+        return True
+    for info in group:
+        with measure(telemetry, "fs.partial_hash"):
+            key = partial_key(info.absolute_path, limiter)
+        if key is None or archive_filter.might_contain(key):
+            if telemetry is not None:
+                telemetry.count("archive_filter", result="maybe")
+            return True
+    if telemetry is not None:
+        telemetry.count("archive_filter", result="negative")
+    return False
+
+
 def find_duplicates(
     *,
     files: Iterable[FileInfo],
     resolved_datetimes: Dict[Path, datetime],
+    content_hashes: Dict[Path, str] | None = None,
+    limiter: RateLimiter | None = None,
+    telemetry: Telemetry | None = None,
+    catalog: ArchiveCatalog | None = None,
 ) -> List[DuplicateGroup]:
+    """
+    Group files with identical content.
+
+    Every hash computed along the way is stored in `content_hashes` when a
+    mapping is given, so later stages (e.g. verified copies) can reuse it.
+    With a `catalog`, files are also compared with archived files of the
+    same size (hashes come from the catalog, computed at most once per
+    file); an archived copy is the group's original. Groups the catalog's
+    archive filter rules out are not compared with the archive at all.
+    """
     size_groups: dict[int, list[FileInfo]] = {}
     for info in files:
         size_groups.setdefault(info.size_bytes, []).append(info)
 
     duplicates: list[DuplicateGroup] = []
+    archived: set[Path] = set()
 
     for size, group in size_groups.items():
-        if len(group) < 2:
+        in_archive: list[CatalogEntry] = []
+        if catalog is not None:
+            scanned = {info.absolute_path for info in group}
+            candidates = [
+                entry
+                for entry in catalog.with_size(size)
+                if catalog.archive_root / entry.path not in scanned
+            ]
+            # The size lookup costs no file I/O; the filter reads 64 KiB per file.
+            if candidates and _maybe_archived(catalog, group, limiter, telemetry):
+                in_archive = candidates
+        if len(group) + len(in_archive) < 2:
             continue
 
         hash_groups: dict[str, list[Path]] = {}
+        for entry in in_archive:
+            content_hash = catalog.content_hash(entry, limiter)
+            if content_hash is None:
+                continue
+            path = catalog.archive_root / entry.path
+            archived.add(path)
+            hash_groups.setdefault(content_hash, []).append(path)
         for info in sorted(group, key=lambda item: str(item.absolute_path)):
-            content_hash = _hash_file(info.absolute_path)
+            with measure(telemetry, "fs.hash"):
+                content_hash = hash_file(info.absolute_path, limiter)
             if content_hash is None:
+                if telemetry is not None:
+                    telemetry.count("errors", reason="hash_failed")
                 continue
+            if content_hashes is not None:
+                content_hashes[info.absolute_path] = content_hash
             hash_groups.setdefault(content_hash, []).append(info.absolute_path)
 
         for content_hash, paths in hash_groups.items():
             if len(paths) < 2:
                 continue
 
-            original, dupes = _select_original(paths, resolved_datetimes)
+            original, dupes = _select_original(paths, resolved_datetimes, archived)
             duplicates.append(
                 DuplicateGroup(
                     content_hash=content_hash,
@@ -79,4 +130,6 @@ def find_duplicates(
             )
 
     duplicates.sort(key=lambda group: (group.content_hash, str(group.original)))
+    if telemetry is not None:
+        telemetry.count("duplicates_found", sum(len(group.duplicates) for group in duplicates))
     return duplicates
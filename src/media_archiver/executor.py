@@ -4,37 +4,722 @@ Phase 6: Filesystem executor.
 Performs copy/move operations based on SortDecision.
 """
 
+from __future__ import annotations
+
+import errno
+import mmap
+import os
+import secrets
 import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from hashlib import sha256
 from pathlib import Path
+from typing import Iterable
 
+from media_archiver.archive_filter import PARTIAL_BYTES, filter_key, partial_key
 from media_archiver.sorter import SortDecision
+from media_archiver.telemetry import Telemetry, measure
+from media_archiver.throttle import RateLimiter
 
 
-def execute_decision(
+STRATEGY_COPY2 = "copy2"
+STRATEGY_MOVE = "move"
+STRATEGY_HARDLINK = "hardlink"
+STRATEGY_RENAME = "rename"
+STRATEGY_REFLINK = "reflink"
+STRATEGY_COPY_FILE_RANGE = "copy_file_range"
+STRATEGY_SENDFILE = "sendfile"
+STRATEGY_BUFFERED = "buffered"
+
+TEMP_SUFFIX = ".partial"
+
+# _IOW(0x94, 9, int) from linux/fs.h; clones all extents of the source fd.
+_FICLONE = 0x40049409
+_COPY_CHUNK_BYTES = 8 * 1024 * 1024
+_BUFFER_BYTES = 1024 * 1024
+
+def _errnos(*names: str) -> frozenset[int]:
+    return frozenset(getattr(errno, name) for name in names if hasattr(errno, name))
+
+
+# errno values meaning "this primitive is not available between these
+# filesystems", as opposed to a real I/O failure; only these are remembered
+# as unsupported for the rest of the run.
+_UNSUPPORTED_ERRNOS = _errnos("EXDEV", "ENOSYS", "EOPNOTSUPP", "ENOTSUP", "ENOTTY")
+# FICLONE also reports EINVAL when the filesystem cannot share extents.
+_REFLINK_UNSUPPORTED_ERRNOS = _UNSUPPORTED_ERRNOS | _errnos("EINVAL")
+# link() reports EPERM on filesystems without hard links and EMLINK when the
+# source has too many; rename() still works then.
+_LINK_UNSUPPORTED_ERRNOS = _UNSUPPORTED_ERRNOS | _errnos("EPERM", "EMLINK")
+
+
+class CopyVerificationError(OSError):
+    """Raised when the written target does not hash to the source content."""
+
+    # Bytes read by the hashers before the mismatch was found.
+    bytes_hashed = 0
+
+
+@dataclass(frozen=True)
+class ExecutionOutcome:
+    performed: bool
+    strategy: str | None = None
+    error: str | None = None
+    content_hash: str | None = None
+    # Archive filter key of the written file; see perform_decision().
+    filter_key: bytes | None = None
+    # Bytes read by the verification hashers, source and target together.
+    bytes_hashed: int = 0
+
+
+@dataclass
+class FilesystemCapabilities:
+    """Remembers which kernel primitives failed between two devices in this run."""
+
+    _unsupported: set[tuple[str, int, int]] = field(default_factory=set)
+
+    def supports(self, strategy: str, source_dev: int, target_dev: int) -> bool:
+        return (strategy, source_dev, target_dev) not in self._unsupported
+
+    def mark_unsupported(self, strategy: str, source_dev: int, target_dev: int) -> None:
+        self._unsupported.add((strategy, source_dev, target_dev))
+
+
+@dataclass(frozen=True)
+class _CopyOptions:
+    capabilities: FilesystemCapabilities
+    kernel: bool
+    verify: bool
+    source_hash: str | None = None
+    limiter: RateLimiter | None = None
+    telemetry: Telemetry | None = None
+    filter_key: bool = False
+
+
+@dataclass(frozen=True)
+class _CopyResult:
+    strategy: str
+    content_hash: str | None = None
+    filter_key: bytes | None = None
+    bytes_hashed: int = 0
+
+
+class TargetDirectories:
+    """
+    Target directories known to exist for the rest of the run.
+
+    Lets the executor skip the per-file mkdir round-trips once a directory
+    has been created or observed.
+    """
+
+    def __init__(self) -> None:
+        self._known: set[Path] = set()
+        self._lock = threading.Lock()
+
+    def __contains__(self, directory: Path) -> bool:
+        with self._lock:
+            return directory in self._known
+
+    def ensure(self, directory: Path) -> None:
+        if directory in self:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._known.add(directory)
+
+    def materialize(self, directories: Iterable[Path], max_workers: int = 8) -> dict[Path, str]:
+        """
+        Create all distinct directories up front, in parallel.
+
+        Returns an error message per directory that could not be created;
+        those are retried (and reported) per file by the executor.
+        """
+        pending = sorted({d for d in directories if d not in self}, key=str)
+        failures: dict[Path, str] = {}
+        if not pending:
+            return failures
+
+        def create(directory: Path) -> tuple[Path, str | None]:
+            try:
+                self.ensure(directory)
+            except OSError as exc:
+                return directory, f"mkdir_failed: {exc.strerror or exc}"
+            return directory, None
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            for directory, error in pool.map(create, pending):
+                if error is not None:
+                    failures[directory] = error
+        return failures
+
+
+def _kernel_copy_strategies() -> list[str]:
+    strategies: list[str] = []
+    if sys.platform.startswith("linux"):
+        strategies.append(STRATEGY_REFLINK)
+    if hasattr(os, "copy_file_range"):
+        strategies.append(STRATEGY_COPY_FILE_RANGE)
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        strategies.append(STRATEGY_SENDFILE)
+    return strategies
+
+
+def _is_unsupported(exc: OSError, strategy: str) -> bool:
+    if strategy == STRATEGY_REFLINK:
+        return exc.errno in _REFLINK_UNSUPPORTED_ERRNOS
+    return exc.errno in _UNSUPPORTED_ERRNOS
+
+
+def _short_copy(offset: int, size: int) -> OSError:
+    # A kernel copy returned 0 before reaching `size`: the source shrank
+    # while it was copied. That is this file's failure, not the primitive's,
+    # even at offset 0, so it must not be remembered as unsupported.
+    return OSError(errno.EIO, f"short copy: {offset} of {size} bytes")
+
+
+def _throttle(limiter: RateLimiter | None, nbytes: int) -> None:
+    if limiter is not None:
+        limiter.acquire(nbytes=nbytes)
+
+
+def _reflink(source_fd: int, target_fd: int, size: int, limiter: RateLimiter | None) -> None:
+    import fcntl
+
+    # A clone only writes metadata; the per-file operation is charged by the caller.
+    fcntl.ioctl(target_fd, _FICLONE, source_fd)
+
+
+def _copy_file_range(
+    source_fd: int,
+    target_fd: int,
+    size: int,
+    limiter: RateLimiter | None,
+) -> None:
+    offset = 0
+    while offset < size:
+        count = min(_COPY_CHUNK_BYTES, size - offset)
+        copied = os.copy_file_range(source_fd, target_fd, count)
+        if copied == 0:
+            raise _short_copy(offset, size)
+        _throttle(limiter, copied)
+        offset += copied
+
+
+def _sendfile(source_fd: int, target_fd: int, size: int, limiter: RateLimiter | None) -> None:
+    offset = 0
+    while offset < size:
+        count = min(_COPY_CHUNK_BYTES, size - offset)
+        sent = os.sendfile(target_fd, source_fd, offset, count)
+        if sent == 0:
+            raise _short_copy(offset, size)
+        _throttle(limiter, sent)
+        offset += sent
+
+
+def _buffered_copy(
+    source_fd: int,
+    target_fd: int,
+    hasher=None,
+    limiter: RateLimiter | None = None,
+) -> bytes:
+    """Copy until EOF; returns the first 64 KiB, for the archive filter key."""
+    head = b""
+    # Charged after each read, by what was read: the EOF read costs nothing.
+    while True:
+        chunk = os.read(source_fd, _BUFFER_BYTES)
+        if not chunk:
+            break
+        _throttle(limiter, len(chunk))
+        if len(head) < PARTIAL_BYTES:
+            head += chunk[: PARTIAL_BYTES - len(head)]
+        if hasher is not None:
+            hasher.update(chunk)
+        view = memoryview(chunk)
+        while view:
+            written = os.write(target_fd, view)
+            view = view[written:]
+    return head
+
+
+_COPY_FUNCTIONS = {
+    STRATEGY_REFLINK: _reflink,
+    STRATEGY_COPY_FILE_RANGE: _copy_file_range,
+    STRATEGY_SENDFILE: _sendfile,
+}
+
+
+def _hash_direct(fd: int) -> str:
+    # O_DIRECT needs page-aligned buffers; anonymous mmap memory is aligned.
+    hasher = sha256()
+    with mmap.mmap(-1, _BUFFER_BYTES) as buffer:
+        view = memoryview(buffer)
+        try:
+            while True:
+                read = os.readv(fd, [buffer])
+                if read == 0:
+                    break
+                hasher.update(view[:read])
+                if read < _BUFFER_BYTES:
+                    break
+        finally:
+            view.release()
+    return hasher.hexdigest()
+
+
+def _hash_uncached(path: Path) -> str:
+    """
+    Hash a freshly written file from the device rather than the page cache.
+
+    Uses O_DIRECT where the filesystem accepts it, otherwise asks the kernel
+    to drop the (already fsynced) cached pages before reading them back.
+    """
+    direct_flag = getattr(os, "O_DIRECT", 0)
+    if direct_flag:
+        try:
+            fd = os.open(path, os.O_RDONLY | direct_flag)
+        except OSError:
+            fd = None
+        if fd is not None:
+            try:
+                return _hash_direct(fd)
+            except OSError as exc:
+                if exc.errno != errno.EINVAL:
+                    raise
+            finally:
+                os.close(fd)
+
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        hasher = sha256()
+        while True:
+            chunk = os.read(fd, _BUFFER_BYTES)
+            if not chunk:
+                break
+            hasher.update(chunk)
+        return hasher.hexdigest()
+    finally:
+        os.close(fd)
+
+
+def _copy_between_fds(
+    source_fd: int,
+    target_fd: int,
+    size: int,
+    source_dev: int,
+    options: _CopyOptions,
+) -> _CopyResult:
+    # Verifying without a known source hash requires the bytes to pass
+    # through userspace once, so the kernel primitives are skipped.
+    if options.kernel and (not options.verify or options.source_hash is not None):
+        target_dev = os.fstat(target_fd).st_dev
+        key = None
+        if options.filter_key:
+            # The bytes skip userspace; this read also warms the page cache.
+            key = filter_key(size, os.pread(source_fd, PARTIAL_BYTES, 0))
+        for candidate in _kernel_copy_strategies():
+            if not options.capabilities.supports(candidate, source_dev, target_dev):
+                continue
+            try:
+                _COPY_FUNCTIONS[candidate](source_fd, target_fd, size, options.limiter)
+            except OSError as exc:
+                # Only fall through when nothing was written yet.
+                if not _is_unsupported(exc, candidate) or os.fstat(target_fd).st_size != 0:
+                    raise
+                options.capabilities.mark_unsupported(candidate, source_dev, target_dev)
+                continue
+            return _CopyResult(
+                strategy=candidate,
+                content_hash=options.source_hash,
+                filter_key=key,
+            )
+
+    hasher = sha256() if options.verify else None
+    head = _buffered_copy(source_fd, target_fd, hasher, options.limiter)
+    return _CopyResult(
+        strategy=STRATEGY_BUFFERED,
+        content_hash=hasher.hexdigest() if hasher is not None else options.source_hash,
+        filter_key=filter_key(size, head) if options.filter_key else None,
+        # Every byte read was hashed and written.
+        bytes_hashed=os.fstat(target_fd).st_size if hasher is not None else 0,
+    )
+
+
+def _temp_name(target: Path) -> Path:
+    # Hidden, unique per attempt: a leftover from an interrupted run never
+    # blocks a retry and is never mistaken for the archived file.
+    token = f"{os.getpid()}-{secrets.token_hex(4)}"
+    return target.with_name(f".{target.name}.{token}{TEMP_SUFFIX}")
+
+
+def _link_into_place(path: Path, target: Path) -> str:
+    """Give `path` the name `target` without ever replacing an existing file."""
+    # link() refuses to replace an existing target, unlike rename() on POSIX.
+    try:
+        os.link(path, target)
+    except FileExistsError:
+        raise
+    except OSError as exc:
+        if exc.errno not in _LINK_UNSUPPORTED_ERRNOS:
+            raise
+    else:
+        os.unlink(path)
+        return STRATEGY_HARDLINK
+
+    if target.exists():
+        raise FileExistsError(errno.EEXIST, "Target already exists", str(target))
+    os.rename(path, target)
+    return STRATEGY_RENAME
+
+
+def _copy2_contents(
+    source: Path,
+    temp: Path,
+    target: Path,
+    options: _CopyOptions,
+    durable: bool,
+) -> _CopyResult:
+    # shutil.copy2 already uses the platform's native copy call here.
+    if options.limiter is not None:
+        options.limiter.acquire(nbytes=os.stat(source).st_size)
+    key = _source_key(source, options)
+    try:
+        shutil.copy2(source, temp)
+        if durable:
+            fd = os.open(temp, os.O_RDWR | getattr(os, "O_BINARY", 0))
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        _link_into_place(temp, target)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    return _CopyResult(strategy=STRATEGY_COPY2, content_hash=options.source_hash, filter_key=key)
+
+
+def _copy_contents(
+    source: Path,
+    target: Path,
+    options: _CopyOptions,
+    *,
+    durable: bool = False,
+) -> _CopyResult:
+    """
+    Copy file contents and metadata without ever overwriting `target`.
+
+    Bytes are written to a hidden temp file next to `target`, which only
+    receives its final name once complete, so an interrupted run never
+    leaves a truncated file under the archive name. Tries the kernel
+    primitives in order of cost and falls back to a plain buffered loop.
+    With `verify`, the temp file is read back uncached and must hash to the
+    source content, otherwise CopyVerificationError is raised. With
+    `durable`, the file is fsynced before it is published.
+    """
+    temp = _temp_name(target)
+    if not options.verify and not _kernel_copy_strategies():
+        return _copy2_contents(source, temp, target, options, durable)
+
+    binary = getattr(os, "O_BINARY", 0)
+    source_fd = os.open(source, os.O_RDONLY | binary)
+    try:
+        source_stat = os.fstat(source_fd)
+        temp_fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | binary, 0o666)
+    except BaseException:
+        os.close(source_fd)
+        raise
+
+    # From here on `temp` was created by us; remove it again on any failure.
+    try:
+        try:
+            result = _copy_between_fds(
+                source_fd,
+                temp_fd,
+                source_stat.st_size,
+                source_stat.st_dev,
+                options,
+            )
+            if options.verify or durable:
+                os.fsync(temp_fd)
+            written = os.fstat(temp_fd).st_size
+        finally:
+            os.close(temp_fd)
+            os.close(source_fd)
+        shutil.copystat(source, temp)
+        if options.verify:
+            with measure(options.telemetry, "fs.hash"):
+                target_hash = _hash_uncached(temp)
+            result = replace(result, bytes_hashed=result.bytes_hashed + written)
+            if target_hash != result.content_hash:
+                error = CopyVerificationError(
+                    errno.EIO, "content hash mismatch after copy", str(target)
+                )
+                error.bytes_hashed = result.bytes_hashed
+                raise error
+        _link_into_place(temp, target)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    return result
+
+
+def _source_key(source: Path, options: _CopyOptions) -> bytes | None:
+    # For paths that move no bytes through userspace; read before the source
+    # is renamed away.
+    return partial_key(source) if options.filter_key else None
+
+
+def _plain_copy(source: Path, target: Path, options: _CopyOptions) -> _CopyResult:
+    """shutil.copy2 that never replaces an existing `target`."""
+    return _copy2_contents(source, _temp_name(target), target, options, durable=False)
+
+
+def _plain_move(source: Path, target: Path, options: _CopyOptions) -> _CopyResult:
+    """shutil.move for a file that never replaces an existing `target`."""
+    key = _source_key(source, options)
+    try:
+        _link_into_place(source, target)
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+    else:
+        return _CopyResult(strategy=STRATEGY_MOVE, filter_key=key)
+    result = _copy2_contents(source, _temp_name(target), target, options, durable=False)
+    os.unlink(source)
+    return replace(result, strategy=STRATEGY_MOVE)
+
+
+def _same_device(source: Path, target_dir: Path) -> bool:
+    return os.stat(source).st_dev == os.stat(target_dir).st_dev
+
+
+def _fsync_directory(directory: Path) -> None:
+    if os.name == "nt":
+        # Directories cannot be opened for fsync on Windows; NTFS journals
+        # the rename itself.
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class DurabilityBatch:
+    """
+    Defers source removal of cross-device moves until the targets are durable.
+
+    Each target directory is fsynced once per flush, however many files were
+    published into it, and only then are the pending sources unlinked.
+    """
+
+    def __init__(self, max_pending: int = 256) -> None:
+        self.max_pending = max_pending
+        self._directories: set[Path] = set()
+        self._pending: list[Path] = []
+        self._lock = threading.Lock()
+
+    def register(self, target_dir: Path, source: Path) -> None:
+        with self._lock:
+            self._directories.add(target_dir)
+            self._pending.append(source)
+
+    def should_flush(self) -> bool:
+        with self._lock:
+            return len(self._pending) >= self.max_pending
+
+    def flush(self) -> dict[Path, str]:
+        """
+        Fsync the collected directories, then unlink the pending sources.
+
+        Returns an error message per source that could not be removed.
+        Sources whose target directory failed to sync are kept.
+        """
+        with self._lock:
+            directories = sorted(self._directories, key=str)
+            pending = self._pending
+            self._directories = set()
+            self._pending = []
+
+        failures: dict[Path, str] = {}
+        try:
+            for directory in directories:
+                _fsync_directory(directory)
+        except OSError as exc:
+            message = f"sync_failed: {exc.strerror or exc}"
+            return {source: message for source in pending}
+
+        for source in pending:
+            try:
+                os.unlink(source)
+            except OSError as exc:
+                failures[source] = f"source_unlink_failed: {exc.strerror or exc}"
+        return failures
+
+
+def _fast_move(
+    source: Path,
+    target: Path,
+    target_dir: Path,
+    options: _CopyOptions,
+    durability: DurabilityBatch | None,
+) -> _CopyResult:
+    if _same_device(source, target_dir):
+        key = _source_key(source, options)
+        try:
+            strategy = _link_into_place(source, target)
+        except OSError as exc:
+            # Same st_dev does not guarantee a shared mount (bind mounts, overlays).
+            if exc.errno != errno.EXDEV:
+                raise
+        else:
+            return _CopyResult(strategy=strategy, content_hash=options.source_hash, filter_key=key)
+
+    result = _copy_contents(source, target, options, durable=True)
+    if durability is None:
+        _fsync_directory(target_dir)
+        os.unlink(source)
+    else:
+        durability.register(target_dir, source)
+    return replace(result, strategy=f"{result.strategy}+unlink")
+
+
+def _fast_copy(source: Path, target: Path, options: _CopyOptions) -> _CopyResult:
+    return _copy_contents(source, target, options)
+
+
+def perform_decision(
     *,
     decision: SortDecision,
     apply: bool,
-) -> bool:
+    fast_paths: bool = False,
+    verify: bool = False,
+    source_hash: str | None = None,
+    capabilities: FilesystemCapabilities | None = None,
+    durability: DurabilityBatch | None = None,
+    directories: TargetDirectories | None = None,
+    limiter: RateLimiter | None = None,
+    telemetry: Telemetry | None = None,
+    filter_key: bool = False,
+) -> ExecutionOutcome:
     """
-    Returns True if an operation was performed, False otherwise.
+    Execute a decision and describe how it was carried out.
+
+    With `fast_paths` the cheapest primitive for the source and target
+    filesystems is selected; otherwise shutil.copy2 and rename are used.
+    An existing target is never replaced, whichever path is taken. With
+    `verify` every byte copy is hashed while streaming and checked against
+    an uncached read of the target. A `source_hash` computed by an earlier
+    stage is trusted instead of re-hashing the source.
+
+    Cross-device moves publish the target atomically and fsync it before the
+    source is removed. With a `durability` batch, the source removal is
+    deferred until the batch is flushed. With `directories`, target
+    directories already known to exist are not created again. A `limiter`
+    is charged one operation per decision plus every byte copied. With
+    `telemetry`, the latency of each copy/move and of verification hashing
+    is recorded. With `filter_key`, the outcome carries the written file's
+    archive filter key, taken from the bytes as they are copied (or from
+    one 64 KiB read of the source where none pass through userspace).
     """
     if decision.action == "skip":
-        return False
+        return ExecutionOutcome(performed=False)
 
     if not apply:
-        return False
+        return ExecutionOutcome(performed=False)
+
+    options = _CopyOptions(
+        capabilities=capabilities if capabilities is not None else FilesystemCapabilities(),
+        kernel=fast_paths,
+        verify=verify,
+        source_hash=source_hash,
+        limiter=limiter,
+        telemetry=telemetry,
+        filter_key=filter_key,
+    )
+
+    if limiter is not None:
+        limiter.acquire(ops=1)
 
+    with measure(telemetry, f"fs.{decision.action}"):
+        return _perform_action(
+            decision,
+            options,
+            own_copy=fast_paths or verify,
+            durability=durability,
+            directories=directories,
+        )
+
+
+def _perform_action(
+    decision: SortDecision,
+    options: _CopyOptions,
+    *,
+    own_copy: bool,
+    durability: DurabilityBatch | None,
+    directories: TargetDirectories | None,
+) -> ExecutionOutcome:
     try:
-        decision.target_dir.mkdir(parents=True, exist_ok=True)
+        if directories is not None:
+            directories.ensure(decision.target_dir)
+        else:
+            decision.target_dir.mkdir(parents=True, exist_ok=True)
 
         if decision.action == "copy":
-            shutil.copy2(decision.source, decision.target_path)
-            return True
+            if own_copy:
+                result = _fast_copy(decision.source, decision.target_path, options)
+            else:
+                result = _plain_copy(decision.source, decision.target_path, options)
+        elif decision.action == "move":
+            if own_copy:
+                result = _fast_move(
+                    decision.source,
+                    decision.target_path,
+                    decision.target_dir,
+                    options,
+                    durability,
+                )
+            else:
+                result = _plain_move(decision.source, decision.target_path, options)
+        else:
+            return ExecutionOutcome(performed=False)
+    except CopyVerificationError as exc:
+        return ExecutionOutcome(
+            performed=False,
+            error=f"verify_failed: {exc.strerror}",
+            bytes_hashed=exc.bytes_hashed,
+        )
+    except OSError as exc:
+        return ExecutionOutcome(
+            performed=False,
+            error=f"{decision.action}_failed: {exc.strerror or exc}",
+        )
+    return ExecutionOutcome(
+        performed=True,
+        strategy=result.strategy,
+        content_hash=result.content_hash,
+        filter_key=result.filter_key,
+        bytes_hashed=result.bytes_hashed,
+    )
 
-        if decision.action == "move":
-            shutil.move(decision.source, decision.target_path)
-            return True
-    except OSError:
-        return False
 
-    return False
+def execute_decision(
+    *,
+    decision: SortDecision,
+    apply: bool,
+    fast_paths: bool = False,
+    verify: bool = False,
+) -> bool:
+    """
+    Returns True if an operation was performed, False otherwise.
+    """
+    return perform_decision(
+        decision=decision,
+        apply=apply,
+        fast_paths=fast_paths,
+        verify=verify,
+    ).performed
@@ -0,0 +1,318 @@
+"""
+Markdown reports split into one page per target year.
+
+The report is a folder with an `index.md` and one `<year>.md` per year of
+the target folders (`other.md` for targets outside a year folder). Every page
+starts with aggregate tables (files and bytes per month folder, per action
+and per reason); all tables are filled in the same pass that writes the
+listings; with an archive catalog, each year also shows what the archive
+holds for it in total. By default only skipped and failed files are listed individually
+(`details="exceptions"`); `details="all"` lists every file.
+
+A page's listing goes to a part file first, because its tables are only
+complete once all entries have been seen. In report order the entries of a
+year are contiguous, so only one part file is open at a time.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import json
+from pathlib import Path
+import shutil
+from typing import IO
+
+from media_archiver.catalog import ArchiveCatalog
+from media_archiver.config import MARKDOWN_DETAILS
+from media_archiver.reporter import (
+    Report,
+    ReportEntry,
+    ReportSummary,
+    error_reason,
+    format_bytes,
+    is_failed,
+    report_path,
+)
+
+
+OTHER_PAGE = "other"
+
+
+def _cell(value: str) -> str:
+    return value.replace("|", "\\|")
+
+
+def _target_parts(target_path: str) -> tuple[str, str]:
+    """(year page, month folder) of a target path."""
+    parent = report_path(target_path).parent
+    year = parent.parent.name
+    if len(year) == 4 and year.isdigit():
+        return year, parent.name
+    return OTHER_PAGE, parent.name
+
+
+def _reason_key(entry: ReportEntry) -> str:
+    if entry.reason is None:
+        return "-"
+    return error_reason(entry.reason)
+
+
+@dataclass
+class _Totals:
+    files: int = 0
+    size_bytes: int = 0
+
+    def add(self, size_bytes: int) -> None:
+        self.files += 1
+        self.size_bytes += size_bytes
+
+
+@dataclass
+class _Aggregate:
+    totals: _Totals = field(default_factory=_Totals)
+    failed: int = 0
+    listed: int = 0
+    by_month: dict[str, _Totals] = field(default_factory=dict)
+    by_action: dict[str, _Totals] = field(default_factory=dict)
+    by_reason: dict[str, _Totals] = field(default_factory=dict)
+
+    def add(self, entry: ReportEntry, month: str) -> None:
+        size = entry.size_bytes
+        self.totals.add(size)
+        if is_failed(entry):
+            self.failed += 1
+        self.by_month.setdefault(month, _Totals()).add(size)
+        self.by_action.setdefault(entry.action, _Totals()).add(size)
+        self.by_reason.setdefault(_reason_key(entry), _Totals()).add(size)
+
+
+def _table(title: str, column: str, rows: dict[str, _Totals]) -> list[str]:
+    lines = [f"## {title}", "", f"| {column} | Files | Bytes |", "| --- | ---: | ---: |"]
+    for name, totals in sorted(rows.items()):
+        lines.append(f"| {_cell(name)} | {totals.files} | {format_bytes(totals.size_bytes)} |")
+    lines.append("")
+    return lines
+
+
+def _aggregate_tables(aggregate: _Aggregate, *, months: bool) -> list[str]:
+    lines: list[str] = []
+    if months:
+        lines.extend(_table("By month folder", "Folder", aggregate.by_month))
+    lines.extend(_table("By action", "Action", aggregate.by_action))
+    lines.extend(_table("By reason", "Reason", aggregate.by_reason))
+    return lines
+
+
+_LISTING_HEADER = "| Source | Target | Action | Reason |\n| --- | --- | --- | --- |\n"
+
+
+def _listing_row(entry: ReportEntry) -> str:
+    return (
+        f"| {_cell(entry.source_path)} | {_cell(entry.target_path)} | {entry.action} "
+        f"| {_cell(entry.reason or '')} |\n"
+    )
+
+
+def _unique_dir(base_path: Path) -> Path:
+    index = 0
+    while True:
+        candidate = base_path if index == 0 else base_path.with_name(
+            f"{base_path.name}_{index:02d}"
+        )
+        try:
+            candidate.mkdir(parents=True)
+            return candidate
+        except FileExistsError:
+            index += 1
+
+
+class YearlyMarkdownWriter:
+    """
+    Writes the per-year Markdown report; feed entries in report order.
+
+    Implements the reporter's EntryStore interface, so the streaming writer
+    can feed it during its merge. finish() writes the pages and returns the
+    path of the index page.
+    """
+
+    def __init__(
+        self,
+        *,
+        output_dir: Path,
+        base_name: str,
+        details: str = "exceptions",
+        catalog: ArchiveCatalog | None = None,
+    ) -> None:
+        if details not in MARKDOWN_DETAILS:
+            raise ValueError(f"unknown markdown details: {details}")
+        self._output_dir = output_dir
+        self._base_name = base_name
+        self._details = details
+        self._catalog = catalog
+        self._directory: Path | None = None
+        self._total = _Aggregate()
+        self._years: dict[str, _Aggregate] = {}
+        self._year: str | None = None
+        self._listing: IO[str] | None = None
+        self._errors = 0
+
+    def __enter__(self) -> "YearlyMarkdownWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def directory(self) -> Path:
+        if self._directory is None:
+            self._directory = _unique_dir(self._output_dir / f"{self._base_name}_markdown")
+        return self._directory
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / "index.md"
+
+    def add_entry(self, entry: ReportEntry) -> None:
+        year, month = _target_parts(entry.target_path)
+        if year != self._year:
+            self._switch_year(year)
+        aggregate = self._years[year]
+        self._total.add(entry, month)
+        aggregate.add(entry, month)
+        if self._details == "all" or entry.action == "skip" or is_failed(entry):
+            if aggregate.listed == 0:
+                self._listing.write(_LISTING_HEADER)
+            self._listing.write(_listing_row(entry))
+            aggregate.listed += 1
+
+    def add_error(self, message: str) -> None:
+        with self._errors_path().open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(message, ensure_ascii=False) + "\n")
+        self._errors += 1
+
+    def finish(self, summary: ReportSummary) -> Path:
+        self.close()
+        for year, aggregate in sorted(self._years.items()):
+            self._write_year(year, aggregate)
+        path = self.index_path
+        with path.open("w", encoding="utf-8") as handle:
+            lines = [
+                "# Report",
+                "",
+                "## Summary",
+                "",
+                f"- Timestamp: {summary.timestamp}",
+                f"- Dry-run: {summary.dry_run}",
+                f"- Move files: {summary.move_files}",
+                f"- Total files: {summary.total_files}",
+                f"- Files copied: {summary.copied}",
+                f"- Files moved: {summary.moved}",
+                f"- Files skipped: {summary.skipped}",
+                f"- Errors: {summary.errors}",
+                f"- Bytes: {format_bytes(self._total.totals.size_bytes)}",
+                "",
+                "## Years",
+                "",
+            ]
+            if self._catalog is None:
+                lines.extend(["| Year | Files | Bytes | Failed |", "| --- | ---: | ---: | ---: |"])
+            else:
+                lines.extend([
+                    "| Year | Files | Bytes | Failed | In archive |",
+                    "| --- | ---: | ---: | ---: | ---: |",
+                ])
+            for year, aggregate in sorted(self._years.items()):
+                row = (
+                    f"| [{year}]({year}.md) | {aggregate.totals.files} "
+                    f"| {format_bytes(aggregate.totals.size_bytes)} | {aggregate.failed} |"
+                )
+                if self._catalog is not None:
+                    row += f" {self._archive_files(year)} |"
+                lines.append(row)
+            lines.append("")
+            lines.extend(_aggregate_tables(self._total, months=False))
+            lines.extend(["## Errors", ""])
+            handle.write("\n".join(lines))
+            if self._errors:
+                with self._errors_path().open("r", encoding="utf-8") as errors:
+                    for line in errors:
+                        handle.write(f"\n- {json.loads(line)}")
+                self._errors_path().unlink()
+            else:
+                handle.write("\n- None")
+            handle.write("\n")
+        return path
+
+    def close(self) -> None:
+        if self._listing is not None:
+            self._listing.close()
+            self._listing = None
+            self._year = None
+
+    def _archive_files(self, year: str) -> str:
+        if year == OTHER_PAGE:
+            return "-"
+        return str(self._catalog.totals(year)[0])
+
+    def _errors_path(self) -> Path:
+        return self.directory / ".errors.part"
+
+    def _part_path(self, year: str) -> Path:
+        return self.directory / f".{year}.md.part"
+
+    def _switch_year(self, year: str) -> None:
+        self.close()
+        self._year = year
+        self._years.setdefault(year, _Aggregate())
+        self._listing = self._part_path(year).open("a", encoding="utf-8")
+
+    def _write_year(self, year: str, aggregate: _Aggregate) -> None:
+        part = self._part_path(year)
+        title = "Files" if self._details == "all" else "Skipped and failed files"
+        with (self.directory / f"{year}.md").open("w", encoding="utf-8") as handle:
+            lines = [
+                f"# Report {year}",
+                "",
+                "[Index](index.md)",
+                "",
+                "## Summary",
+                "",
+                f"- Files: {aggregate.totals.files}",
+                f"- Bytes: {format_bytes(aggregate.totals.size_bytes)}",
+                f"- Failed: {aggregate.failed}",
+            ]
+            if self._catalog is not None and year != OTHER_PAGE:
+                files, size_bytes = self._catalog.totals(year)
+                lines.append(f"- In archive: {files} files, {format_bytes(size_bytes)}")
+            lines.append("")
+            lines.extend(_aggregate_tables(aggregate, months=True))
+            lines.extend([f"## {title}", "", ""])
+            handle.write("\n".join(lines))
+            if aggregate.listed:
+                with part.open("r", encoding="utf-8") as listing:
+                    shutil.copyfileobj(listing, handle)
+            else:
+                handle.write("- None\n")
+        part.unlink()
+
+
+def write_yearly_markdown(
+    report: Report,
+    *,
+    output_dir: Path,
+    prefix: str = "report",
+    details: str = "exceptions",
+    catalog: ArchiveCatalog | None = None,
+) -> Path:
+    """Write `report` in the per-year layout; returns the index page."""
+    with YearlyMarkdownWriter(
+        output_dir=output_dir,
+        base_name=f"{report.summary.timestamp}_{prefix}",
+        details=details,
+        catalog=catalog,
+    ) as writer:
+        for entry in report.entries:
+            writer.add_entry(entry)
+        for message in report.errors:
+            writer.add_error(message)
+        return writer.finish(report.summary)
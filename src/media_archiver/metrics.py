@@ -0,0 +1,78 @@
+"""
+Prometheus textfile export for the node_exporter textfile collector.
+
+Latency histograms come from the Telemetry categories: `fs.stat` becomes
+`media_archiver_fs_duration_seconds{name="stat"}`. Counters become
+`media_archiver_<name>_total` with their labels. The file is replaced
+atomically, because the collector may read it at any time.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from media_archiver.telemetry import LATENCY_BUCKETS, Telemetry
+
+
+PREFIX = "media_archiver"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: tuple[tuple[str, str], ...]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in pairs) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+def render_textfile(telemetry: Telemetry, *, finished_at: float) -> str:
+    lines: list[str] = []
+
+    by_group: dict[str, list[tuple[str, list[int], float]]] = {}
+    for category, (buckets, total) in sorted(telemetry.histograms().items()):
+        group, _, name = category.partition(".")
+        by_group.setdefault(group, []).append((name or group, buckets, total))
+
+    for group, series in sorted(by_group.items()):
+        metric = f"{PREFIX}_{group}_duration_seconds"
+        lines.append(f"# HELP {metric} Latency of {group} operations per call.")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, buckets, total in series:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += count
+                labels = _labels((("name", name), ("le", _format_bound(bound))))
+                lines.append(f"{metric}_bucket{labels} {cumulative}")
+            cumulative += buckets[-1]
+            lines.append(f"{metric}_bucket{_labels((('name', name), ('le', '+Inf')))} {cumulative}")
+            lines.append(f"{metric}_sum{_labels((('name', name),))} {total:.9f}")
+            lines.append(f"{metric}_count{_labels((('name', name),))} {cumulative}")
+
+    counters: dict[str, list[tuple[tuple[tuple[str, str], ...], int]]] = {}
+    for (name, labels), value in sorted(telemetry.counters().items()):
+        counters.setdefault(name, []).append((labels, value))
+    for name, series in counters.items():
+        metric = f"{PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in series:
+            lines.append(f"{metric}{_labels(labels)} {value}")
+
+    metric = f"{PREFIX}_last_run_timestamp_seconds"
+    lines.append(f"# TYPE {metric} gauge")
+    lines.append(f"{metric} {finished_at:.3f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: Path, telemetry: Telemetry, *, finished_at: float) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # node_exporter only reads *.prom files, so the temp name never matches.
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temp_path.write_text(render_textfile(telemetry, finished_at=finished_at), encoding="utf-8")
+    os.replace(temp_path, path)
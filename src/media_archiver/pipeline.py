@@ -0,0 +1,638 @@
+"""
+Staged processing pipeline: scan -> resolve -> plan -> execute -> report.
+
+Stages are connected by bounded queues and run their own worker threads,
+so disk reads, parsing and writes overlap while memory stays bounded by the
+queue sizes. Planning runs on a single thread in scan order, which keeps
+collision suffixes (and therefore the whole result) identical to a purely
+sequential run.
+"""
+
+from __future__ import annotations
+
+import heapq
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable
+
+from media_archiver.catalog import ArchiveCatalog
+from media_archiver.config import AppConfig, SourceConfig
+from media_archiver.datetime_resolver import resolve_datetime
+from media_archiver.executor import (
+    STRATEGY_HARDLINK,
+    STRATEGY_MOVE,
+    STRATEGY_RENAME,
+    DurabilityBatch,
+    ExecutionOutcome,
+    FilesystemCapabilities,
+    TargetDirectories,
+    perform_decision,
+)
+from media_archiver.models import DateTimeResolution
+from media_archiver.profiling import StageProfiler
+from media_archiver.progress import Progress
+from media_archiver.month_normalizer import normalize_month_folder
+from media_archiver.renamer import ensure_unique_name, generate_filename
+from media_archiver.reporter import ExecutionResult, error_reason
+from media_archiver.scanner import FileInfo
+from media_archiver.sorter import SortDecision, build_sort_decision
+from media_archiver.sources import SourceScanner, SourceScanState, source_roots
+from media_archiver.telemetry import Telemetry, measure
+from media_archiver.throttle import RateLimiter
+
+
+_MONTH_NAMES = {
+    1: "Januar",
+    2: "Februar",
+    3: "Maerz",
+    4: "April",
+    5: "Mai",
+    6: "Juni",
+    7: "Juli",
+    8: "August",
+    9: "September",
+    10: "Oktober",
+    11: "November",
+    12: "Dezember",
+}
+
+
+def _month_name_from_datetime(value: datetime) -> str:
+    return _MONTH_NAMES[value.month]
+
+
+@dataclass(frozen=True)
+class ResolvedFile:
+    info: FileInfo
+    resolution: DateTimeResolution
+    month_folder: str
+    target_dir: Path
+
+
+@dataclass(frozen=True)
+class PipelineResult:
+    # Execution results in scan order.
+    results: list[ExecutionResult]
+    cleanup_candidates: set[Path]
+    # True when the run was stopped early; results cover completed work only.
+    interrupted: bool = False
+    # Per-source scan state, in planning order.
+    sources: list[SourceScanState] = field(default_factory=list)
+    # Failed deferred source removals by source. Already applied to `results`;
+    # needed when results were handed to a sink instead.
+    deferred_errors: dict[Path, str] = field(default_factory=dict)
+    # Work units whose lease another worker took over before they were
+    # completed (cooperative driver); their files may be processed twice.
+    lost_leases: list[Path] = field(default_factory=list)
+
+
+# Receives each execution result as soon as it is available, in any order.
+ResultSink = Callable[[ExecutionResult], None]
+
+
+def resolve_file(
+    info: FileInfo,
+    archive_root: Path,
+    telemetry: Telemetry | None = None,
+) -> ResolvedFile | None:
+    """Resolve datetime and target directory; None if no month folder applies."""
+    with measure(telemetry, "stage.resolve"):
+        return _resolve_file(info, archive_root)
+
+
+def _resolve_file(info: FileInfo, archive_root: Path) -> ResolvedFile | None:
+    resolution = resolve_datetime(
+        filename=info.name,
+        exif_datetime=None,
+        fs_modified=datetime.fromtimestamp(info.modified_timestamp),
+    )
+
+    month_folder = normalize_month_folder(_month_name_from_datetime(resolution.datetime))
+    if month_folder is None:
+        return None
+
+    target_dir = archive_root / f"{resolution.datetime.year:04d}" / month_folder
+    return ResolvedFile(
+        info=info,
+        resolution=resolution,
+        month_folder=month_folder,
+        target_dir=target_dir,
+    )
+
+
+class Planner:
+    """
+    Assigns canonical names and actions.
+
+    Stateful: names already planned in this run are reserved, so items must
+    be planned in a deterministic order (scan order).
+    """
+
+    def __init__(
+        self,
+        *,
+        config: AppConfig,
+        current_time: datetime,
+        progress: Progress | None = None,
+        telemetry: Telemetry | None = None,
+        catalog: ArchiveCatalog | None = None,
+    ) -> None:
+        self._config = config
+        self._current_time = current_time
+        self._progress = progress
+        self._telemetry = telemetry
+        self._catalog = catalog
+        self._planned_names: dict[Path, set[str]] = defaultdict(set)
+
+    def reserve(self, target_dir: Path, names: Iterable[str]) -> None:
+        """Treat `names` as already planned in `target_dir` (e.g. by another worker)."""
+        self._planned_names[target_dir].update(names)
+
+    def plan(self, item: ResolvedFile) -> SortDecision:
+        with measure(self._telemetry, "stage.plan"):
+            return self._plan(item)
+
+    def adopt(
+        self,
+        item: ResolvedFile,
+        decision: SortDecision,
+        *,
+        same_names: bool = False,
+    ) -> SortDecision:
+        """
+        Take over `decision`, planned for `item` by another planner (e.g. in a
+        shard worker), if it has the name this planner would assign; plan the
+        item again otherwise. With `same_names` the caller knows that all
+        names planned in the folder so far came from that other planner, so
+        the name is taken without the check.
+        """
+        with measure(self._telemetry, "stage.plan"):
+            existing_names = self._planned_names[item.target_dir]
+            if not same_names and (
+                self._canonical_name(item, existing_names) != decision.target_path.name
+            ):
+                return self._plan(item)
+            existing_names.add(decision.target_path.name)
+            if self._progress is not None:
+                self._progress.count("plan", "files")
+            return decision
+
+    def _canonical_name(self, item: ResolvedFile, existing_names: set[str]) -> str:
+        with measure(self._telemetry, "cpu.naming"):
+            if self._config.naming.preserve_original_filename:
+                return ensure_unique_name(
+                    original_name=item.info.name,
+                    existing_names=existing_names,
+                )
+            return generate_filename(
+                original_name=item.info.name,
+                resolved_datetime=item.resolution.datetime,
+                source=item.resolution.source,
+                existing_names=existing_names,
+            )
+
+    def _plan(self, item: ResolvedFile) -> SortDecision:
+        config = self._config
+        info = item.info
+        resolution = item.resolution
+        existing_names = self._planned_names[item.target_dir]
+        canonical_name = self._canonical_name(item, existing_names)
+        existing_names.add(canonical_name)
+        target_path = item.target_dir / canonical_name
+        if self._progress is not None:
+            self._progress.count("plan", "files")
+
+        if resolution.datetime > self._current_time:
+            return SortDecision(
+                source=info.absolute_path,
+                target_dir=item.target_dir,
+                target_path=target_path,
+                action="skip",
+                reason="future_date",
+                resolution=resolution,
+            )
+
+        with measure(self._telemetry, "fs.exists"):
+            if self._catalog is not None:
+                target_exists = self._catalog.contains(target_path)
+            else:
+                target_exists = target_path.exists()
+        decision = build_sort_decision(
+            archive_root=config.paths.archive_root,
+            source_path=info.absolute_path,
+            resolved_datetime=resolution.datetime,
+            month_folder=item.month_folder,
+            canonical_name=canonical_name,
+            move_files=config.behavior.move_files,
+            target_exists=target_exists,
+        )
+        return replace(decision, resolution=resolution)
+
+
+def _copied_bytes(outcome: ExecutionOutcome, size_bytes: int) -> int:
+    if not outcome.performed or outcome.strategy is None:
+        return 0
+    # Renames and links publish without moving any data.
+    base_strategy = outcome.strategy.split("+", 1)[0]
+    if base_strategy in (STRATEGY_RENAME, STRATEGY_HARDLINK, STRATEGY_MOVE):
+        return 0
+    return size_bytes
+
+
+class DecisionExecutor:
+    """Executes decisions with run-wide executor state; safe to share between threads."""
+
+    def __init__(
+        self,
+        *,
+        config: AppConfig,
+        apply: bool,
+        limiter: RateLimiter | None = None,
+        progress: Progress | None = None,
+        telemetry: Telemetry | None = None,
+        catalog: ArchiveCatalog | None = None,
+    ) -> None:
+        self._config = config
+        self._apply = apply
+        self._limiter = limiter
+        self._progress = progress
+        self._telemetry = telemetry
+        self._catalog = catalog
+        self._capabilities = FilesystemCapabilities()
+        self._durability = DurabilityBatch()
+        self.directories = TargetDirectories()
+        self._announced: set[Path] = set()
+        self._mkdir_pool = ThreadPoolExecutor(
+            max_workers=config.execution.directory_workers,
+            thread_name_prefix="media-archiver-mkdir",
+        )
+        self._lock = threading.Lock()
+        self._unlink_failures: dict[Path, str] = {}
+        self.cleanup_candidates: set[Path] = set()
+
+    def announce(self, decision: SortDecision) -> None:
+        """
+        Start creating a decision's target directory ahead of its execution.
+
+        Each distinct directory is submitted once. Failures are ignored here;
+        the executor retries and reports them per file.
+        """
+        if not self._apply or decision.action == "skip":
+            return
+        if decision.target_dir in self._announced:
+            return
+        self._announced.add(decision.target_dir)
+        self._mkdir_pool.submit(self._create_quietly, decision.target_dir)
+
+    def _create_quietly(self, directory: Path) -> None:
+        try:
+            with measure(self._telemetry, "fs.mkdir"):
+                self.directories.ensure(directory)
+        except OSError:
+            pass
+
+    def execute(self, decision: SortDecision, size_bytes: int = 0) -> ExecutionResult:
+        with measure(self._telemetry, "stage.execute"):
+            return self._execute(decision, size_bytes)
+
+    def _execute(self, decision: SortDecision, size_bytes: int) -> ExecutionResult:
+        outcome = perform_decision(
+            decision=decision,
+            apply=self._apply,
+            fast_paths=self._config.execution.fast_paths,
+            verify=self._config.execution.verify_copies,
+            capabilities=self._capabilities,
+            durability=self._durability,
+            directories=self.directories,
+            limiter=self._limiter,
+            telemetry=self._telemetry,
+            filter_key=self._catalog is not None and self._catalog.archive_filter is not None,
+        )
+        if self._durability.should_flush():
+            self._flush_durability()
+
+        if outcome.performed and decision.action == "move":
+            with self._lock:
+                self.cleanup_candidates.add(decision.source.parent)
+        if outcome.performed and self._catalog is not None:
+            self._record(decision, outcome)
+        self._count(outcome, size_bytes)
+
+        return ExecutionResult(
+            decision=decision,
+            performed=outcome.performed,
+            error=outcome.error,
+            strategy=outcome.strategy,
+            size_bytes=size_bytes,
+        )
+
+    def _record(self, decision: SortDecision, outcome: ExecutionOutcome) -> None:
+        try:
+            self._catalog.record(
+                decision.target_path,
+                resolution=decision.resolution,
+                content_hash=outcome.content_hash,
+                filter_key=outcome.filter_key,
+            )
+        except OSError:
+            # record() dropped the directory's recorded mtime, so the file
+            # is picked up when the directory is next looked up.
+            pass
+
+    def _count(self, outcome: ExecutionOutcome, size_bytes: int) -> None:
+        copied = _copied_bytes(outcome, size_bytes)
+        hashed = outcome.bytes_hashed
+        if self._telemetry is not None:
+            if outcome.error is not None:
+                self._telemetry.count("errors", reason=error_reason(outcome.error))
+            if copied:
+                self._telemetry.count("bytes_copied", copied)
+        if self._progress is not None:
+            self._progress.count("execute", "files")
+            if outcome.error is not None:
+                self._progress.count("execute", "errors")
+            if copied:
+                self._progress.count("execute", "bytes_copied", copied)
+            if hashed:
+                self._progress.count("execute", "bytes_hashed", hashed)
+
+    def finish(self, results: list[ExecutionResult]) -> list[ExecutionResult]:
+        """Flush deferred source removals and attach their failures to `results`."""
+        self.close()
+        self._flush_durability()
+        with self._lock:
+            failures = dict(self._unlink_failures)
+        if not failures:
+            return results
+        return [
+            replace(result, error=failures[result.decision.source])
+            if result.decision.source in failures
+            else result
+            for result in results
+        ]
+
+    def deferred_errors(self) -> dict[Path, str]:
+        """Failed deferred source removals; complete after finish()."""
+        with self._lock:
+            return dict(self._unlink_failures)
+
+    def close(self) -> None:
+        self._mkdir_pool.shutdown(wait=True)
+
+    def _flush_durability(self) -> None:
+        with measure(self._telemetry, "fs.durability_flush"):
+            failures = self._durability.flush()
+        if failures and self._telemetry is not None:
+            for error in failures.values():
+                self._telemetry.count("errors", reason=error_reason(error))
+        if failures:
+            with self._lock:
+                self._unlink_failures.update(failures)
+
+
+class _Aborted(Exception):
+    pass
+
+
+class _Channel:
+    """Bounded queue whose blocking calls give up once the pipeline aborts."""
+
+    def __init__(self, maxsize: int, abort: threading.Event) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._abort = abort
+
+    def put(self, item) -> None:
+        while True:
+            if self._abort.is_set():
+                raise _Aborted
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(self):
+        while True:
+            if self._abort.is_set():
+                raise _Aborted
+            try:
+                return self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+
+_DONE = object()
+
+
+class StagedPipeline:
+    """Thread-based driver wiring the stages together with bounded queues."""
+
+    def __init__(
+        self,
+        *,
+        config: AppConfig,
+        apply: bool,
+        limiter: RateLimiter | None = None,
+        current_time: datetime | None = None,
+        progress: Progress | None = None,
+        telemetry: Telemetry | None = None,
+        profiler: StageProfiler | None = None,
+        sink: ResultSink | None = None,
+        catalog: ArchiveCatalog | None = None,
+    ) -> None:
+        self._config = config
+        self._limiter = limiter
+        self._progress = progress
+        self._telemetry = telemetry
+        self._profiler = profiler
+        self._sink = sink
+        self._planner = Planner(
+            config=config,
+            current_time=current_time if current_time is not None else datetime.now(),
+            progress=progress,
+            telemetry=telemetry,
+            catalog=catalog,
+        )
+        self._executor = DecisionExecutor(
+            config=config,
+            apply=apply,
+            limiter=limiter,
+            progress=progress,
+            telemetry=telemetry,
+            catalog=catalog,
+        )
+        self._abort = threading.Event()
+        self._errors: list[BaseException] = []
+        options = config.pipeline
+        self._resolve_workers = options.resolve_workers
+        self._execute_workers = options.execute_workers
+        self._scanned = _Channel(options.queue_size, self._abort)
+        self._resolved = _Channel(options.queue_size, self._abort)
+        self._planned = _Channel(options.queue_size, self._abort)
+        self._executed = _Channel(options.queue_size, self._abort)
+        if progress is not None:
+            progress.watch_queue("scanned", self._scanned.qsize)
+            progress.watch_queue("resolved", self._resolved.qsize)
+            progress.watch_queue("planned", self._planned.qsize)
+            progress.watch_queue("executed", self._executed.qsize)
+
+    def run(self, sources: Iterable[SourceConfig | Path]) -> PipelineResult:
+        scanner = SourceScanner(
+            sources,
+            limiter=self._limiter,
+            buffer_size=self._config.pipeline.queue_size,
+            progress=self._progress,
+            telemetry=self._telemetry,
+        )
+        threads = [self._spawn("scan", self._scan_stage, scanner)]
+        threads += [
+            self._spawn(f"resolve-{index}", self._resolve_stage)
+            for index in range(self._resolve_workers)
+        ]
+        threads.append(self._spawn("plan", self._plan_stage))
+        threads += [
+            self._spawn(f"execute-{index}", self._execute_stage)
+            for index in range(self._execute_workers)
+        ]
+
+        try:
+            collected = self._report_stage()
+        except _Aborted:
+            collected = []
+        except BaseException as exc:
+            self._fail(exc)
+            collected = []
+        finally:
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            self._executor.close()
+            raise self._errors[0]
+
+        results = [result for _, result in sorted(collected, key=lambda item: item[0])]
+        return PipelineResult(
+            results=self._executor.finish(results),
+            cleanup_candidates=set(self._executor.cleanup_candidates),
+            sources=scanner.states,
+            deferred_errors=self._executor.deferred_errors(),
+        )
+
+    def _spawn(self, name: str, target: Callable, *args) -> threading.Thread:
+        def runner() -> None:
+            try:
+                if self._profiler is None:
+                    target(*args)
+                else:
+                    with self._profiler.stage(name):
+                        target(*args)
+            except _Aborted:
+                pass
+            except BaseException as exc:
+                self._fail(exc)
+
+        thread = threading.Thread(target=runner, name=f"media-archiver-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _fail(self, exc: BaseException) -> None:
+        self._errors.append(exc)
+        self._abort.set()
+
+    def _scan_stage(self, scanner: SourceScanner) -> None:
+        files = iter(scanner)
+        try:
+            for sequence, info in enumerate(files):
+                self._scanned.put((sequence, info))
+        finally:
+            files.close()
+        for _ in range(self._resolve_workers):
+            self._scanned.put(_DONE)
+
+    def _resolve_stage(self) -> None:
+        archive_root = self._config.paths.archive_root
+        while True:
+            item = self._scanned.get()
+            if item is _DONE:
+                self._resolved.put(_DONE)
+                return
+            sequence, info = item
+            resolved = resolve_file(info, archive_root, self._telemetry)
+            if self._progress is not None:
+                self._progress.count("resolve", "files")
+            self._resolved.put((sequence, resolved))
+
+    def _plan_stage(self) -> None:
+        # Resolve workers finish out of order; re-establish scan order here.
+        pending: list[tuple[int, ResolvedFile | None]] = []
+        next_sequence = 0
+        finished_workers = 0
+        while finished_workers < self._resolve_workers:
+            item = self._resolved.get()
+            if item is _DONE:
+                finished_workers += 1
+                continue
+            heapq.heappush(pending, item)
+            while pending and pending[0][0] == next_sequence:
+                sequence, resolved = heapq.heappop(pending)
+                next_sequence += 1
+                if resolved is not None:
+                    decision = self._planner.plan(resolved)
+                    self._executor.announce(decision)
+                    self._planned.put((sequence, decision, resolved.info.size_bytes))
+        for _ in range(self._execute_workers):
+            self._planned.put(_DONE)
+
+    def _execute_stage(self) -> None:
+        while True:
+            item = self._planned.get()
+            if item is _DONE:
+                self._executed.put(_DONE)
+                return
+            sequence, decision, size_bytes = item
+            self._executed.put((sequence, self._executor.execute(decision, size_bytes)))
+
+    def _report_stage(self) -> list[tuple[int, ExecutionResult]]:
+        collected: list[tuple[int, ExecutionResult]] = []
+        finished_workers = 0
+        while finished_workers < self._execute_workers:
+            item = self._executed.get()
+            if item is _DONE:
+                finished_workers += 1
+                continue
+            if self._sink is not None:
+                self._sink(item[1])
+            else:
+                collected.append(item)
+        return collected
+
+
+def run_staged_pipeline(
+    *,
+    config: AppConfig,
+    apply: bool,
+    limiter: RateLimiter | None = None,
+    progress: Progress | None = None,
+    telemetry: Telemetry | None = None,
+    profiler: StageProfiler | None = None,
+    sink: ResultSink | None = None,
+    catalog: ArchiveCatalog | None = None,
+) -> PipelineResult:
+    return StagedPipeline(
+        config=config,
+        apply=apply,
+        limiter=limiter,
+        progress=progress,
+        telemetry=telemetry,
+        profiler=profiler,
+        sink=sink,
+        catalog=catalog,
+    ).run(source_roots(config))
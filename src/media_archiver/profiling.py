@@ -0,0 +1,173 @@
+"""
+`--profile` support: sampled call statistics and tracemalloc output per
+pipeline stage.
+
+Every profiled stage (or stage worker thread) gets its own `.pstats` file,
+readable with `python -m pstats`, and a text file with the top-N memory
+allocation sites at the moment the stage finished.
+
+Stages run concurrently in worker threads, and cProfile cannot profile them
+separately: from Python 3.12 on it hooks the whole process and refuses a
+second active profiler. Instead, one sampler thread reads the stacks of the
+threads inside a stage every few milliseconds. Times in the `.pstats` files
+are estimated from the samples, and call counts are sample counts. Drivers
+that hand their stages to thread pools are profiled as one stage that
+samples every thread; its times add up over the threads.
+
+tracemalloc is process wide, so overlapping stages see each other's
+allocations; the snapshots show what was alive when each stage ended.
+"""
+
+from __future__ import annotations
+
+import marshal
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Iterator
+
+
+_SAMPLE_INTERVAL = 0.002
+
+
+def _label(code: CodeType) -> tuple[str, int, str]:
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+class _StageSamples:
+    """Stack samples of one stage, in the layout pstats reads."""
+
+    def __init__(self) -> None:
+        # function -> [primitive calls, calls, own time, cumulative time, callers]
+        self._stats: dict[tuple, list] = {}
+
+    def add(self, frame: FrameType | None, seconds: float) -> None:
+        stack: list[tuple[str, int, str]] = []
+        while frame is not None:
+            stack.append(_label(frame.f_code))
+            frame = frame.f_back
+        seen: set[tuple[str, int, str]] = set()
+        for depth, function in enumerate(stack):
+            entry = self._stats.setdefault(function, [0, 0, 0.0, 0.0, {}])
+            own = seconds if depth == 0 else 0.0
+            entry[2] += own
+            # Recursive functions count once per sample.
+            if function not in seen:
+                seen.add(function)
+                entry[0] += 1
+                entry[1] += 1
+                entry[3] += seconds
+            if depth + 1 < len(stack):
+                calls = entry[4].setdefault(stack[depth + 1], [0, 0, 0.0, 0.0])
+                calls[0] += 1
+                calls[1] += 1
+                calls[2] += own
+                calls[3] += seconds
+
+    @property
+    def empty(self) -> bool:
+        return not self._stats
+
+    def dump(self, path: Path) -> None:
+        stats = {
+            function: (cc, nc, tt, ct, {caller: tuple(calls) for caller, calls in callers.items()})
+            for function, (cc, nc, tt, ct, callers) in self._stats.items()
+        }
+        with path.open("wb") as handle:
+            marshal.dump(stats, handle)
+
+
+class StageProfiler:
+    def __init__(
+        self,
+        output_dir: Path,
+        *,
+        top_n: int = 25,
+        interval: float = _SAMPLE_INTERVAL,
+    ) -> None:
+        self.output_dir = output_dir
+        self._top_n = top_n
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+        # Thread id -> samples of the stages that thread is inside; None for
+        # stages that sample every thread.
+        self._active: dict[int | None, list[_StageSamples]] = {}
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def __enter__(self) -> "StageProfiler":
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextmanager
+    def stage(self, name: str, *, all_threads: bool = False) -> Iterator[None]:
+        """Sample the calling thread (or, with `all_threads`, every thread) while the block runs."""
+        thread = None if all_threads else threading.get_ident()
+        samples = _StageSamples()
+        with self._lock:
+            if self._sampler is None:
+                self._stop.clear()
+                self._sampler = threading.Thread(
+                    target=self._sample,
+                    name="media-archiver-profiler",
+                    daemon=True,
+                )
+                self._sampler.start()
+            self._active.setdefault(thread, []).append(samples)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[thread].remove(samples)
+                if not self._active[thread]:
+                    del self._active[thread]
+                if samples.empty:
+                    # Shorter than one interval; pstats cannot read an empty file.
+                    samples.add(sys._getframe(), 0.0)
+            self._write(name, samples)
+
+    def _sample(self) -> None:
+        sampler = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self._interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            frames = sys._current_frames()
+            del frames[sampler]
+            with self._lock:
+                for thread, stages in self._active.items():
+                    stacks = frames.values() if thread is None else [frames.get(thread)]
+                    for frame in stacks:
+                        for samples in stages:
+                            samples.add(frame, elapsed)
+
+    def _write(self, name: str, samples: _StageSamples) -> None:
+        # Several threads finish stages concurrently; keep the files intact.
+        with self._lock:
+            samples.dump(self.output_dir / f"{name}.pstats")
+            if not tracemalloc.is_tracing():
+                return
+            statistics = tracemalloc.take_snapshot().statistics("lineno")
+            lines = [f"Top {self._top_n} allocation sites when stage '{name}' finished", ""]
+            lines.extend(str(statistic) for statistic in statistics[: self._top_n])
+            (self.output_dir / f"{name}.memory.txt").write_text(
+                "\n".join(lines) + "\n",
+                encoding="utf-8",
+            )
@@ -0,0 +1,166 @@
+"""
+Live progress: per-stage counters, throughput and ETA.
+
+Stages update a shared Progress object. A ProgressMonitor samples it on a
+fixed interval, redraws a single status line on a TTY and rewrites a JSON
+status file, so long runs can be watched from a terminal or a dashboard.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, TextIO
+
+from media_archiver.reporter import format_bytes
+
+
+STAGES = ("scan", "resolve", "plan", "execute")
+
+
+class Progress:
+    """Thread-safe counters per stage plus queue-depth gauges."""
+
+    def __init__(self, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._started = clock()
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[str, int]] = {stage: {} for stage in STAGES}
+        self._finished: set[str] = set()
+        self._queues: dict[str, Callable[[], int]] = {}
+
+    def count(self, stage: str, name: str, amount: int = 1) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(stage, {})
+            counters[name] = counters.get(name, 0) + amount
+
+    def finish_stage(self, stage: str) -> None:
+        with self._lock:
+            self._finished.add(stage)
+
+    def watch_queue(self, name: str, depth: Callable[[], int]) -> None:
+        with self._lock:
+            self._queues[name] = depth
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {stage: dict(values) for stage, values in self._counters.items()}
+            finished = sorted(self._finished)
+            queues = dict(self._queues)
+        elapsed = max(self._clock() - self._started, 1e-9)
+
+        executed = counters["execute"].get("files", 0)
+        copied = counters["execute"].get("bytes_copied", 0)
+        files_per_second = executed / elapsed
+        eta_seconds = None
+        if "scan" in finished and files_per_second > 0:
+            remaining = counters["scan"].get("files", 0) - executed
+            eta_seconds = max(remaining, 0) / files_per_second
+
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": counters,
+            "finished_stages": finished,
+            "queues": {name: depth() for name, depth in sorted(queues.items())},
+            "files_per_second": round(files_per_second, 3),
+            "bytes_copied_per_second": round(copied / elapsed, 3),
+            "eta_seconds": None if eta_seconds is None else round(eta_seconds, 1),
+        }
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def render_line(snapshot: dict) -> str:
+    stages = snapshot["stages"]
+    scan, execute = stages["scan"], stages["execute"]
+    parts = [
+        f"scanned {scan.get('files', 0)} ({format_bytes(scan.get('bytes', 0))})",
+        f"planned {stages['plan'].get('files', 0)}",
+        f"done {execute.get('files', 0)} ({snapshot['files_per_second']:.1f} files/s, "
+        f"{format_bytes(snapshot['bytes_copied_per_second'])}/s)",
+        f"hashed {format_bytes(execute.get('bytes_hashed', 0))}",
+        f"errors {execute.get('errors', 0)}",
+    ]
+    if snapshot["queues"]:
+        parts.append(
+            "queues " + " ".join(f"{name}:{depth}" for name, depth in snapshot["queues"].items())
+        )
+    eta = snapshot["eta_seconds"]
+    parts.append(f"ETA {_format_duration(eta)}" if eta is not None else "ETA --:--:--")
+    return " | ".join(parts)
+
+
+def write_status_file(path: Path, snapshot: dict) -> None:
+    """Replace the status file atomically so readers never see partial JSON."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temp_path.write_text(json.dumps(snapshot, indent=2), encoding="utf-8")
+    os.replace(temp_path, path)
+
+
+class ProgressMonitor:
+    """Background sampler; use as a context manager around a run."""
+
+    def __init__(
+        self,
+        progress: Progress,
+        *,
+        stream: TextIO | None = None,
+        status_file: Path | None = None,
+        interval: float = 1.0,
+    ) -> None:
+        self._progress = progress
+        # The status line is only drawn on an interactive terminal.
+        self._stream = stream
+        self._tty = stream is not None and stream.isatty()
+        self._status_file = status_file
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="media-archiver-progress",
+            daemon=True,
+        )
+        self._last_width = 0
+
+    @property
+    def active(self) -> bool:
+        return self._tty or self._status_file is not None
+
+    def __enter__(self) -> "ProgressMonitor":
+        if self.active:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if not self.active:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._emit(final=True, state="failed" if exc_info[0] is not None else "finished")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._emit(final=False)
+
+    def _emit(self, *, final: bool, state: str = "running") -> None:
+        snapshot = self._progress.snapshot()
+        snapshot["state"] = state
+        if self._tty:
+            line = render_line(snapshot)
+            padding = " " * max(self._last_width - len(line), 0)
+            self._last_width = len(line)
+            self._stream.write("\r" + line + padding + ("\n" if final else ""))
+            self._stream.flush()
+        if self._status_file is not None:
+            try:
+                write_status_file(self._status_file, snapshot)
+            except OSError:
+                # Monitoring must never break the run itself.
+                pass
@@ -0,0 +1,155 @@
+"""
+Performance regression gate over benchmark results.
+
+A baseline is the JSON written by `python -m media_archiver.benchmark
+--output`. Each stage is compared on its median time. A stage has regressed
+when its median grew by more than the allowed percentage and the absolute
+change is larger than the noise: the larger of a fixed floor and the spread
+(median absolute deviation) of both runs' repetitions. Stages are compared
+one by one, including the per-stage breakdown of the end-to-end run, so a
+slower renamer or reporter is named directly.
+"""
+
+from __future__ import annotations
+
+import json
+import statistics
+from dataclasses import dataclass
+from pathlib import Path
+
+
+STATUS_OK = "ok"
+STATUS_REGRESSED = "regressed"
+STATUS_IMPROVED = "improved"
+STATUS_MISSING = "missing"
+STATUS_NEW = "new"
+
+
+@dataclass(frozen=True)
+class StageComparison:
+    stage: str
+    status: str
+    baseline_seconds: float | None
+    current_seconds: float | None
+    noise_seconds: float
+
+    @property
+    def change_percent(self) -> float | None:
+        if not self.baseline_seconds or self.current_seconds is None:
+            return None
+        return (self.current_seconds - self.baseline_seconds) / self.baseline_seconds * 100
+
+
+def load_baseline(path: Path) -> dict:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(data, dict) or not isinstance(data.get("stages"), dict):
+        raise ValueError(f"not a benchmark result: {path}")
+    return data
+
+
+def save_baseline(path: Path, result: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+
+
+def _median_absolute_deviation(values: list[float]) -> float:
+    if len(values) < 2:
+        return 0.0
+    center = statistics.median(values)
+    return statistics.median(abs(value - center) for value in values)
+
+
+def compare_stage(
+    stage: str,
+    baseline: list[float],
+    current: list[float],
+    *,
+    max_regression_percent: float,
+    noise_floor_seconds: float,
+) -> StageComparison:
+    baseline_median = statistics.median(baseline)
+    current_median = statistics.median(current)
+    noise = max(
+        noise_floor_seconds,
+        _median_absolute_deviation(baseline) + _median_absolute_deviation(current),
+    )
+    delta = current_median - baseline_median
+    allowed = baseline_median * max_regression_percent / 100
+
+    status = STATUS_OK
+    if delta > allowed and delta > noise:
+        status = STATUS_REGRESSED
+    elif -delta > allowed and -delta > noise:
+        status = STATUS_IMPROVED
+    return StageComparison(
+        stage=stage,
+        status=status,
+        baseline_seconds=baseline_median,
+        current_seconds=current_median,
+        noise_seconds=noise,
+    )
+
+
+def compare_results(
+    baseline: dict,
+    current: dict,
+    *,
+    max_regression_percent: float = 10.0,
+    noise_floor_seconds: float = 0.01,
+) -> list[StageComparison]:
+    """Compare every stage of two benchmark results, in the current run's order."""
+    baseline_stages = baseline["stages"]
+    current_stages = current["stages"]
+    comparisons: list[StageComparison] = []
+    for stage, values in current_stages.items():
+        if stage not in baseline_stages:
+            comparisons.append(
+                StageComparison(
+                    stage=stage,
+                    status=STATUS_NEW,
+                    baseline_seconds=None,
+                    current_seconds=values["median_seconds"],
+                    noise_seconds=0.0,
+                )
+            )
+            continue
+        comparisons.append(
+            compare_stage(
+                stage,
+                baseline_stages[stage]["seconds"],
+                values["seconds"],
+                max_regression_percent=max_regression_percent,
+                noise_floor_seconds=noise_floor_seconds,
+            )
+        )
+    for stage, values in baseline_stages.items():
+        if stage not in current_stages:
+            comparisons.append(
+                StageComparison(
+                    stage=stage,
+                    status=STATUS_MISSING,
+                    baseline_seconds=values["median_seconds"],
+                    current_seconds=None,
+                    noise_seconds=0.0,
+                )
+            )
+    return comparisons
+
+
+def regressions(comparisons: list[StageComparison]) -> list[StageComparison]:
+    return [item for item in comparisons if item.status == STATUS_REGRESSED]
+
+
+def format_comparison(comparisons: list[StageComparison]) -> str:
+    def seconds(value: float | None) -> str:
+        return "-" if value is None else f"{value:.4f}"
+
+    lines = [f"{'stage':<24} {'baseline s':>10} {'current s':>10} {'change':>8}  status"]
+    for item in comparisons:
+        change = item.change_percent
+        lines.append(
+            f"{item.stage:<24} {seconds(item.baseline_seconds):>10} "
+            f"{seconds(item.current_seconds):>10} "
+            f"{'-' if change is None else f'{change:+.1f}%':>8}  {item.status}"
+        )
+    return "\n".join(lines)
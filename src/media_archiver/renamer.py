@@ -36,6 +36,20 @@ def _apply_collision_suffix(base_name: str, existing: Iterable[str]) -> str:
         index += 1
 
 
+def canonical_base_name(
+    *,
+    original_name: str,
+    resolved_datetime: datetime,
+    source: DateTimeSource,
+) -> str:
+    """Canonical name before collision handling (what generate_filename starts from)."""
+    return _format_base_name(
+        original_name=original_name,
+        resolved_datetime=resolved_datetime,
+        source=source,
+    )
+
+
 def ensure_unique_name(*, original_name: str, existing_names: Iterable[str]) -> str:
     return _apply_collision_suffix(original_name, existing_names)
 
@@ -0,0 +1,209 @@
+"""
+Differences between two runs' reports.
+
+Both reports list their entries in report order (target folder, target name,
+source), so they are compared with a single merge-join over two streams:
+entries with the same target and source are compared field by field and
+nothing else is read ahead. A file whose target changed appears once on each
+side at different positions; those unmatched entries are kept by source until
+their counterpart shows up, so memory grows with the number of changed files,
+not with the size of the reports.
+
+Reports may be JSON or JSON Lines files (plain or compressed) or runs in a
+SQLite report database.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from media_archiver.report_reader import ReportReader
+from media_archiver.report_store import EntryQuery, iter_runs, query_entries
+from media_archiver.reporter import ReportEntry, entry_sort_key, is_failed
+
+
+STATUS_ADDED = "added"
+STATUS_REMOVED = "removed"
+STATUS_TARGET_CHANGED = "target_changed"
+STATUS_NEWLY_FAILING = "newly_failing"
+STATUS_FIXED = "fixed"
+STATUS_CHANGED = "changed"
+STATUSES = (
+    STATUS_ADDED,
+    STATUS_REMOVED,
+    STATUS_TARGET_CHANGED,
+    STATUS_NEWLY_FAILING,
+    STATUS_FIXED,
+    STATUS_CHANGED,
+)
+
+_SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+@dataclass(frozen=True)
+class EntryDiff:
+    status: str
+    source_path: str
+    old: ReportEntry | None
+    new: ReportEntry | None
+
+
+def _status(old: ReportEntry | None, new: ReportEntry | None) -> str | None:
+    if new is None:
+        return STATUS_REMOVED
+    if is_failed(new) and (old is None or not is_failed(old)):
+        return STATUS_NEWLY_FAILING
+    if old is None:
+        return STATUS_ADDED
+    if is_failed(old) and not is_failed(new):
+        return STATUS_FIXED
+    if old.target_path != new.target_path:
+        return STATUS_TARGET_CHANGED
+    if (old.action, old.reason, old.performed) != (new.action, new.reason, new.performed):
+        return STATUS_CHANGED
+    return None
+
+
+def _ordered(entries: Iterable[ReportEntry], side: str) -> Iterator[tuple[tuple, ReportEntry]]:
+    previous = None
+    for entry in entries:
+        key = entry_sort_key(entry)
+        if previous is not None and key < previous:
+            raise ValueError(f"{side} report is not in report order at {entry.target_path}")
+        previous = key
+        yield key, entry
+
+
+def diff_entries(
+    old: Iterable[ReportEntry],
+    new: Iterable[ReportEntry],
+) -> Iterator[EntryDiff]:
+    """
+    Changed entries between two reports.
+
+    Entries found on both sides come in report order as the join reaches
+    them; files found on one side only (added, removed) come last.
+    """
+    old_items = _ordered(old, "old")
+    new_items = _ordered(new, "new")
+    # Unmatched entries by source, waiting for the other side.
+    old_pending: dict[str, ReportEntry] = {}
+    new_pending: dict[str, ReportEntry] = {}
+
+    def changed(old_entry: ReportEntry | None, new_entry: ReportEntry | None):
+        status = _status(old_entry, new_entry)
+        if status is None:
+            return None
+        source = (new_entry or old_entry).source_path
+        return EntryDiff(status=status, source_path=source, old=old_entry, new=new_entry)
+
+    old_item = next(old_items, None)
+    new_item = next(new_items, None)
+    while old_item is not None or new_item is not None:
+        if new_item is None or (old_item is not None and old_item[0] < new_item[0]):
+            entry = old_item[1]
+            counterpart = new_pending.pop(entry.source_path, None)
+            if counterpart is None:
+                old_pending[entry.source_path] = entry
+            elif (result := changed(entry, counterpart)) is not None:
+                yield result
+            old_item = next(old_items, None)
+        elif old_item is None or new_item[0] < old_item[0]:
+            entry = new_item[1]
+            counterpart = old_pending.pop(entry.source_path, None)
+            if counterpart is None:
+                new_pending[entry.source_path] = entry
+            elif (result := changed(counterpart, entry)) is not None:
+                yield result
+            new_item = next(new_items, None)
+        else:
+            if (result := changed(old_item[1], new_item[1])) is not None:
+                yield result
+            old_item = next(old_items, None)
+            new_item = next(new_items, None)
+
+    for entry in new_pending.values():
+        yield changed(None, entry)
+    for entry in old_pending.values():
+        yield changed(entry, None)
+
+
+def is_sqlite(path: Path) -> bool:
+    with path.open("rb") as handle:
+        return handle.read(len(_SQLITE_HEADER)) == _SQLITE_HEADER
+
+
+def run_ids(path: Path) -> list[int]:
+    return [run["run_id"] for run in iter_runs(path)]
+
+
+def report_entries(path: Path, *, run_id: int | None = None) -> Iterator[ReportEntry]:
+    """Entries of a report file, or of one run (default: the latest) of a database."""
+    if not path.is_file():
+        raise FileNotFoundError(f"Report not found: {path}")
+    if not is_sqlite(path):
+        return ReportReader(path).entries()
+    if run_id is None:
+        ids = run_ids(path)
+        if not ids:
+            raise ValueError(f"report database has no runs: {path}")
+        run_id = ids[-1]
+    return (item.entry for item in query_entries(path, EntryQuery(run_id=run_id)))
+
+
+def diff_inputs(
+    old_path: Path,
+    new_path: Path,
+    *,
+    old_run: int | None = None,
+    new_run: int | None = None,
+) -> tuple[Iterator[ReportEntry], Iterator[ReportEntry]]:
+    """
+    The two entry streams to compare.
+
+    Given the same database twice and no old run, the new run (default: the
+    latest) is compared with the run before it.
+    """
+    if old_run is None and old_path.resolve() == new_path.resolve() and is_sqlite(old_path):
+        ids = run_ids(old_path)
+        if new_run is None and ids:
+            new_run = ids[-1]
+        earlier = [run_id for run_id in ids if run_id < (new_run or 0)]
+        if not earlier:
+            raise ValueError(f"no run before run {new_run} in {old_path}")
+        old_run = earlier[-1]
+    return (
+        report_entries(old_path, run_id=old_run),
+        report_entries(new_path, run_id=new_run),
+    )
+
+
+def diff_to_dict(diff: EntryDiff) -> dict:
+    def side(entry: ReportEntry | None) -> dict | None:
+        if entry is None:
+            return None
+        return {
+            "target_path": entry.target_path,
+            "action": entry.action,
+            "performed": entry.performed,
+            "reason": entry.reason,
+        }
+
+    return {
+        "status": diff.status,
+        "source_path": diff.source_path,
+        "old": side(diff.old),
+        "new": side(diff.new),
+    }
+
+
+def format_diff(diff: EntryDiff) -> str:
+    old_target = diff.old.target_path if diff.old is not None else "-"
+    new_target = diff.new.target_path if diff.new is not None else "-"
+    current = diff.new or diff.old
+    return (
+        f"{diff.status}\t{diff.source_path}\t{old_target} -> {new_target}\t"
+        f"{current.action}\t{current.reason or '-'}"
+    )
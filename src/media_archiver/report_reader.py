@@ -0,0 +1,165 @@
+"""
+Streaming readers for written reports.
+
+ReportReader iterates the entries and errors of a JSON (`.json`) or JSON
+Lines (`.jsonl`) report, optionally gzip or xz compressed, while reading and
+decompressing it in chunks. Memory use does not depend on the report size:
+JSON reports are parsed with an incremental decoder that materializes one
+entry at a time instead of the whole document.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterator
+
+from media_archiver.compression import COMPRESSIONS, open_text
+from media_archiver.reporter import ReportEntry, ReportSummary
+
+
+_CHUNK_CHARS = 64 * 1024
+_WHITESPACE = " \t\n\r"
+
+
+@dataclass(frozen=True)
+class ReportRecord:
+    # "summary", "entry" or "error"
+    kind: str
+    value: dict | str
+
+
+class _JsonStream:
+    """Decodes one JSON value at a time from a text stream."""
+
+    def __init__(self, handle: IO[str]) -> None:
+        self._handle = handle
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._handle.read(_CHUNK_CHARS)
+        if not data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("unexpected end of JSON report")
+
+    def take(self, allowed: str) -> str:
+        char = self.peek()
+        if char not in allowed:
+            raise ValueError(f"unexpected {char!r} in JSON report, expected one of {allowed!r}")
+        self._pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number may continue in the next chunk.
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def _iter_json(handle: IO[str]) -> Iterator[ReportRecord]:
+    stream = _JsonStream(handle)
+    stream.take("{")
+    if stream.peek() == "}":
+        return
+    kinds = {"entries": "entry", "errors": "error"}
+    while True:
+        key = stream.value()
+        stream.take(":")
+        if key in kinds:
+            stream.take("[")
+            if stream.peek() == "]":
+                stream.take("]")
+            else:
+                while True:
+                    yield ReportRecord(kinds[key], stream.value())
+                    if stream.take(",]") == "]":
+                        break
+        else:
+            value = stream.value()
+            if key == "summary":
+                yield ReportRecord("summary", value)
+        if stream.take(",}") == "}":
+            return
+
+
+def _iter_jsonl(handle: IO[str]) -> Iterator[ReportRecord]:
+    for line in handle:
+        if not line.strip():
+            continue
+        values = json.loads(line)
+        kind = values.pop("type")
+        yield ReportRecord(kind, values["message"] if kind == "error" else values)
+
+
+def _format(path: Path) -> str:
+    suffixes = path.suffixes
+    if suffixes and suffixes[-1] in COMPRESSIONS.values():
+        suffixes = suffixes[:-1]
+    if suffixes and suffixes[-1] in (".json", ".jsonl"):
+        return suffixes[-1]
+    raise ValueError(f"not a JSON or JSON Lines report: {path}")
+
+
+class ReportReader:
+    """
+    Reads a report written by write_reports or StreamingReportWriter.
+
+    Every method opens the file again and streams it; iterators close the
+    file when they are exhausted or garbage collected. The summary of a JSON
+    report comes after its entries (keys are sorted), so summary() reads the
+    whole file for JSON but only the first line for JSON Lines.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._format = _format(path)
+
+    def records(self) -> Iterator[ReportRecord]:
+        with open_text(self.path) as handle:
+            if self._format == ".jsonl":
+                yield from _iter_jsonl(handle)
+            else:
+                yield from _iter_json(handle)
+
+    def entries(self) -> Iterator[ReportEntry]:
+        for record in self.records():
+            if record.kind == "entry":
+                yield ReportEntry(**record.value)
+
+    def errors(self) -> Iterator[str]:
+        for record in self.records():
+            if record.kind == "error":
+                yield record.value
+
+    def summary(self) -> ReportSummary:
+        for record in self.records():
+            if record.kind == "summary":
+                return ReportSummary(**record.value)
+        raise ValueError(f"report has no summary: {self.path}")
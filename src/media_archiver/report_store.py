@@ -0,0 +1,328 @@
+"""
+Queryable SQLite report store.
+
+Every run appends one row to `runs` (the summary and its timings) and one
+row per file to `entries`, using the ReportEntry fields, in report order.
+All rows of a run are written in a single transaction with batched
+`executemany`, so a crashed run leaves no partial report behind. Entries are
+indexed by source path, source file name, target path, action and reason,
+which turns "what happened to IMG_1234.jpg?" across all historical runs into
+an index lookup.
+
+The default rollback journal is used, as for the coordination queue, so the
+database may live on a network share next to the other reports.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from media_archiver.reporter import Report, ReportEntry, ReportSummary, report_path
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    dry_run INTEGER NOT NULL,
+    move_files INTEGER NOT NULL,
+    total_files INTEGER NOT NULL DEFAULT 0,
+    copied INTEGER NOT NULL DEFAULT 0,
+    moved INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    timings TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    position INTEGER NOT NULL,
+    source_path TEXT NOT NULL,
+    source_name TEXT NOT NULL,
+    target_path TEXT NOT NULL,
+    action TEXT NOT NULL,
+    performed INTEGER NOT NULL,
+    reason TEXT,
+    strategy TEXT,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, position)
+);
+CREATE TABLE IF NOT EXISTS errors (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    position INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS entries_source_path ON entries(source_path);
+CREATE INDEX IF NOT EXISTS entries_source_name ON entries(source_name);
+CREATE INDEX IF NOT EXISTS entries_target_path ON entries(target_path);
+CREATE INDEX IF NOT EXISTS entries_action ON entries(action);
+CREATE INDEX IF NOT EXISTS entries_reason ON entries(reason);
+"""
+
+BATCH_ROWS = 10_000
+
+
+def _source_name(source_path: str) -> str:
+    return report_path(source_path).name
+
+
+class SqliteReportWriter:
+    """
+    Appends one run to a report database; use as a context manager.
+
+    Entries and errors are buffered and inserted with executemany in batches
+    of `batch_rows`; the run row gets its final counts in finish(). Leaving
+    the block without finish() rolls the whole run back.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        timestamp: str,
+        dry_run: bool,
+        move_files: bool,
+        batch_rows: int = BATCH_ROWS,
+    ) -> None:
+        self.path = path
+        self._timestamp = timestamp
+        self._dry_run = dry_run
+        self._move_files = move_files
+        self._batch_rows = batch_rows
+        self._connection: sqlite3.Connection | None = None
+        self._run_id = 0
+        self._entries: list[tuple] = []
+        self._errors: list[tuple] = []
+        self._entry_count = 0
+        self._error_count = 0
+
+    def __enter__(self) -> "SqliteReportWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None)
+        try:
+            connection.executescript(_SCHEMA)
+            connection.execute("BEGIN IMMEDIATE")
+            self._run_id = connection.execute(
+                "INSERT INTO runs (timestamp, dry_run, move_files) VALUES (?, ?, ?)",
+                (self._timestamp, int(self._dry_run), int(self._move_files)),
+            ).lastrowid
+        except BaseException:
+            connection.close()
+            raise
+        self._connection = connection
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._connection is None:
+            return
+        try:
+            if self._connection.in_transaction:
+                self._connection.execute("ROLLBACK")
+        finally:
+            self._connection.close()
+            self._connection = None
+
+    @property
+    def run_id(self) -> int:
+        return self._run_id
+
+    def add_entry(self, entry: ReportEntry) -> None:
+        self._entries.append(
+            (
+                self._run_id,
+                self._entry_count,
+                entry.source_path,
+                _source_name(entry.source_path),
+                entry.target_path,
+                entry.action,
+                int(entry.performed),
+                entry.reason,
+                entry.strategy,
+                entry.size_bytes,
+            )
+        )
+        self._entry_count += 1
+        if len(self._entries) >= self._batch_rows:
+            self._flush()
+
+    def add_error(self, message: str) -> None:
+        self._errors.append((self._run_id, self._error_count, message))
+        self._error_count += 1
+        if len(self._errors) >= self._batch_rows:
+            self._flush()
+
+    def finish(self, summary: ReportSummary) -> None:
+        self._flush()
+        self._connection.execute(
+            "UPDATE runs SET total_files = ?, copied = ?, moved = ?, skipped = ?, errors = ?, "
+            "timings = ? WHERE id = ?",
+            (
+                summary.total_files,
+                summary.copied,
+                summary.moved,
+                summary.skipped,
+                summary.errors,
+                json.dumps(summary.timings) if summary.timings is not None else None,
+                self._run_id,
+            ),
+        )
+        self._connection.execute("COMMIT")
+
+    def _flush(self) -> None:
+        if self._entries:
+            self._connection.executemany(
+                "INSERT INTO entries (run_id, position, source_path, source_name, target_path, "
+                "action, performed, reason, strategy, size_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._entries,
+            )
+            self._entries = []
+        if self._errors:
+            self._connection.executemany(
+                "INSERT INTO errors (run_id, position, message) VALUES (?, ?, ?)",
+                self._errors,
+            )
+            self._errors = []
+
+
+def write_sqlite_report(path: Path, report: Report, *, batch_rows: int = BATCH_ROWS) -> int:
+    """Append `report` as a new run; returns the run id."""
+    summary = report.summary
+    with SqliteReportWriter(
+        path,
+        timestamp=summary.timestamp,
+        dry_run=summary.dry_run,
+        move_files=summary.move_files,
+        batch_rows=batch_rows,
+    ) as writer:
+        for entry in report.entries:
+            writer.add_entry(entry)
+        for message in report.errors:
+            writer.add_error(message)
+        writer.finish(summary)
+        return writer.run_id
+
+
+@dataclass(frozen=True)
+class StoredEntry:
+    run_id: int
+    run_timestamp: str
+    dry_run: bool
+    entry: ReportEntry
+
+
+@dataclass(frozen=True)
+class EntryQuery:
+    source_path: str | None = None
+    source_name: str | None = None
+    target_path: str | None = None
+    action: str | None = None
+    # Matches the reason exactly or, for errors, by prefix ("copy_failed").
+    reason: str | None = None
+    run_id: int | None = None
+    latest_run: bool = False
+    limit: int | None = None
+
+
+def _where(query: EntryQuery) -> tuple[str, list]:
+    clauses: list[str] = []
+    values: list = []
+    for column in ("source_path", "source_name", "target_path", "action"):
+        value = getattr(query, column)
+        if value is not None:
+            clauses.append(f"entries.{column} = ?")
+            values.append(value)
+    if query.reason is not None:
+        # Errors read "<reason>: <detail>"; a range keeps the index usable.
+        clauses.append("(entries.reason = ? OR (entries.reason >= ? AND entries.reason < ?))")
+        values.extend([query.reason, f"{query.reason}:", f"{query.reason};"])
+    if query.run_id is not None:
+        clauses.append("entries.run_id = ?")
+        values.append(query.run_id)
+    elif query.latest_run:
+        clauses.append("entries.run_id = (SELECT MAX(id) FROM runs)")
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", values
+
+
+def _connect_read_only(path: Path) -> sqlite3.Connection:
+    return sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, timeout=30.0)
+
+
+def query_entries(path: Path, query: EntryQuery) -> Iterator[StoredEntry]:
+    """Matching entries, newest run first, in report order within a run."""
+    if not path.is_file():
+        raise FileNotFoundError(f"Report database not found: {path}")
+    where, values = _where(query)
+    sql = (
+        "SELECT entries.run_id, runs.timestamp, runs.dry_run, entries.source_path, "
+        "entries.target_path, entries.action, entries.performed, entries.reason, "
+        "entries.strategy, entries.size_bytes FROM entries JOIN runs ON runs.id = entries.run_id"
+        f"{where} ORDER BY entries.run_id DESC, entries.position"
+    )
+    if query.limit is not None:
+        sql += " LIMIT ?"
+        values.append(query.limit)
+    connection = _connect_read_only(path)
+    try:
+        for row in connection.execute(sql, values):
+            run_id, timestamp, dry_run, source, target, action, performed, reason, strategy, size = (
+                row
+            )
+            yield StoredEntry(
+                run_id=run_id,
+                run_timestamp=timestamp,
+                dry_run=bool(dry_run),
+                entry=ReportEntry(
+                    source_path=source,
+                    target_path=target,
+                    action=action,
+                    performed=bool(performed),
+                    reason=reason,
+                    strategy=strategy,
+                    size_bytes=size,
+                ),
+            )
+    finally:
+        connection.close()
+
+
+def stored_entry_to_dict(item: StoredEntry) -> dict:
+    return {
+        "run_id": item.run_id,
+        "run_timestamp": item.run_timestamp,
+        "dry_run": item.dry_run,
+        "source_path": item.entry.source_path,
+        "target_path": item.entry.target_path,
+        "action": item.entry.action,
+        "performed": item.entry.performed,
+        "reason": item.entry.reason,
+        "strategy": item.entry.strategy,
+        "size_bytes": item.entry.size_bytes,
+    }
+
+
+def iter_runs(path: Path) -> Iterator[dict]:
+    """One summary dict per stored run, oldest first."""
+    if not path.is_file():
+        raise FileNotFoundError(f"Report database not found: {path}")
+    connection = _connect_read_only(path)
+    try:
+        cursor = connection.execute(
+            "SELECT id, timestamp, dry_run, move_files, total_files, copied, moved, skipped, "
+            "errors, timings FROM runs ORDER BY id"
+        )
+        columns = [column[0] for column in cursor.description]
+        for row in cursor:
+            values = dict(zip(columns, row))
+            values["run_id"] = values.pop("id")
+            values["dry_run"] = bool(values["dry_run"])
+            values["move_files"] = bool(values["move_files"])
+            timings = values.pop("timings")
+            if timings is not None:
+                values["timings"] = json.loads(timings)
+            yield values
+    finally:
+        connection.close()
@@ -2,12 +2,19 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from pathlib import Path
+from dataclasses import dataclass, replace
+import heapq
+from operator import itemgetter
+from pathlib import Path, PurePath, PurePosixPath, PureWindowsPath
 import json
-from typing import Iterable, List
+import shutil
+import tempfile
+import threading
+from typing import IO, Iterable, Iterator, List, Protocol, Sequence
 
-from media_archiver.sorter import SortDecision
+from media_archiver.compression import COMPRESSIONS, compressed_name, open_text
+from media_archiver.sorter import SortDecision, SortKey, sort_key
+from media_archiver.telemetry import Telemetry, measure
 
 
 @dataclass(frozen=True)
@@ -17,6 +24,8 @@ class ReportEntry:
     action: str
     performed: bool
     reason: str | None
+    strategy: str | None = None
+    size_bytes: int = 0
 
 
 @dataclass(frozen=True)
@@ -29,6 +38,8 @@ class ReportSummary:
     moved: int
     skipped: int
     errors: int
+    # Telemetry.summary() of the run, when instrumentation was enabled.
+    timings: dict | None = None
 
 
 @dataclass(frozen=True)
@@ -49,6 +60,98 @@ class ExecutionResult:
     decision: SortDecision
     performed: bool
     error: str | None = None
+    strategy: str | None = None
+    size_bytes: int = 0
+
+
+class EntryStore(Protocol):
+    """Receives a finished report entry by entry (report_store, markdown_report)."""
+
+    def add_entry(self, entry: ReportEntry) -> None: ...
+
+    def add_error(self, message: str) -> None: ...
+
+    def finish(self, summary: ReportSummary) -> None: ...
+
+
+def entry_from_result(item: ExecutionResult) -> ReportEntry:
+    # An execution error replaces the planned reason.
+    return ReportEntry(
+        source_path=str(item.decision.source),
+        target_path=str(item.decision.target_path),
+        action=item.decision.action,
+        performed=item.performed,
+        reason=item.error if item.error else item.decision.reason,
+        strategy=item.strategy,
+        size_bytes=item.size_bytes,
+    )
+
+
+def is_failed(entry: ReportEntry) -> bool:
+    # Copies and moves only carry a reason when they failed.
+    return entry.action != "skip" and entry.reason is not None
+
+
+def error_reason(error: str) -> str:
+    # Errors read "<action>_failed: <strerror>"; the prefix is the reason.
+    return error.split(":", 1)[0]
+
+
+def report_path(path: str) -> PurePosixPath:
+    """A path as stored in a report, on any platform."""
+    # Reports may come from Windows hosts; split on both separators.
+    return PurePosixPath(path.replace("\\", "/"))
+
+
+def format_bytes(value: float) -> str:
+    """A byte count for people: "1.5 MB"."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def entry_sort_key(entry: ReportEntry) -> SortKey:
+    """Report order: by target folder, then target name, then source."""
+    path: PurePath = report_path(entry.target_path)
+    if "\\" in entry.target_path:
+        # Written on Windows, where report order ignores case.
+        path = PureWindowsPath(path)
+    return sort_key(path, entry.source_path)
+
+
+@dataclass
+class _Counts:
+    total: int = 0
+    copied: int = 0
+    moved: int = 0
+    skipped: int = 0
+    errors: int = 0
+
+    def add(self, action: str, performed: bool, error: str | None) -> None:
+        self.total += 1
+        if action == "skip":
+            self.skipped += 1
+        elif performed and action == "copy":
+            self.copied += 1
+        elif performed and action == "move":
+            self.moved += 1
+        # errors only count execution/runtime errors, not skips
+        if error:
+            self.errors += 1
+
+    def summary(self, *, timestamp: str, config: ReportConfig) -> ReportSummary:
+        return ReportSummary(
+            timestamp=timestamp,
+            dry_run=config.dry_run,
+            move_files=config.move_files,
+            total_files=self.total,
+            copied=self.copied,
+            moved=self.moved,
+            skipped=self.skipped,
+            errors=self.errors,
+        )
 
 
 def build_report(
@@ -57,74 +160,57 @@ def build_report(
     config: ReportConfig,
     timestamp: str,
 ) -> Report:
-    entries: list[ReportEntry] = []
-    # errors only count execution/runtime errors, not skips
+    # One pass builds the entries with their precomputed sort keys and the counts.
+    keyed: list[tuple[SortKey, ReportEntry]] = []
     errors: list[str] = []
+    counts = _Counts()
 
     for item in results:
-        reason = item.decision.reason
+        decision = item.decision
+        counts.add(decision.action, item.performed, item.error)
         if item.error:
-            reason = item.error
             errors.append(item.error)
+        keyed.append((decision.sort_key, entry_from_result(item)))
 
-        entries.append(
-            ReportEntry(
-                source_path=str(item.decision.source),
-                target_path=str(item.decision.target_path),
-                action=item.decision.action,
-                performed=item.performed,
-                reason=reason,
-            )
-        )
+    keyed.sort(key=itemgetter(0))
+    entries = [entry for _, entry in keyed]
 
-    entries.sort(
-        key=lambda entry: (
-            Path(entry.target_path).parent,
-            Path(entry.target_path).name,
-            entry.source_path,
-        )
-    )
+    summary = counts.summary(timestamp=timestamp, config=config)
+    return Report(summary=summary, entries=entries, errors=errors)
 
-    copied = sum(1 for e in entries if e.action == "copy" and e.performed)
-    moved = sum(1 for e in entries if e.action == "move" and e.performed)
-    skipped = sum(1 for e in entries if e.action == "skip")
-
-    summary = ReportSummary(
-        timestamp=timestamp,
-        dry_run=config.dry_run,
-        move_files=config.move_files,
-        total_files=len(entries),
-        copied=copied,
-        moved=moved,
-        skipped=skipped,
-        errors=len(errors),
-    )
 
-    return Report(summary=summary, entries=entries, errors=errors)
+def _summary_to_dict(summary: ReportSummary) -> dict:
+    values = {
+        "timestamp": summary.timestamp,
+        "dry_run": summary.dry_run,
+        "move_files": summary.move_files,
+        "total_files": summary.total_files,
+        "copied": summary.copied,
+        "moved": summary.moved,
+        "skipped": summary.skipped,
+        "errors": summary.errors,
+    }
+    if summary.timings is not None:
+        values["timings"] = summary.timings
+    return values
+
+
+def _entry_to_dict(entry: ReportEntry) -> dict:
+    return {
+        "source_path": entry.source_path,
+        "target_path": entry.target_path,
+        "action": entry.action,
+        "performed": entry.performed,
+        "reason": entry.reason,
+        "strategy": entry.strategy,
+        "size_bytes": entry.size_bytes,
+    }
 
 
 def _report_to_dict(report: Report) -> dict:
     return {
-        "summary": {
-            "timestamp": report.summary.timestamp,
-            "dry_run": report.summary.dry_run,
-            "move_files": report.summary.move_files,
-            "total_files": report.summary.total_files,
-            "copied": report.summary.copied,
-            "moved": report.summary.moved,
-            "skipped": report.summary.skipped,
-            "errors": report.summary.errors,
-        },
-        "entries": [
-            {
-                "source_path": entry.source_path,
-                "target_path": entry.target_path,
-                "action": entry.action,
-                "performed": entry.performed,
-                "reason": entry.reason,
-            }
-            for entry in report.entries
-        ],
+        "summary": _summary_to_dict(report.summary),
+        "entries": [_entry_to_dict(entry) for entry in report.entries],
         "errors": list(report.errors),
     }
 
@@ -133,43 +219,77 @@ def to_json(report: Report) -> str:
     return json.dumps(_report_to_dict(report), indent=2, ensure_ascii=False, sort_keys=True)
 
 
-def to_markdown(report: Report) -> str:
-    summary = report.summary
-    lines: list[str] = ["# Report", "", "## Summary", ""]
-    lines.extend(
-        [
-            f"- Timestamp: {summary.timestamp}",
-            f"- Dry-run: {summary.dry_run}",
-            f"- Move files: {summary.move_files}",
-            f"- Total files: {summary.total_files}",
-            f"- Files copied: {summary.copied}",
-            f"- Files moved: {summary.moved}",
-            f"- Files skipped: {summary.skipped}",
-            f"- Errors: {summary.errors}",
-            "",
-            "## Detailed Actions",
-            "",
-        ]
-    )
-
-    for entry in report.entries:
-        reason = entry.reason or ""
-        lines.extend(
-            [
-                f"- Source: {entry.source_path}",
-                f"  Target: {entry.target_path}",
-                f"  Action: {entry.action}",
-                f"  Performed: {entry.performed}",
-                f"  Reason: {reason}",
-            ]
-        )
-
-    lines.extend(["", "## Errors", ""])
-    if report.errors:
-        lines.extend([f"- {error}" for error in report.errors])
+def _indented_json(value, indent: int) -> str:
+    text = json.dumps(value, indent=2, ensure_ascii=False, sort_keys=True)
+    return text.replace("\n", "\n" + " " * indent)
+
+
+def _write_json_array(handle: IO[str], values: Iterable) -> None:
+    first = True
+    for value in values:
+        handle.write("[\n    " if first else ",\n    ")
+        handle.write(_indented_json(value, 4))
+        first = False
+    handle.write("[]" if first else "\n  ]")
+
+
+def dump_json(report: Report, handle: IO[str]) -> None:
+    """Write the same document as to_json(), one entry at a time."""
+    handle.write('{\n  "entries": ')
+    _write_json_array(handle, (_entry_to_dict(entry) for entry in report.entries))
+    handle.write(',\n  "errors": ')
+    _write_json_array(handle, report.errors)
+    handle.write(',\n  "summary": ')
+    handle.write(_indented_json(_summary_to_dict(report.summary), 2))
+    handle.write("\n}")
+
+
+def _markdown_header(summary: ReportSummary) -> list[str]:
+    return [
+        "# Report",
+        "",
+        "## Summary",
+        "",
+        f"- Timestamp: {summary.timestamp}",
+        f"- Dry-run: {summary.dry_run}",
+        f"- Move files: {summary.move_files}",
+        f"- Total files: {summary.total_files}",
+        f"- Files copied: {summary.copied}",
+        f"- Files moved: {summary.moved}",
+        f"- Files skipped: {summary.skipped}",
+        f"- Errors: {summary.errors}",
+        "",
+        "## Detailed Actions",
+        "",
+    ]
+
+
+def _markdown_entry(entry: ReportEntry) -> list[str]:
+    reason = entry.reason or ""
+    return [
+        f"- Source: {entry.source_path}",
+        f"  Target: {entry.target_path}",
+        f"  Action: {entry.action}",
+        f"  Performed: {entry.performed}",
+        f"  Reason: {reason}",
+        f"  Strategy: {entry.strategy or ''}",
+    ]
+
+
+def _markdown_errors(errors: list[str]) -> list[str]:
+    lines = ["", "## Errors", ""]
+    if errors:
+        lines.extend([f"- {error}" for error in errors])
     else:
         lines.append("- None")
+    return lines
 
+
+def to_markdown(report: Report) -> str:
+    lines = _markdown_header(report.summary)
+    for entry in report.entries:
+        lines.extend(_markdown_entry(entry))
+    lines.extend(_markdown_errors(report.errors))
     return "\n".join(lines)
 
 
@@ -179,6 +299,9 @@ def _ensure_unique_path(base_path: Path) -> Path:
 
     stem = base_path.stem
     suffix = base_path.suffix
+    if suffix in COMPRESSIONS.values():
+        # report.json.gz -> report_01.json.gz
+        stem, suffix = Path(stem).stem, Path(stem).suffix + suffix
     index = 1
     while True:
         candidate = base_path.with_name(f"{stem}_{index:02d}{suffix}")
@@ -194,6 +317,8 @@ def write_reports(
     prefix: str = "report",
     write_markdown: bool = True,
     write_json: bool = True,
+    telemetry: Telemetry | None = None,
+    compression: str | None = None,
 ) -> tuple[Path | None, Path | None]:
     # timestamp must be externally provided (no time generation here)
     if not (write_markdown or write_json):
@@ -207,10 +332,266 @@ def write_reports(
 
     if write_markdown:
         markdown_path = _ensure_unique_path(output_dir / f"{base_name}.md")
-        markdown_path.write_text(to_markdown(report), encoding="utf-8")
+        with measure(telemetry, "cpu.to_markdown"):
+            content = to_markdown(report)
+        markdown_path.write_text(content, encoding="utf-8")
 
     if write_json:
-        json_path = _ensure_unique_path(output_dir / f"{base_name}.json")
-        json_path.write_text(to_json(report), encoding="utf-8")
+        json_path = _ensure_unique_path(
+            output_dir / compressed_name(f"{base_name}.json", compression)
+        )
+        if telemetry is not None:
+            # Everything up to here, including Markdown rendering, is included.
+            report = replace(report, summary=replace(report.summary, timings=telemetry.summary()))
+        with open_text(json_path, "w") as handle:
+            dump_json(report, handle)
 
     return markdown_path, json_path
+
+
+# Entries held in memory before a sorted spill file is written.
+SPILL_ENTRIES = 50_000
+# Spill files merged at once; more are merged in several passes.
+_MERGE_FAN_IN = 64
+
+
+def _json_line(values: dict) -> str:
+    return json.dumps(values, ensure_ascii=False, sort_keys=True) + "\n"
+
+
+# Spilled items are (sort key, entry, error); error is the execution error, if any.
+_SpillItem = tuple[SortKey, ReportEntry, str | None]
+_spill_sort_key = itemgetter(0)
+
+
+def _write_spill(path: Path, items: Iterable[_SpillItem]) -> None:
+    with path.open("w", encoding="utf-8") as handle:
+        for key, entry, error in items:
+            handle.write(
+                _json_line({"key": key, "entry": _entry_to_dict(entry), "error": error})
+            )
+
+
+def _read_spill(path: Path) -> Iterator[_SpillItem]:
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            values = json.loads(line)
+            folder, name, source = values["key"]
+            yield (tuple(folder), name, source), ReportEntry(**values["entry"]), values["error"]
+
+
+class StreamingReportWriter:
+    """
+    Writes a report while results arrive, in bounded memory.
+
+    Entries are buffered, sorted and spilled to temporary files next to the
+    report every `spill_entries` entries; finish() merges the spill files
+    into the final JSON Lines and Markdown reports in build_report order.
+    Summary counts are running counters. Unlike build_report, errors are
+    listed in report order rather than execution order. add() is safe to call
+    from several threads.
+
+    The JSON Lines report starts with a `{"type": "summary", ...}` line,
+    followed by one `{"type": "entry", ...}` line per file and one
+    `{"type": "error", "message": ...}` line per error. With `compression`
+    it is written as `.jsonl.gz` or `.jsonl.xz`.
+    """
+
+    def __init__(
+        self,
+        *,
+        output_dir: Path,
+        prefix: str,
+        timestamp: str,
+        config: ReportConfig,
+        write_markdown: bool = True,
+        write_jsonl: bool = True,
+        spill_entries: int = SPILL_ENTRIES,
+        compression: str | None = None,
+    ) -> None:
+        self._output_dir = output_dir
+        self._base_name = f"{timestamp}_{prefix}"
+        self._timestamp = timestamp
+        self._config = config
+        self._write_markdown = write_markdown
+        self._write_jsonl = write_jsonl
+        self._spill_entries = spill_entries
+        self._compression = compression
+        self._lock = threading.Lock()
+        self._buffer: list[_SpillItem] = []
+        self._spills: list[Path] = []
+        self._spill_dir: Path | None = None
+        self._counts = _Counts()
+
+    def __enter__(self) -> "StreamingReportWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(self, result: ExecutionResult) -> None:
+        decision = result.decision
+        item = (decision.sort_key, entry_from_result(result), result.error or None)
+        with self._lock:
+            self._counts.add(decision.action, result.performed, result.error)
+            self._buffer.append(item)
+            if len(self._buffer) < self._spill_entries:
+                return
+            items, self._buffer = self._buffer, []
+            path = self._next_spill_path()
+        # Sorting and writing happen outside the lock.
+        _write_spill(path, sorted(items, key=_spill_sort_key))
+
+    def summary(self) -> ReportSummary:
+        with self._lock:
+            return self._counts.summary(timestamp=self._timestamp, config=self._config)
+
+    def finish(
+        self,
+        *,
+        deferred_errors: dict[Path, str] | None = None,
+        telemetry: Telemetry | None = None,
+        stores: Sequence[EntryStore] = (),
+    ) -> tuple[Path | None, Path | None]:
+        """
+        Merge and write the reports; returns (markdown_path, jsonl_path).
+
+        `deferred_errors` maps sources to errors found after their results
+        were added (failed deferred source removals, see PipelineResult).
+        `stores` receive the entries and errors during the same merge.
+        """
+        if not (self._write_markdown or self._write_jsonl or stores):
+            self.close()
+            return None, None
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        overrides = {str(source): error for source, error in (deferred_errors or {}).items()}
+        try:
+            with self._lock:
+                items, self._buffer = self._buffer, []
+                if items:
+                    _write_spill(self._next_spill_path(), sorted(items, key=_spill_sort_key))
+            spill_dir = self._ensure_spill_dir()
+            parts = {name: spill_dir / f"{name}.part" for name in ("jsonl", "markdown", "errors")}
+            errors = self._merge(parts, overrides, stores)
+
+            summary = replace(self.summary(), errors=errors)
+            if telemetry is not None:
+                summary = replace(summary, timings=telemetry.summary())
+            for store in stores:
+                for message in _iter_errors(parts["errors"]):
+                    store.add_error(message)
+                store.finish(summary)
+
+            markdown_path: Path | None = None
+            jsonl_path: Path | None = None
+            if self._write_markdown:
+                with measure(telemetry, "cpu.to_markdown"):
+                    markdown_path = self._assemble_markdown(summary, parts)
+            if self._write_jsonl:
+                jsonl_path = self._assemble_jsonl(summary, parts)
+            return markdown_path, jsonl_path
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Remove the spill files; the writer cannot be used afterwards."""
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+    def _ensure_spill_dir(self) -> Path:
+        if self._spill_dir is None:
+            self._output_dir.mkdir(parents=True, exist_ok=True)
+            self._spill_dir = Path(
+                tempfile.mkdtemp(prefix=f".{self._base_name}.", dir=self._output_dir)
+            )
+        return self._spill_dir
+
+    def _next_spill_path(self) -> Path:
+        path = self._ensure_spill_dir() / f"spill_{len(self._spills):06d}.jsonl"
+        self._spills.append(path)
+        return path
+
+    def _merged(self) -> Iterator[_SpillItem]:
+        spills = list(self._spills)
+        generation = 0
+        while len(spills) > _MERGE_FAN_IN:
+            # Bound the number of open files with intermediate merge passes.
+            merged: list[Path] = []
+            for start in range(0, len(spills), _MERGE_FAN_IN):
+                group = spills[start:start + _MERGE_FAN_IN]
+                path = self._ensure_spill_dir() / f"merge_{generation}_{start:06d}.jsonl"
+                _write_spill(
+                    path,
+                    heapq.merge(*(_read_spill(item) for item in group), key=_spill_sort_key),
+                )
+                for item in group:
+                    item.unlink()
+                merged.append(path)
+            spills = merged
+            generation += 1
+        return heapq.merge(*(_read_spill(item) for item in spills), key=_spill_sort_key)
+
+    def _merge(
+        self,
+        parts: dict[str, Path],
+        overrides: dict[str, str],
+        stores: Sequence[EntryStore],
+    ) -> int:
+        """Write the sorted entry and error bodies; returns the number of errors."""
+        count = 0
+        with (
+            parts["jsonl"].open("w", encoding="utf-8") as jsonl,
+            parts["markdown"].open("w", encoding="utf-8") as markdown,
+            parts["errors"].open("w", encoding="utf-8") as errors,
+        ):
+            for _, entry, error in self._merged():
+                override = overrides.get(entry.source_path)
+                if override is not None:
+                    error = override
+                    entry = replace(entry, reason=override)
+                if error:
+                    count += 1
+                    errors.write(_json_line({"message": error}))
+                jsonl.write(_json_line({"type": "entry", **_entry_to_dict(entry)}))
+                for store in stores:
+                    store.add_entry(entry)
+                for line in _markdown_entry(entry):
+                    markdown.write("\n" + line)
+        return count
+
+    def _assemble_markdown(self, summary: ReportSummary, parts: dict[str, Path]) -> Path:
+        path = _ensure_unique_path(self._output_dir / f"{self._base_name}.md")
+        with path.open("w", encoding="utf-8") as handle:
+            handle.write("\n".join(_markdown_header(summary)))
+            _copy_part(parts["markdown"], handle)
+            for line in ("", "## Errors", ""):
+                handle.write("\n" + line)
+            if summary.errors:
+                for message in _iter_errors(parts["errors"]):
+                    handle.write(f"\n- {message}")
+            else:
+                handle.write("\n- None")
+        return path
+
+    def _assemble_jsonl(self, summary: ReportSummary, parts: dict[str, Path]) -> Path:
+        path = _ensure_unique_path(
+            self._output_dir / compressed_name(f"{self._base_name}.jsonl", self._compression)
+        )
+        with open_text(path, "w") as handle:
+            handle.write(_json_line({"type": "summary", **_summary_to_dict(summary)}))
+            _copy_part(parts["jsonl"], handle)
+            for message in _iter_errors(parts["errors"]):
+                handle.write(_json_line({"type": "error", "message": message}))
+        return path
+
+
+def _copy_part(path: Path, handle: IO[str]) -> None:
+    with path.open("r", encoding="utf-8") as part:
+        shutil.copyfileobj(part, handle)
+
+
+def _iter_errors(path: Path) -> Iterator[str]:
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            yield json.loads(line)["message"]
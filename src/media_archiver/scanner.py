@@ -1,8 +1,15 @@
 """Read-only filesystem scanning utilities."""
 
+import heapq
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, Iterator, List
+
+from media_archiver.telemetry import Telemetry, measure
+from media_archiver.throttle import RateLimiter
 
 
 SUPPORTED_IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".heic"})
@@ -36,14 +43,26 @@ def _iter_files(directories: Iterable[Path]) -> List[Path]:
     files: list[Path] = []
     for directory in sorted(directories, key=lambda d: str(d)):
         for candidate in directory.rglob("*"):
-            if candidate.is_file():
+            try:
+                is_file = candidate.is_file()
+            except OSError:
+                # Unreadable entry: let the stat in _collect_file_info report it.
+                is_file = True
+            if is_file:
                 files.append(candidate)
     return sorted(files, key=lambda p: str(p))
 
 
-def _collect_file_info(path: Path) -> FileInfo | None:
+def _collect_file_info(
+    path: Path,
+    limiter: RateLimiter | None = None,
+    telemetry: Telemetry | None = None,
+) -> FileInfo | None:
+    if limiter is not None:
+        limiter.acquire(ops=1)
     try:
-        stat_result = path.stat()
+        with measure(telemetry, "fs.stat"):
+            stat_result = path.stat()
     except OSError:
         return None
     return FileInfo(
@@ -55,42 +74,142 @@ def _collect_file_info(path: Path) -> FileInfo | None:
     )
 
 
-def scan_directories(directories: Iterable[Path]) -> ScanResult:
+def _classify(
+    path: Path,
+    limiter: RateLimiter | None,
+    telemetry: Telemetry | None = None,
+) -> FileInfo | IgnoredFile:
+    extension = path.suffix.lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        return IgnoredFile(
+            absolute_path=path.resolve(strict=False),
+            extension=extension,
+            reason="unsupported_extension",
+        )
+
+    info = _collect_file_info(path, limiter, telemetry)
+    if info is None:
+        if telemetry is not None:
+            telemetry.count("errors", reason="stat_failed")
+        return IgnoredFile(
+            absolute_path=path.resolve(strict=False),
+            extension=extension,
+            reason="stat_failed",
+        )
+    return info
+
+
+def _missing_directories(directory_list: list[Path]) -> list[IgnoredFile]:
+    return [
+        IgnoredFile(
+            absolute_path=directory.resolve(strict=False),
+            extension="",
+            reason="directory_not_found",
+        )
+        for directory in directory_list
+        if not directory.exists()
+    ]
+
+
+def scan_directories(
+    directories: Iterable[Path],
+    limiter: RateLimiter | None = None,
+    telemetry: Telemetry | None = None,
+) -> ScanResult:
     supported: list[FileInfo] = []
     ignored: list[IgnoredFile] = []
 
     directory_list = sorted(directories, key=lambda d: str(d))
-    for directory in directory_list:
-        if not directory.exists():
-            ignored.append(
-                IgnoredFile(
-                    absolute_path=directory.resolve(strict=False),
-                    extension="",
-                    reason="directory_not_found",
-                )
-            )
+    ignored.extend(_missing_directories(directory_list))
 
     for path in _iter_files(directory_list):
-        extension = path.suffix.lower()
-        if extension in SUPPORTED_EXTENSIONS:
-            info = _collect_file_info(path)
-            if info is None:
-                ignored.append(
-                    IgnoredFile(
-                        absolute_path=path.resolve(strict=False),
-                        extension=extension,
-                        reason="stat_failed",
-                    )
-                )
-            else:
-                supported.append(info)
+        item = _classify(path, limiter, telemetry)
+        if isinstance(item, FileInfo):
+            supported.append(item)
         else:
-            ignored.append(
-                IgnoredFile(
-                    absolute_path=path.resolve(strict=False),
-                    extension=extension,
-                    reason="unsupported_extension",
-                )
-            )
+            ignored.append(item)
 
     return ScanResult(supported=supported, ignored=ignored)
+
+
+def _walk_sorted(directory: Path, recursive: bool = True) -> Iterator[Path]:
+    """
+    Yield the files below `directory` in str(path) order, one directory at a time.
+
+    Sorting each listing with directories keyed as `name + os.sep` gives the
+    same order as sorting all full path strings, without holding the tree.
+    Like Path.rglob, symlinked directories are not descended into.
+    """
+    try:
+        with os.scandir(directory) as listing:
+            entries = list(listing)
+    except OSError:
+        return
+
+    keyed: list[tuple[str, os.DirEntry, bool]] = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir() and not entry.is_symlink()
+        except OSError:
+            is_dir = False
+        keyed.append((entry.name + os.sep if is_dir else entry.name, entry, is_dir))
+    keyed.sort(key=lambda item: item[0])
+
+    for _, entry, is_dir in keyed:
+        path = directory / entry.name
+        if is_dir:
+            if recursive:
+                yield from _walk_sorted(path)
+            continue
+        try:
+            is_file = entry.is_file()
+        except OSError:
+            # Unreadable entry: let the stat in _collect_file_info report it.
+            is_file = True
+        if is_file:
+            yield path
+
+
+def _classify_ordered(
+    paths: Iterable[Path],
+    limiter: RateLimiter | None,
+    workers: int,
+    telemetry: Telemetry | None = None,
+) -> Iterator[FileInfo | IgnoredFile]:
+    """Classify with `workers` concurrent stat calls, yielding in input order."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media-archiver-stat") as pool:
+        window: deque = deque()
+        for path in paths:
+            window.append(pool.submit(_classify, path, limiter, telemetry))
+            if len(window) >= workers * 4:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def iter_scan(
+    directories: Iterable[Path],
+    limiter: RateLimiter | None = None,
+    recursive: bool = True,
+    workers: int = 1,
+    telemetry: Telemetry | None = None,
+) -> Iterator[FileInfo | IgnoredFile]:
+    """
+    Streaming variant of scan_directories.
+
+    Yields the same items in the same order (missing directories first,
+    then all files sorted by path) while only holding one directory
+    listing per tree level in memory. With `recursive=False` only the
+    files directly inside each directory are yielded; `workers > 1` issues
+    that many stat calls concurrently without changing the order.
+    """
+    directory_list = sorted(directories, key=lambda d: str(d))
+    yield from _missing_directories(directory_list)
+
+    streams = [_walk_sorted(directory, recursive) for directory in directory_list]
+    paths = heapq.merge(*streams, key=str)
+    if workers > 1:
+        yield from _classify_ordered(paths, limiter, workers, telemetry)
+        return
+    for path in paths:
+        yield _classify(path, limiter, telemetry)
@@ -0,0 +1,210 @@
+"""
+Archive scrub: re-read archived files and compare them with their catalog hashes.
+
+A scrub pass takes every file of the catalog, in the order the catalog
+gives (never hashed first, then longest since the last verification), and
+re-hashes it on a bounded thread pool. The remaining work of a pass is kept
+in a small SQLite checkpoint next to the catalog; finished files are removed
+from it page by page, so an interrupted scrub resumes where it stopped and a
+new pass starts only once the previous one is complete.
+
+Per file the outcome is one of:
+
+- `verified`: the content still matches the stored hash
+- `recorded`: no hash was stored yet; the one just read is stored
+- `updated`: size or mtime changed since the hash was stored, i.e. the file
+  was rewritten on purpose; the new hash is stored
+- `hash_mismatch`: same size and mtime but different content (bit rot); the
+  stored hash is kept
+- `verify_failed`: the file is missing or unreadable
+
+Outcomes are reported as ExecutionResults with the `verify` action, so the
+reporter's writers produce the scrub report.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import os
+import sqlite3
+from pathlib import Path
+from typing import Callable, Iterable
+
+from media_archiver.catalog import ArchiveCatalog, hash_file
+from media_archiver.reporter import ExecutionResult, error_reason
+from media_archiver.sorter import SortDecision
+from media_archiver.telemetry import Telemetry, measure
+from media_archiver.throttle import RateLimiter
+
+
+STRATEGY_VERIFIED = "verified"
+STRATEGY_RECORDED = "recorded"
+STRATEGY_UPDATED = "updated"
+
+# Files verified between two checkpoints.
+PAGE_FILES = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    seq INTEGER PRIMARY KEY,
+    path TEXT NOT NULL
+);
+"""
+
+
+class ScrubCheckpoint:
+    """The files a scrub pass still has to verify, in verification order."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(str(path), timeout=30.0, isolation_level=None)
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> "ScrubCheckpoint":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def remaining(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def start(self, paths: Iterable[str]) -> int:
+        """Begin a new pass over `paths`, dropping what is left of the previous one."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._connection.execute("DELETE FROM pending")
+            self._connection.executemany(
+                "INSERT INTO pending (path) VALUES (?)", ((path,) for path in paths)
+            )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        return self.remaining()
+
+    def next_page(self, size: int) -> list[tuple[int, str]]:
+        return self._connection.execute(
+            "SELECT seq, path FROM pending ORDER BY seq LIMIT ?", (size,)
+        ).fetchall()
+
+    def done(self, sequences: Iterable[int]) -> None:
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._connection.executemany(
+                "DELETE FROM pending WHERE seq = ?", ((seq,) for seq in sequences)
+            )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+@dataclass(frozen=True)
+class ScrubResult:
+    files: int
+    bytes_read: int
+    failed: int
+    # Files of the pass not verified yet; 0 when the pass is complete.
+    remaining: int
+
+
+def _result(path: Path, *, error: str | None, strategy: str | None, size: int) -> ExecutionResult:
+    decision = SortDecision(source=path, target_dir=path.parent, target_path=path, action="verify")
+    return ExecutionResult(
+        decision=decision,
+        performed=error is None,
+        error=error,
+        strategy=strategy,
+        size_bytes=size,
+    )
+
+
+def verify_file(
+    catalog: ArchiveCatalog,
+    relative: str,
+    *,
+    limiter: RateLimiter | None = None,
+    telemetry: Telemetry | None = None,
+) -> ExecutionResult:
+    """Re-hash one catalogued file and store or check its hash."""
+    path = catalog.archive_root / relative
+    entry = catalog.get(relative)
+    try:
+        stat_result = os.stat(path)
+    except OSError as exc:
+        return _result(path, error=f"verify_failed: {exc.strerror}", strategy=None, size=0)
+    with measure(telemetry, "fs.hash"):
+        content_hash = hash_file(path, limiter)
+    size = stat_result.st_size
+    if content_hash is None:
+        return _result(path, error="verify_failed: file could not be read", strategy=None, size=size)
+    if entry is None:
+        # Removed from the catalog since the pass started.
+        return _result(path, error=None, strategy=STRATEGY_RECORDED, size=size)
+
+    unchanged = (size, stat_result.st_mtime_ns) == (entry.size_bytes, entry.mtime_ns)
+    if entry.content_hash is None:
+        strategy = STRATEGY_RECORDED
+    elif content_hash == entry.content_hash:
+        strategy = STRATEGY_VERIFIED
+    elif not unchanged:
+        strategy = STRATEGY_UPDATED
+    else:
+        error = f"hash_mismatch: expected {entry.content_hash}, read {content_hash}"
+        return _result(path, error=error, strategy=None, size=size)
+    catalog.store_hash(relative, content_hash, stat_result)
+    return _result(path, error=None, strategy=strategy, size=size)
+
+
+def scrub_archive(
+    catalog: ArchiveCatalog,
+    checkpoint: ScrubCheckpoint,
+    *,
+    sink: Callable[[ExecutionResult], None],
+    workers: int = 4,
+    limiter: RateLimiter | None = None,
+    max_bytes: int = 0,
+    restart: bool = False,
+    telemetry: Telemetry | None = None,
+) -> ScrubResult:
+    """
+    Verify files until the pass is complete or `max_bytes` (0: no limit) have
+    been read; reading stops at the first page boundary past the budget.
+    A new pass is started when none is pending or `restart` is set.
+    """
+    if restart or checkpoint.remaining() == 0:
+        checkpoint.start(catalog.verification_order())
+
+    files = bytes_read = failed = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media-archiver-scrub") as pool:
+        while not max_bytes or bytes_read < max_bytes:
+            page = checkpoint.next_page(PAGE_FILES)
+            if not page:
+                break
+            results = pool.map(
+                lambda item: verify_file(catalog, item[1], limiter=limiter, telemetry=telemetry),
+                page,
+            )
+            for result in results:
+                sink(result)
+                files += 1
+                bytes_read += result.size_bytes
+                if result.error is not None:
+                    failed += 1
+                    if telemetry is not None:
+                        telemetry.count("errors", reason=error_reason(result.error))
+            checkpoint.done(seq for seq, _ in page)
+    if telemetry is not None:
+        telemetry.count("bytes_hashed", bytes_read)
+    return ScrubResult(
+        files=files,
+        bytes_read=bytes_read,
+        failed=failed,
+        remaining=checkpoint.remaining(),
+    )
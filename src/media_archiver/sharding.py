@@ -0,0 +1,302 @@
+"""
+Multi-process mode: shard scanning, resolution and planning across worker
+processes.
+
+The source directories are split into shards: with `top_level`, each
+top-level subfolder of a source is one unit (files directly in the source
+form another); with `hash`, every directory is a unit of its own. Units go
+to shards by a stable hash of their path. Each worker process scans its
+units, resolves and plans their files with its own planner (collision
+suffixes among its own files, target existence from the catalog or the
+filesystem) and returns the decisions sorted by scan position.
+
+The parent merges the shards in global scan order. A decision is taken
+over as is when its name is the one a single process would have assigned;
+only files whose name collides with a file of another shard in the same
+`archive_root/YYYY/MM_Month` folder are planned again. So the plan is
+identical to the one a single process would produce, and the parent only
+receives the finished decisions; no file list is sent to the workers.
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from media_archiver.catalog import ArchiveCatalog
+from media_archiver.config import AppConfig, SourceConfig
+from media_archiver.pipeline import (
+    DecisionExecutor,
+    PipelineResult,
+    Planner,
+    ResolvedFile,
+    ResultSink,
+    resolve_file,
+)
+from media_archiver.progress import Progress
+from media_archiver.scanner import FileInfo, iter_scan
+from media_archiver.sorter import SortDecision
+from media_archiver.sources import SourceScanState, planning_order, source_roots
+from media_archiver.telemetry import Telemetry, measure
+from media_archiver.throttle import RateLimiter
+
+
+@dataclass(frozen=True)
+class ShardUnit:
+    # Index of the source in planning order.
+    source: int
+    directory: Path
+    # False: only the files directly inside `directory`.
+    recursive: bool
+
+
+@dataclass(frozen=True)
+class ShardProposal:
+    # (source index, path): the position in a single process's scan order.
+    position: tuple[int, str]
+    resolved: ResolvedFile
+    decision: SortDecision
+
+
+@dataclass(frozen=True)
+class ShardPlan:
+    # Sorted by position.
+    proposals: list[ShardProposal]
+    # Supported and ignored entries per source index.
+    scanned: dict[int, int] = field(default_factory=dict)
+    ignored: dict[int, int] = field(default_factory=dict)
+
+
+def _subdirectories(directory: Path) -> list[Path]:
+    # Like the scanner, symlinked directories are not descended into.
+    try:
+        with os.scandir(directory) as listing:
+            found = []
+            for entry in listing:
+                try:
+                    if entry.is_dir() and not entry.is_symlink():
+                        found.append(Path(entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        return []
+    return sorted(found, key=str)
+
+
+def _all_directories(directory: Path) -> Iterator[Path]:
+    yield directory
+    for subdirectory in _subdirectories(directory):
+        yield from _all_directories(subdirectory)
+
+
+def shard_units(sources: Sequence[SourceConfig], strategy: str) -> Iterator[ShardUnit]:
+    """Work units covering every file of `sources` once; only directories are listed."""
+    for index, source in enumerate(sources):
+        if not source.path.is_dir():
+            # Scanned as usual, so the missing source is reported.
+            yield ShardUnit(source=index, directory=source.path, recursive=True)
+            continue
+        if strategy == "hash":
+            for directory in _all_directories(source.path):
+                yield ShardUnit(source=index, directory=directory, recursive=False)
+            continue
+        yield ShardUnit(source=index, directory=source.path, recursive=False)
+        for directory in _subdirectories(source.path):
+            yield ShardUnit(source=index, directory=directory, recursive=True)
+
+
+def assign_shards(units: Iterable[ShardUnit], *, shard_count: int) -> list[list[ShardUnit]]:
+    """Split units into `shard_count` shards; a directory always lands in the same shard."""
+    shards: list[list[ShardUnit]] = [[] for _ in range(shard_count)]
+    for unit in units:
+        # crc32 rather than hash(): str hashes are randomised per process.
+        shards[zlib.crc32(str(unit.directory).encode("utf-8")) % shard_count].append(unit)
+    return shards
+
+
+def plan_shard(
+    units: list[ShardUnit],
+    config: AppConfig,
+    current_time: datetime,
+    catalog_path: Path | None,
+    ops_per_second: float,
+) -> ShardPlan:
+    """Worker-process entry point; must stay importable at module level."""
+    # Limiters and catalog connections cannot cross processes: each worker
+    # gets its share of the stat budget and its own read-only catalog.
+    limiter = RateLimiter(ops_per_second=ops_per_second) if ops_per_second else None
+    catalog = None
+    if catalog_path is not None:
+        catalog = ArchiveCatalog(catalog_path, config.paths.archive_root, read_only=True)
+    planner = Planner(config=config, current_time=current_time, catalog=catalog)
+    archive_root = config.paths.archive_root
+    scanned: dict[int, int] = {}
+    ignored: dict[int, int] = {}
+    items: list[tuple[tuple[int, str], ResolvedFile]] = []
+    try:
+        for unit in units:
+            directories = _all_directories(unit.directory) if unit.recursive else [unit.directory]
+            for directory in directories:
+                for info in iter_scan([directory], limiter, recursive=False):
+                    if not isinstance(info, FileInfo):
+                        ignored[unit.source] = ignored.get(unit.source, 0) + 1
+                        continue
+                    scanned[unit.source] = scanned.get(unit.source, 0) + 1
+                    resolved = resolve_file(info, archive_root)
+                    if resolved is not None:
+                        # The scanner orders files by their unresolved path.
+                        position = (unit.source, str(directory / info.name))
+                        items.append((position, resolved))
+        # Directories interleave in scan order ("a/x" < "a/nested/y" < "a/z").
+        items.sort(key=lambda item: item[0])
+        proposals = [
+            ShardProposal(position=position, resolved=resolved, decision=planner.plan(resolved))
+            for position, resolved in items
+        ]
+    finally:
+        if catalog is not None:
+            catalog.close()
+    return ShardPlan(proposals=proposals, scanned=scanned, ignored=ignored)
+
+
+def merge_proposals(
+    shard_plans: Iterable[ShardPlan],
+    planner: Planner,
+) -> list[ShardProposal]:
+    """Take the shards' decisions over in global scan order; replans cross-shard collisions."""
+    merged = heapq.merge(
+        *(
+            [(shard, proposal) for proposal in plan.proposals]
+            for shard, plan in enumerate(shard_plans)
+        ),
+        key=lambda item: item[1].position,
+    )
+    # Target folder -> the shard that planned every name in it so far, or
+    # None once several did. While one shard owns a folder, its names are
+    # exactly those a single process assigns and need no check.
+    owners: dict[Path, int | None] = {}
+    adopted: list[ShardProposal] = []
+    for shard, proposal in merged:
+        target_dir = proposal.resolved.target_dir
+        owner = owners.setdefault(target_dir, shard)
+        if owner != shard:
+            owners[target_dir] = None
+        decision = planner.adopt(proposal.resolved, proposal.decision, same_names=owner == shard)
+        adopted.append(replace(proposal, decision=decision))
+    return adopted
+
+
+def run_sharded_pipeline(
+    *,
+    config: AppConfig,
+    apply: bool,
+    limiter: RateLimiter | None = None,
+    current_time: datetime | None = None,
+    sources: Sequence[SourceConfig | Path] | None = None,
+    progress: Progress | None = None,
+    telemetry: Telemetry | None = None,
+    sink: ResultSink | None = None,
+    catalog: ArchiveCatalog | None = None,
+) -> PipelineResult:
+    ordered = planning_order(sources if sources is not None else source_roots(config))
+    options = config.pipeline
+    current_time = current_time if current_time is not None else datetime.now()
+    shards = [
+        shard
+        for shard in assign_shards(
+            shard_units(ordered, options.shard_by),
+            shard_count=options.processes,
+        )
+        if shard
+    ]
+    if catalog is not None:
+        # The workers read the catalog file; rows still buffered here must be in it.
+        catalog.flush()
+    ops_per_second = limiter.rates[1] / len(shards) if limiter is not None and shards else 0.0
+
+    states = [SourceScanState(source=source.path, priority=source.priority) for source in ordered]
+    with ProcessPoolExecutor(max_workers=options.processes) as pool:
+        futures = [
+            pool.submit(
+                plan_shard,
+                shard,
+                config,
+                current_time,
+                catalog.path if catalog is not None else None,
+                ops_per_second,
+            )
+            for shard in shards
+        ]
+        shard_plans = []
+        for future in futures:
+            # Scanning, resolution and planning run in the workers; this is
+            # the parent's wait per shard.
+            with measure(telemetry, "stage.resolve"):
+                shard_plan = future.result()
+            shard_plans.append(shard_plan)
+            for index, count in shard_plan.scanned.items():
+                states[index].scanned += count
+            for index, count in shard_plan.ignored.items():
+                states[index].ignored += count
+            if progress is not None:
+                progress.count("scan", "files", sum(shard_plan.scanned.values()))
+                progress.count(
+                    "scan",
+                    "bytes",
+                    sum(proposal.resolved.info.size_bytes for proposal in shard_plan.proposals),
+                )
+                progress.count("resolve", "files", len(shard_plan.proposals))
+    for state in states:
+        state.finished = True
+    if progress is not None:
+        progress.finish_stage("scan")
+
+    planner = Planner(
+        config=config,
+        current_time=current_time,
+        progress=progress,
+        telemetry=telemetry,
+        catalog=catalog,
+    )
+    proposals = merge_proposals(shard_plans, planner)
+
+    executor = DecisionExecutor(
+        config=config,
+        apply=apply,
+        limiter=limiter,
+        progress=progress,
+        telemetry=telemetry,
+        catalog=catalog,
+    )
+    try:
+        for proposal in proposals:
+            executor.announce(proposal.decision)
+        with ThreadPoolExecutor(max_workers=options.execute_workers) as pool:
+            executed = pool.map(
+                lambda proposal: executor.execute(
+                    proposal.decision, proposal.resolved.info.size_bytes
+                ),
+                proposals,
+            )
+            results = []
+            for result in executed:
+                if sink is not None:
+                    sink(result)
+                else:
+                    results.append(result)
+        results = executor.finish(results)
+    finally:
+        executor.close()
+
+    return PipelineResult(
+        results=results,
+        cleanup_candidates=set(executor.cleanup_candidates),
+        sources=states,
+        deferred_errors=executor.deferred_errors(),
+    )
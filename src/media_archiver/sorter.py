@@ -4,13 +4,29 @@ Phase 6: Sorting orchestration (decision logic only).
 Determines target paths and actions without performing filesystem writes.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from pathlib import Path
+from pathlib import Path, PurePath, PureWindowsPath
 from typing import Literal
 
+from media_archiver.models import DateTimeResolution
 
-Action = Literal["copy", "move", "skip"]
+# "verify" is only used for scrub results (see scrub.py).
+Action = Literal["copy", "move", "skip", "verify"]
+
+# (target folder components, target name, source): the report order.
+SortKey = tuple[tuple[str, ...], str, str]
+
+
+def path_order(path: PurePath) -> tuple[str, ...]:
+    """Orders like comparing the Path objects: by component, case-insensitively on Windows."""
+    if isinstance(path, PureWindowsPath):
+        return tuple(part.lower() for part in path.parts)
+    return path.parts
+
+
+def sort_key(target_path: PurePath, source: str) -> SortKey:
+    return (path_order(target_path.parent), target_path.name, source)
 
 
 @dataclass(frozen=True)
@@ -20,6 +36,13 @@ class SortDecision:
     target_path: Path
     action: Action
     reason: str | None = None
+    # How the capture datetime was found; recorded in the archive catalog.
+    resolution: DateTimeResolution | None = field(default=None, repr=False, compare=False)
+    # Computed once here, so reports sort on plain tuples of strings.
+    sort_key: SortKey = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "sort_key", sort_key(self.target_path, str(self.source)))
 
 
 def determine_target_dir(
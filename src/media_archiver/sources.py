@@ -0,0 +1,161 @@
+"""
+Multiple source roots scanned in parallel.
+
+Each source is scanned by its own thread, with its own stat concurrency and
+its own scan state. Files are handed on in a fixed order: by descending
+priority, then by source path, and in scan order within a source. Planning
+(and therefore collision suffixes) does not depend on which source happens
+to be scanned faster.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from media_archiver.config import AppConfig, SourceConfig
+from media_archiver.progress import Progress
+from media_archiver.scanner import FileInfo, iter_scan
+from media_archiver.telemetry import Telemetry, measure
+from media_archiver.throttle import RateLimiter
+
+
+@dataclass
+class SourceScanState:
+    source: Path
+    priority: int
+    scanned: int = 0
+    ignored: int = 0
+    finished: bool = False
+
+
+def source_roots(config: AppConfig) -> list[SourceConfig]:
+    return list(config.paths.sources) or [SourceConfig(path=config.paths.unsorted)]
+
+
+def planning_order(sources: Iterable[SourceConfig | Path]) -> list[SourceConfig]:
+    normalized = [
+        source if isinstance(source, SourceConfig) else SourceConfig(path=source)
+        for source in sources
+    ]
+    return sorted(normalized, key=lambda source: (-source.priority, str(source.path)))
+
+
+class _Failed:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+_END = object()
+
+
+class SourceScanner:
+    """
+    Iterates the supported files of all sources in planning order.
+
+    Sources further down the order keep scanning into their own bounded
+    buffer while earlier sources are consumed. Closing the iterator early
+    stops all scanning threads.
+    """
+
+    def __init__(
+        self,
+        sources: Iterable[SourceConfig | Path],
+        *,
+        limiter: RateLimiter | None = None,
+        buffer_size: int = 256,
+        progress: Progress | None = None,
+        telemetry: Telemetry | None = None,
+    ) -> None:
+        self.sources = planning_order(sources)
+        self.states = [
+            SourceScanState(source=source.path, priority=source.priority)
+            for source in self.sources
+        ]
+        self._limiter = limiter
+        self._buffer_size = buffer_size
+        self._progress = progress
+        self._telemetry = telemetry
+
+    def __iter__(self) -> Iterator[FileInfo]:
+        stop = threading.Event()
+        buffers = [queue.Queue(maxsize=self._buffer_size) for _ in self.sources]
+        threads = [
+            threading.Thread(
+                target=self._scan_source,
+                args=(source, state, buffer, stop),
+                name=f"media-archiver-scan-{index}",
+                daemon=True,
+            )
+            for index, (source, state, buffer) in enumerate(
+                zip(self.sources, self.states, buffers)
+            )
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for buffer in buffers:
+                while True:
+                    item = buffer.get()
+                    if item is _END:
+                        break
+                    if isinstance(item, _Failed):
+                        raise item.error
+                    yield item
+            if self._progress is not None:
+                self._progress.finish_stage("scan")
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _scan_source(
+        self,
+        source: SourceConfig,
+        state: SourceScanState,
+        buffer: queue.Queue,
+        stop: threading.Event,
+    ) -> None:
+        items = iter_scan(
+            [source.path],
+            self._limiter,
+            workers=source.concurrency,
+            telemetry=self._telemetry,
+        )
+        try:
+            while True:
+                # Time spent producing items only, not waiting for buffer space.
+                with measure(self._telemetry, "stage.scan"):
+                    item = next(items, None)
+                if item is None:
+                    break
+                if isinstance(item, FileInfo):
+                    state.scanned += 1
+                    if self._progress is not None:
+                        self._progress.count("scan", "files")
+                        self._progress.count("scan", "bytes", item.size_bytes)
+                    if not _put(buffer, item, stop):
+                        return
+                else:
+                    state.ignored += 1
+                    if self._progress is not None:
+                        self._progress.count("scan", "ignored")
+            state.finished = True
+            _put(buffer, _END, stop)
+        except BaseException as exc:
+            _put(buffer, _Failed(exc), stop)
+        finally:
+            items.close()
+
+
+def _put(buffer: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            buffer.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
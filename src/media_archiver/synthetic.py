@@ -0,0 +1,246 @@
+"""
+Deterministic synthetic inboxes and archives for benchmarks.
+
+The same SyntheticSpec (including its seed) always produces the same tree:
+the same names, sizes, contents and modification times. Filenames are mixed
+from the patterns the datetime resolver recognises, plus plain camera names
+that fall back to the filesystem time. Duplicates are byte-identical copies
+of earlier files under another name; bursts are groups of files sharing one
+timestamp, so they collide on the canonical name and need suffixes.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from media_archiver.pipeline import resolve_file
+from media_archiver.renamer import canonical_base_name
+from media_archiver.scanner import FileInfo
+
+
+SIZE_DISTRIBUTIONS = {"fixed", "uniform", "lognormal"}
+
+# See _name_for for the name formats.
+PATTERN_EXTENSIONS = {
+    "camera": ".jpg",
+    "video": ".mp4",
+    "whatsapp": ".jpg",
+    "dashed": ".png",
+    "plain": ".JPG",
+}
+
+# name pattern -> relative weight
+DEFAULT_PATTERN_MIX = (
+    ("camera", 5),
+    ("video", 1),
+    ("whatsapp", 2),
+    ("dashed", 1),
+    ("plain", 1),
+)
+
+_EPOCH = datetime(2012, 1, 1)
+_SPAN_SECONDS = 12 * 365 * 24 * 3600
+_POOL_BYTES = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    files: int = 1000
+    seed: int = 0
+    size_distribution: str = "lognormal"
+    # fixed: every file has mean_size; uniform: 0..2*mean; lognormal: median mean_size.
+    mean_size: int = 16 * 1024
+    max_size: int = 1024 * 1024
+    pattern_mix: tuple[tuple[str, int], ...] = DEFAULT_PATTERN_MIX
+    duplicate_ratio: float = 0.05
+    burst_ratio: float = 0.1
+    burst_size: int = 5
+    folders: int = 20
+    # Files already in the archive: unrelated ones, plus copies of inbox files
+    # under their canonical name (these plan as target_exists skips).
+    archive_files: int = 0
+    archived_ratio: float = 0.0
+
+    def __post_init__(self) -> None:
+        if self.size_distribution not in SIZE_DISTRIBUTIONS:
+            raise ValueError(f"unknown size distribution: {self.size_distribution}")
+        if not self.pattern_mix or any(weight < 0 for _, weight in self.pattern_mix):
+            raise ValueError("pattern_mix needs non-negative weights")
+        unknown = {name for name, _ in self.pattern_mix} - set(PATTERN_EXTENSIONS)
+        if unknown:
+            raise ValueError(f"unknown filename patterns: {sorted(unknown)}")
+        for name in ("duplicate_ratio", "burst_ratio", "archived_ratio"):
+            if not 0.0 <= getattr(self, name) <= 1.0:
+                raise ValueError(f"{name} must be between 0 and 1")
+        if self.files < 0 or self.archive_files < 0 or self.folders < 1 or self.burst_size < 2:
+            raise ValueError("invalid file, folder or burst counts")
+
+
+@dataclass(frozen=True)
+class SyntheticFile:
+    relative_path: str
+    size_bytes: int
+    timestamp: datetime
+    duplicate_of: str | None = None
+
+
+@dataclass(frozen=True)
+class SyntheticTree:
+    inbox: Path
+    archive: Path
+    files: list[SyntheticFile]
+    archive_files: int
+    total_bytes: int
+
+
+def _name_for(pattern: str, moment: datetime, counter: int, extension: str) -> str:
+    if pattern in ("camera", "video"):
+        prefix = "IMG" if pattern == "camera" else "VID"
+        return f"{prefix}_{moment:%Y%m%d_%H%M%S}_{counter}{extension}"
+    if pattern == "whatsapp":
+        return f"IMG-{moment:%Y%m%d}-WA{counter:04d}{extension}"
+    if pattern == "dashed":
+        return f"Screenshot {moment:%Y-%m-%d} at {moment:%H.%M.%S} ({counter}){extension}"
+    return f"DSC{counter:06d}{extension}"
+
+
+def _size(spec: SyntheticSpec, rng: random.Random) -> int:
+    if spec.size_distribution == "fixed":
+        size = spec.mean_size
+    elif spec.size_distribution == "uniform":
+        size = rng.randint(0, 2 * spec.mean_size)
+    else:
+        size = int(rng.lognormvariate(0.0, 1.0) * spec.mean_size)
+    # Sizes stay >= 8 so every file can carry its unique header.
+    return max(8, min(size, spec.max_size))
+
+
+def plan_files(spec: SyntheticSpec) -> list[SyntheticFile]:
+    """The file list of `spec`, without touching the filesystem."""
+    rng = random.Random(spec.seed)
+    patterns = [name for name, _ in spec.pattern_mix]
+    weights = [weight for _, weight in spec.pattern_mix]
+
+    files: list[SyntheticFile] = []
+    burst_left = 0
+    burst_moment = _EPOCH
+    while len(files) < spec.files:
+        counter = len(files) + 1
+        folder = f"folder_{rng.randrange(spec.folders):03d}"
+        # burst_ratio is the share of files that belong to a burst.
+        if burst_left == 0 and rng.random() < spec.burst_ratio / spec.burst_size:
+            burst_left = spec.burst_size
+            burst_moment = _EPOCH + timedelta(seconds=rng.randrange(_SPAN_SECONDS))
+        if burst_left > 0:
+            # Same second, same camera pattern: the canonical names collide.
+            burst_left -= 1
+            pattern = "camera"
+            moment = burst_moment
+        else:
+            pattern = rng.choices(patterns, weights)[0]
+            moment = _EPOCH + timedelta(seconds=rng.randrange(_SPAN_SECONDS))
+        name = _name_for(pattern, moment, counter, PATTERN_EXTENSIONS[pattern])
+
+        duplicate_of = None
+        if files and rng.random() < spec.duplicate_ratio:
+            original = files[rng.randrange(len(files))]
+            duplicate_of = original.duplicate_of or original.relative_path
+            size = original.size_bytes
+        else:
+            size = _size(spec, rng)
+        files.append(
+            SyntheticFile(
+                relative_path=f"{folder}/{name}",
+                size_bytes=size,
+                timestamp=moment,
+                duplicate_of=duplicate_of,
+            )
+        )
+    return files
+
+
+def _content(pool: bytes, index: int, size: int) -> bytes:
+    """`size` bytes unique to `index`: an 8-byte header plus a window into the pool."""
+    header = index.to_bytes(8, "big")
+    body_size = size - len(header)
+    start = (index * 7919) % (len(pool) // 2)
+    if body_size <= len(pool) - start:
+        return header + pool[start:start + body_size]
+    return header + (pool * (body_size // len(pool) + 1))[start:start + body_size]
+
+
+def _write(path: Path, data: bytes, moment: datetime) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    timestamp = moment.timestamp()
+    os.utime(path, (timestamp, timestamp))
+
+
+def _archive_path(archive: Path, name: str, moment: datetime) -> Path:
+    """Where the pipeline would put a file called `name` with mtime `moment`."""
+    info = FileInfo(
+        absolute_path=Path(name),
+        name=name,
+        extension=Path(name).suffix.lower(),
+        size_bytes=0,
+        modified_timestamp=moment.timestamp(),
+    )
+    resolved = resolve_file(info, archive)
+    base_name = canonical_base_name(
+        original_name=name,
+        resolved_datetime=resolved.resolution.datetime,
+        source=resolved.resolution.source,
+    )
+    return resolved.target_dir / base_name
+
+
+def generate_tree(spec: SyntheticSpec, root: Path) -> SyntheticTree:
+    """Write `spec` below `root` as `inbox/` and `archive/`; both must not exist yet."""
+    inbox = root / "inbox"
+    archive = root / "archive"
+    inbox.mkdir(parents=True)
+    archive.mkdir(parents=True)
+
+    pool = random.Random(spec.seed).randbytes(_POOL_BYTES) * 2
+    files = plan_files(spec)
+    contents: dict[str, int] = {}
+    total_bytes = 0
+    for index, item in enumerate(files):
+        # Duplicates reuse the content index of their original.
+        content_index = contents[item.duplicate_of] if item.duplicate_of else index
+        contents[item.relative_path] = content_index
+        data = _content(pool, content_index, item.size_bytes)
+        _write(inbox / item.relative_path, data, item.timestamp)
+        total_bytes += item.size_bytes
+
+    rng = random.Random(spec.seed + 1)
+    archived = 0
+    for item in files:
+        if rng.random() >= spec.archived_ratio:
+            continue
+        target = _archive_path(archive, Path(item.relative_path).name, item.timestamp)
+        if target.exists():
+            continue
+        data = _content(pool, contents[item.relative_path], item.size_bytes)
+        _write(target, data, item.timestamp)
+        archived += 1
+
+    for index in range(spec.archive_files):
+        moment = _EPOCH + timedelta(seconds=rng.randrange(_SPAN_SECONDS))
+        target = _archive_path(archive, f"DSC_A{index:06d}.jpg", moment)
+        if target.exists():
+            continue
+        _write(target, _content(pool, len(files) + index, _size(spec, rng)), moment)
+        archived += 1
+
+    return SyntheticTree(
+        inbox=inbox,
+        archive=archive,
+        files=files,
+        archive_files=archived,
+        total_bytes=total_bytes,
+    )
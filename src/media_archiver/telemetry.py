@@ -0,0 +1,118 @@
+"""
+Lightweight hot-path instrumentation.
+
+A Telemetry object accumulates monotonic durations and call counts per
+category. Categories are dotted names: `stage.*` for pipeline stages (busy
+time summed over all workers of that stage) and `fs.*` / `cpu.*` for the
+individual operations inside them (stat, exists checks, copies, collision
+suffixes, report rendering). The summary is embedded in the JSON report.
+
+Every single measurement also lands in a fixed-bucket latency histogram,
+and named counters (optionally labelled) track totals such as bytes copied
+or errors by reason. Both are exported by metrics.py.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+# Upper bounds in seconds; the last, implicit bucket is +Inf.
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CounterKey = tuple[str, tuple[tuple[str, str], ...]]
+
+
+class Telemetry:
+    """Per-run timers, latency histograms and counters; safe to share between threads."""
+
+    def __init__(self, *, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._seconds: dict[str, float] = {}
+        self._calls: dict[str, int] = {}
+        self._buckets: dict[str, list[int]] = {}
+        self._bucket_seconds: dict[str, float] = {}
+        self._counters: dict[CounterKey, int] = {}
+
+    @contextmanager
+    def measure(self, category: str) -> Iterator[None]:
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.add(category, self._clock() - start)
+
+    def add(self, category: str, seconds: float, calls: int = 1) -> None:
+        """Record `calls` calls taking `seconds` in total; single calls feed the histogram."""
+        with self._lock:
+            self._seconds[category] = self._seconds.get(category, 0.0) + seconds
+            self._calls[category] = self._calls.get(category, 0) + calls
+            if calls == 1:
+                buckets = self._buckets.get(category)
+                if buckets is None:
+                    buckets = self._buckets[category] = [0] * (len(LATENCY_BUCKETS) + 1)
+                buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+                self._bucket_seconds[category] = self._bucket_seconds.get(category, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def histograms(self) -> dict[str, tuple[list[int], float]]:
+        """Per category: non-cumulative bucket counts and the sum of all observations."""
+        with self._lock:
+            return {
+                category: (list(buckets), self._bucket_seconds[category])
+                for category, buckets in self._buckets.items()
+            }
+
+    def counters(self) -> dict[CounterKey, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def summary(self) -> dict[str, dict[str, dict[str, float | int]]]:
+        """Nested by group: {"stage": {"scan": {"calls": n, "seconds": s}}, ...}."""
+        with self._lock:
+            seconds = dict(self._seconds)
+            calls = dict(self._calls)
+        grouped: dict[str, dict[str, dict[str, float | int]]] = {}
+        for category in sorted(seconds):
+            group, _, name = category.partition(".")
+            grouped.setdefault(group, {})[name or group] = {
+                "calls": calls[category],
+                "seconds": round(seconds[category], 6),
+            }
+        return grouped
+
+
+@contextmanager
+def measure(telemetry: Telemetry | None, category: str) -> Iterator[None]:
+    """Measure with `telemetry` when one is given; a no-op otherwise."""
+    if telemetry is None:
+        yield
+        return
+    with telemetry.measure(category):
+        yield
@@ -0,0 +1,139 @@
+"""I/O bandwidth and IOPS throttling shared by scanner, hasher and executor."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import yaml
+
+
+@dataclass
+class _Bucket:
+    rate: float
+    tokens: float
+    updated: float
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` tokens and return how long the caller has to wait."""
+        if self.rate <= 0 or amount <= 0:
+            return 0.0
+        # Burst capacity is one second worth of budget.
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def set_rate(self, rate: float, now: float) -> None:
+        self.rate = rate
+        self.tokens = min(self.tokens, rate)
+        self.updated = now
+
+
+class RateLimiter:
+    """
+    Token bucket with separate bytes/sec and ops/sec budgets.
+
+    A rate of 0 disables that budget. Large requests may overdraw the bucket;
+    the debt is paid back by sleeping, so the long-term rate holds. When a
+    control file is configured, it is re-read whenever its mtime changes
+    (checked at most every `reload_interval` seconds), which allows the
+    budgets to be adjusted while a run is in progress.
+    """
+
+    def __init__(
+        self,
+        *,
+        bytes_per_second: float = 0,
+        ops_per_second: float = 0,
+        control_file: Path | None = None,
+        reload_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        now = clock()
+        self._bytes = _Bucket(rate=bytes_per_second, tokens=bytes_per_second, updated=now)
+        self._ops = _Bucket(rate=ops_per_second, tokens=ops_per_second, updated=now)
+        self._control_file = control_file
+        self._control_mtime: float | None = None
+        self._reload_interval = reload_interval
+        self._next_reload = now
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    @property
+    def rates(self) -> tuple[float, float]:
+        with self._lock:
+            return self._bytes.rate, self._ops.rate
+
+    @property
+    def enabled(self) -> bool:
+        return self._control_file is not None or any(rate > 0 for rate in self.rates)
+
+    def set_rates(self, *, bytes_per_second: float, ops_per_second: float) -> None:
+        with self._lock:
+            now = self._clock()
+            self._bytes.set_rate(bytes_per_second, now)
+            self._ops.set_rate(ops_per_second, now)
+
+    def acquire(self, *, nbytes: int = 0, ops: int = 0) -> None:
+        """Block until `nbytes` bytes and `ops` operations fit the budgets."""
+        if nbytes <= 0 and ops <= 0:
+            return
+        with self._lock:
+            now = self._clock()
+            self._maybe_reload(now)
+            wait = max(
+                self._bytes.reserve(nbytes, now),
+                self._ops.reserve(ops, now),
+            )
+        if wait > 0:
+            self._sleep(wait)
+
+    def _maybe_reload(self, now: float) -> None:
+        if self._control_file is None or now < self._next_reload:
+            return
+        self._next_reload = now + self._reload_interval
+        try:
+            mtime = self._control_file.stat().st_mtime
+        except OSError:
+            return
+        if mtime == self._control_mtime:
+            return
+        self._control_mtime = mtime
+
+        rates = _read_control_file(self._control_file)
+        if rates is None:
+            # Keep the current budgets while the file is invalid or half-written.
+            return
+        bytes_per_second, ops_per_second = rates
+        self._bytes.set_rate(bytes_per_second, now)
+        self._ops.set_rate(ops_per_second, now)
+
+
+def _read_control_file(path: Path) -> tuple[float, float] | None:
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    try:
+        raw = yaml.safe_load(text) if path.suffix.lower() in {".yaml", ".yml"} else json.loads(text)
+    except (ValueError, yaml.YAMLError):
+        return None
+    if not isinstance(raw, dict):
+        return None
+
+    rates: list[float] = []
+    for key in ("bytes_per_second", "ops_per_second"):
+        value = raw.get(key, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            return None
+        rates.append(float(value))
+    return rates[0], rates[1]
@@ -0,0 +1,140 @@
+from pathlib import Path
+
+from media_archiver.archive_filter import ArchiveFilter, partial_key
+from media_archiver.catalog import hash_file, open_catalog
+from media_archiver.deduplicator import find_duplicates
+from media_archiver.executor import perform_decision
+from media_archiver.scanner import FileInfo
+from media_archiver.sorter import SortDecision
+from media_archiver.telemetry import Telemetry
+
+
+def test_filter_has_no_false_negatives_and_few_false_positives(tmp_path: Path):
+    archive_filter = ArchiveFilter(10_000, generation=1.5)
+    added = [f"archived-{index}".encode() for index in range(10_000)]
+    for key in added:
+        archive_filter.add(key)
+
+    path = tmp_path / "archive.bloom"
+    archive_filter.save(path)
+    loaded = ArchiveFilter.load(path)
+
+    assert (loaded.count, loaded.capacity, loaded.generation) == (10_000, 10_000, 1.5)
+    assert all(loaded.might_contain(key) for key in added)
+    false_positives = sum(loaded.might_contain(f"new-{index}".encode()) for index in range(10_000))
+    assert false_positives < 200
+    assert ArchiveFilter.load(tmp_path / "missing.bloom") is None
+
+
+def test_dedup_skips_files_the_filter_rules_out(tmp_path: Path, monkeypatch):
+    archive = tmp_path / "archive"
+    month = archive / "2021" / "09_September"
+    month.mkdir(parents=True)
+    (month / "2021-09-14_20-33-44.jpg").write_bytes(b"archived")
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    new = inbox / "IMG_0001.jpg"
+    new.write_bytes(b"brandnew")
+    again = inbox / "IMG_0002.jpg"
+    again.write_bytes(b"archived")
+    filter_path = tmp_path / "archive.bloom"
+
+    with open_catalog(tmp_path / "catalog.sqlite", archive, filter_path=filter_path) as catalog:
+        written = month / "2021-09-14_21-00-00.jpg"
+        written.write_bytes(b"recorded")
+        catalog.record(written)
+        assert catalog.archive_filter.might_contain(partial_key(written))
+
+    hashed: list[Path] = []
+    monkeypatch.setattr(
+        "media_archiver.deduplicator.hash_file",
+        lambda path, limiter=None: hashed.append(path) or hash_file(path),
+    )
+    telemetry = Telemetry()
+    with open_catalog(tmp_path / "catalog.sqlite", archive, filter_path=filter_path) as catalog:
+        # Loaded, not rebuilt: the recorded file is still in it.
+        assert catalog.archive_filter.count == 2
+        groups = find_duplicates(
+            files=[_info(new)], resolved_datetimes={}, catalog=catalog, telemetry=telemetry
+        )
+        assert groups == []
+        assert hashed == []
+
+        [group] = find_duplicates(files=[_info(again)], resolved_datetimes={}, catalog=catalog)
+        assert group.original == month / "2021-09-14_20-33-44.jpg"
+        assert group.duplicates == [again]
+
+    assert telemetry.counters()[("archive_filter", (("result", "negative"),))] == 1
+
+
+def test_filter_is_saved_with_every_committed_batch(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr("media_archiver.catalog._BATCH_ROWS", 1)
+    archive = tmp_path / "archive"
+    month = archive / "2021" / "09_September"
+    month.mkdir(parents=True)
+    filter_path = tmp_path / "archive.bloom"
+    catalog = open_catalog(tmp_path / "catalog.sqlite", archive, filter_path=filter_path)
+    try:
+        written = month / "2021-09-14_21-00-00.jpg"
+        written.write_bytes(b"recorded")
+        catalog.record(written)
+
+        # The row is committed; a crash now must not leave it out of the filter.
+        assert catalog.get(written) is not None
+        assert ArchiveFilter.load(filter_path).might_contain(partial_key(written))
+    finally:
+        catalog.close()
+
+
+def test_executor_derives_the_filter_key_while_copying(tmp_path: Path):
+    source = tmp_path / "inbox" / "IMG_0001.jpg"
+    source.parent.mkdir()
+    source.write_bytes(bytes(range(256)) * 1024)
+    expected = partial_key(source)
+
+    for index, (action, fast_paths, verify) in enumerate(
+        [("copy", False, False), ("copy", True, False), ("copy", True, True), ("move", True, False)]
+    ):
+        target = tmp_path / "archive" / f"{index}.jpg"
+        decision = SortDecision(
+            source=source, target_dir=target.parent, target_path=target, action=action
+        )
+        outcome = perform_decision(
+            decision=decision, apply=True, fast_paths=fast_paths, verify=verify, filter_key=True
+        )
+        assert outcome.performed
+        assert outcome.filter_key == expected
+
+
+def test_filter_is_only_consulted_for_sizes_in_the_archive(tmp_path: Path):
+    archive = tmp_path / "archive"
+    (archive / "2021").mkdir(parents=True)
+    (archive / "2021" / "2021-09-14_20-33-44.jpg").write_bytes(b"archived")
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    (inbox / "IMG_0001.jpg").write_bytes(b"a different size")
+    telemetry = Telemetry()
+
+    with open_catalog(
+        tmp_path / "catalog.sqlite", archive, filter_path=tmp_path / "archive.bloom"
+    ) as catalog:
+        groups = find_duplicates(
+            files=[_info(inbox / "IMG_0001.jpg")],
+            resolved_datetimes={},
+            catalog=catalog,
+            telemetry=telemetry,
+        )
+
+    assert groups == []
+    assert not any(name == "archive_filter" for name, _ in telemetry.counters())
+
+
+def _info(path: Path) -> FileInfo:
+    stat = path.stat()
+    return FileInfo(
+        absolute_path=path,
+        name=path.name,
+        extension=path.suffix.lower(),
+        size_bytes=stat.st_size,
+        modified_timestamp=stat.st_mtime,
+    )
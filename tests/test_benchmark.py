@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+from media_archiver.benchmark import main, run_benchmarks
+from media_archiver.synthetic import SyntheticSpec
+
+
+def test_benchmark_measures_each_stage(tmp_path: Path):
+    run = run_benchmarks(
+        SyntheticSpec(files=30, seed=3),
+        workdir=tmp_path,
+        stages=("resolve_datetime", "build_report"),
+        repetitions=2,
+    )
+
+    assert [stage.name for stage in run.stages] == ["resolve_datetime", "build_report"]
+    for stage in run.stages:
+        assert stage.items == 30
+        assert len(stage.seconds) == 2
+        assert stage.files_per_second > 0
+    # The generated tree is kept in the workdir; scratch space is removed.
+    assert (tmp_path / "tree" / "inbox").is_dir()
+    assert not any((tmp_path / "scratch").iterdir())
+
+
+def test_benchmark_cli_writes_json(tmp_path: Path):
+    output = tmp_path / "bench.json"
+
+    exit_code = main(
+        ["--files", "20", "--stage", "run_pipeline", "--apply", "--output", str(output)]
+    )
+
+    assert exit_code == 0
+    data = json.loads(output.read_text(encoding="utf-8"))
+    assert data["spec"]["files"] == 20
+    assert data["apply"] is True
+    assert data["stages"]["run_pipeline"]["items"] == 20
+    # The end-to-end time is attributed to the pipeline stages as well.
+    assert {"run_pipeline.scan", "run_pipeline.plan", "run_pipeline.report"} <= set(data["stages"])
+
+
+def test_benchmark_gate_fails_on_regressed_stage(tmp_path: Path, capsys):
+    baseline_path = tmp_path / "baseline.json"
+    arguments = ["--files", "20", "--stage", "resolve_datetime", "--output", str(baseline_path)]
+    assert main(arguments) == 0
+
+    assert main(["--baseline", str(baseline_path)]) == 0
+
+    # A baseline that claims the stage used to be much faster.
+    data = json.loads(baseline_path.read_text(encoding="utf-8"))
+    data["stages"]["resolve_datetime"]["seconds"] = [0.0]
+    baseline_path.write_text(json.dumps(data), encoding="utf-8")
+
+    assert main(["--baseline", str(baseline_path), "--noise-floor", "0"]) == 1
+    assert "Performance regression in: resolve_datetime" in capsys.readouterr().err
@@ -0,0 +1,247 @@
+from datetime import datetime
+from hashlib import sha256
+import json
+import os
+from pathlib import Path
+import sqlite3
+
+import pytest
+
+from media_archiver.catalog import ArchiveCatalog, CatalogQuery, open_catalog, query_catalog
+from media_archiver.cli import main
+from media_archiver.deduplicator import find_duplicates
+from media_archiver.models import ConfidenceLevel, DateTimeResolution, DateTimeSource
+from media_archiver.scanner import FileInfo
+
+
+def _archive(tmp_path: Path) -> Path:
+    archive = tmp_path / "archive"
+    month = archive / "2021" / "09_September"
+    month.mkdir(parents=True)
+    (month / "2021-09-14_20-33-44.jpg").write_bytes(b"first")
+    (month / "2021-09-14_20-33-44_01.jpg").write_bytes(b"second")
+    (archive / "2020" / "01_Januar").mkdir(parents=True)
+    (archive / "2020" / "01_Januar" / "2020-01-02_03-04-05.png").write_bytes(b"third!")
+    return archive
+
+
+def test_rebuild_indexes_archive_and_follows_external_changes(tmp_path: Path):
+    archive = _archive(tmp_path)
+    month = archive / "2021" / "09_September"
+
+    with open_catalog(archive / ".media-archiver" / "catalog.sqlite", archive) as catalog:
+        assert catalog.built
+        assert [entry.path for entry in catalog.entries()] == [
+            "2020/01_Januar/2020-01-02_03-04-05.png",
+            "2021/09_September/2021-09-14_20-33-44.jpg",
+            "2021/09_September/2021-09-14_20-33-44_01.jpg",
+        ]
+        entry = catalog.get(month / "2021-09-14_20-33-44_01.jpg")
+        assert entry.size_bytes == 6
+        assert entry.capture_datetime == datetime(2021, 9, 14, 20, 33, 44)
+        assert entry.datetime_source is DateTimeSource.FILENAME
+        assert catalog.totals("2021") == (2, 11)
+        assert catalog.contains(month / "2021-09-14_20-33-44.jpg")
+        assert not catalog.contains(month / "missing.jpg")
+
+    # Changed behind the tool's back: the directory's mtime gives it away.
+    (month / "2021-09-14_20-33-44.jpg").unlink()
+    (month / "added.jpg").write_bytes(b"new")
+    stat = month.stat()
+    os.utime(month, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    with ArchiveCatalog(archive / ".media-archiver" / "catalog.sqlite", archive) as catalog:
+        assert catalog.contains(month / "added.jpg")
+        assert not catalog.contains(month / "2021-09-14_20-33-44.jpg")
+        assert catalog.totals("2021") == (2, 9)
+
+
+def test_recorded_files_keep_resolution_and_hash_lazily(tmp_path: Path):
+    archive = _archive(tmp_path)
+    path = archive / "2021" / "09_September" / "2021-09-14_21-00-00.jpg"
+    database = tmp_path / "catalog.sqlite"
+    resolution = DateTimeResolution(
+        datetime=datetime(2021, 9, 14, 21, 0, 0),
+        source=DateTimeSource.EXIF,
+        confidence=ConfidenceLevel.HIGH,
+    )
+
+    with open_catalog(database, archive) as catalog:
+        assert not catalog.contains(path)
+        path.write_bytes(b"written")
+        catalog.record(path, resolution=resolution)
+        assert catalog.contains(path)
+        assert catalog.get(path).content_hash is None
+
+    with ArchiveCatalog(database, archive) as catalog:
+        entry = catalog.get(path)
+        assert entry.datetime_source is DateTimeSource.EXIF
+        assert entry.confidence is ConfidenceLevel.HIGH
+        assert catalog.content_hash(entry) == sha256(b"written").hexdigest()
+        assert catalog.get(path).hashed_at is not None
+        # The directory's mtime was recorded with our own write: no refresh needed.
+        assert catalog.names_in(path.parent) >= {path.name}
+
+
+def test_file_written_by_another_tool_after_our_write_is_not_masked(tmp_path: Path):
+    archive = _archive(tmp_path)
+    month = archive / "2021" / "09_September"
+    database = tmp_path / "catalog.sqlite"
+
+    with open_catalog(database, archive) as catalog:
+        assert not catalog.contains(month / "external.jpg")
+        (month / "ours.jpg").write_bytes(b"ours")
+        catalog.record(month / "ours.jpg")
+        (month / "external.jpg").write_bytes(b"theirs")
+
+    with ArchiveCatalog(database, archive) as catalog:
+        assert catalog.contains(month / "ours.jpg")
+        assert catalog.contains(month / "external.jpg")
+
+
+def test_read_only_catalog_follows_external_changes_without_writing(tmp_path: Path):
+    archive = _archive(tmp_path)
+    month = archive / "2021" / "09_September"
+    database = tmp_path / "catalog.sqlite"
+    filter_path = tmp_path / "archive.bloom"
+    with pytest.raises(FileNotFoundError):
+        open_catalog(database, archive, read_only=True)
+    assert not database.exists()
+
+    open_catalog(database, archive, filter_path=filter_path).close()
+    (month / "added.jpg").write_bytes(b"new")
+    stat = month.stat()
+    os.utime(month, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    before = database.read_bytes(), filter_path.read_bytes()
+
+    with open_catalog(database, archive, filter_path=filter_path, read_only=True) as catalog:
+        assert catalog.contains(month / "added.jpg")
+        entry = catalog.get(month / "2021-09-14_20-33-44.jpg")
+        assert catalog.content_hash(entry) == sha256(b"first").hexdigest()
+        catalog.forget([month])
+        assert catalog.contains(month / "added.jpg")
+
+    assert (database.read_bytes(), filter_path.read_bytes()) == before
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "archive",
+        "archive.bloom",
+        "catalog.sqlite",
+    ]
+
+
+def test_names_differing_in_case_match_where_the_platform_ignores_case(
+    tmp_path: Path, monkeypatch
+):
+    monkeypatch.setattr("media_archiver.catalog._name_key", str.lower)
+    archive = _archive(tmp_path)
+    month = archive / "2021" / "09_September"
+    (month / "IMG_0001.JPG").write_bytes(b"upper")
+
+    with open_catalog(tmp_path / "catalog.sqlite", archive) as catalog:
+        assert catalog.contains(month / "img_0001.jpg")
+        assert catalog.contains(month / "2021-09-14_20-33-44.JPG")
+        (month / "Recorded.MP4").write_bytes(b"video")
+        catalog.record(month / "Recorded.MP4")
+        assert catalog.contains(month / "recorded.mp4")
+        assert not catalog.contains(month / "other.jpg")
+
+
+def test_find_duplicates_prefers_the_archived_copy(tmp_path: Path):
+    archive = _archive(tmp_path)
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    incoming = inbox / "IMG_0001.jpg"
+    incoming.write_bytes(b"second")
+    unrelated = inbox / "IMG_0002.jpg"
+    unrelated.write_bytes(b"unique")
+    files = [
+        FileInfo(
+            absolute_path=path,
+            name=path.name,
+            extension=".jpg",
+            size_bytes=path.stat().st_size,
+            modified_timestamp=path.stat().st_mtime,
+        )
+        for path in (incoming, unrelated)
+    ]
+
+    with open_catalog(tmp_path / "catalog.sqlite", archive) as catalog:
+        groups = find_duplicates(files=files, resolved_datetimes={}, catalog=catalog)
+
+    assert len(groups) == 1
+    assert groups[0].original == archive / "2021" / "09_September" / "2021-09-14_20-33-44_01.jpg"
+    assert groups[0].duplicates == [incoming]
+
+
+def test_query_filters_on_indexed_attributes(tmp_path: Path, capsys):
+    archive = _archive(tmp_path)
+    july = archive / "2019" / "07_Juli"
+    july.mkdir(parents=True)
+    (july / "2019-07-04_10-00-00.mp4").write_bytes(b"video")
+    (july / "2019-07-05_10-00-00.jpg").write_bytes(b"photo")
+    (july / "misfiled.mov").write_bytes(b"mtime")
+    database = archive / ".media-archiver" / "catalog.sqlite"
+    with open_catalog(database, archive):
+        pass
+
+    def paths(**options):
+        return [entry.path for entry in query_catalog(database, CatalogQuery(**options))]
+
+    assert paths(
+        captured_from=datetime(2019, 7, 1),
+        captured_before=datetime(2019, 8, 1),
+        extensions=(".mp4", ".mov"),
+    ) == ["2019/07_Juli/2019-07-04_10-00-00.mp4"]
+    assert paths(confidences=(ConfidenceLevel.LOW,)) == ["2019/07_Juli/misfiled.mov"]
+    assert paths(sources=(DateTimeSource.FILENAME,), min_size=6, limit=1) == [
+        "2020/01_Januar/2020-01-02_03-04-05.png"
+    ]
+
+    connection = sqlite3.connect(database)
+    plan = connection.execute(
+        "EXPLAIN QUERY PLAN SELECT path FROM files WHERE capture_datetime >= ? "
+        "ORDER BY capture_datetime, path",
+        ("2019",),
+    ).fetchall()
+    connection.close()
+    assert "files_capture_datetime" in str(plan)
+
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        f"""
+paths:
+  archive_root: "{archive.as_posix()}"
+  unsorted: "{(tmp_path / 'unsorted').as_posix()}"
+  report_output: "{(tmp_path / 'reports').as_posix()}"
+behavior:
+  dry_run: true
+  move_files: false
+  normalize_month_folders: true
+naming:
+  month_format: "MM_Month"
+  filename_format: "YYYY-MM-DD_HH-mm-ss"
+duplicates:
+  detect: true
+  mode: "report-only"
+reporting:
+  markdown: false
+  json: false
+  verbose: false
+""",
+        encoding="utf-8",
+    )
+    # Read-only: a missing catalog is reported, never built.
+    assert main(["query", "--config", str(config), "--date", "2019"]) == 0
+    capsys.readouterr()
+    database.rename(tmp_path / "moved.sqlite")
+    assert main(["query", "--config", str(config), "--date", "2019"]) == 1
+    assert "no catalog at" in capsys.readouterr().err
+    assert not database.exists()
+    (tmp_path / "moved.sqlite").rename(database)
+
+    assert main(["query", "--config", str(config), "--date", "2019-07", "--kind", "image"]) == 0
+    assert capsys.readouterr().out.splitlines() == [str(july / "2019-07-05_10-00-00.jpg")]
+    assert main(["query", "--config", str(config), "--date", "2021", "--format", "jsonl"]) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["capture_datetime"] for line in lines] == ["2021-09-14T20:33:44"] * 2
+    assert lines[0]["datetime_source"] == "filename"
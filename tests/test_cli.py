@@ -1,4 +1,6 @@
-from media_archiver.cli import parse_args
+from datetime import datetime
+
+from media_archiver.cli import parse_args, parse_query_args
 
 
 def test_parse_args_requires_config():
@@ -10,3 +12,11 @@ def test_parse_args_requires_config():
 def test_parse_args_apply_flag():
     args = parse_args(["--config", "config.yaml", "--apply"])
     assert args.apply is True
+
+
+def test_parse_query_args_date_range_and_kind():
+    args = parse_query_args(["--date", "2019-12", "--kind", "video", "--format", "jsonl"])
+    assert args.date == (datetime(2019, 12, 1), datetime(2020, 1, 1))
+    assert args.kind == "video"
+    assert parse_query_args(["--date", "2019"]).date == (datetime(2019, 1, 1), datetime(2020, 1, 1))
+    assert parse_query_args(["--extension", "MP4"]).extension == [".mp4"]
@@ -1,6 +1,8 @@
 from pathlib import Path
 
+from media_archiver.catalog import ArchiveCatalog
 from media_archiver.cli import main
+from media_archiver.models import DateTimeSource
 
 
 def test_cli_apply_cleans_empty_unsorted_dirs(tmp_path: Path):
@@ -53,3 +55,58 @@ reporting:
     assert not nested.exists()
     assert not source.exists()
     assert any(archive.rglob("*.jpg"))
+
+
+def test_cli_apply_records_copies_in_catalog(tmp_path: Path):
+    archive = tmp_path / "archive"
+    unsorted = tmp_path / "unsorted"
+    reports = tmp_path / "reports"
+    archive.mkdir()
+    unsorted.mkdir()
+    reports.mkdir()
+    (unsorted / "IMG_20210914_203344.jpg").write_text("x", encoding="utf-8")
+
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        f"""
+paths:
+  archive_root: "{archive.as_posix()}"
+  unsorted: "{unsorted.as_posix()}"
+  report_output: "{reports.as_posix()}"
+
+behavior:
+  dry_run: false
+  move_files: false
+  normalize_month_folders: true
+
+naming:
+  month_format: "MM_Month"
+  filename_format: "YYYY-MM-DD_HH-mm-ss"
+  preserve_original_filename: false
+
+duplicates:
+  detect: true
+  mode: "report-only"
+
+reporting:
+  markdown: false
+  json: true
+  verbose: false
+
+catalog:
+  enabled: true
+""",
+        encoding="utf-8",
+    )
+
+    assert main(["--config", str(config)]) == 0
+    database = archive / ".media-archiver" / "catalog.sqlite"
+    with ArchiveCatalog(database, archive) as catalog:
+        [entry] = catalog.entries()
+        assert entry.path.endswith("2021-09-14_20-33-44.jpg")
+        assert entry.datetime_source is DateTimeSource.FILENAME
+
+    # The second run finds the target through the catalog and skips it.
+    assert main(["--config", str(config)]) == 0
+    newest = max(reports.glob("*.json"), key=lambda path: path.name)
+    assert '"reason": "target_exists"' in newest.read_text(encoding="utf-8")
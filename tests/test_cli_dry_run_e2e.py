@@ -1,5 +1,8 @@
+import json
 from pathlib import Path
 
+import pytest
+
 from media_archiver.cli import main
 
 
@@ -61,3 +64,237 @@ reporting:
     assert '"action": "copy"' in text
     assert '"performed": false' in text
     assert "_01" in text
+
+
+def test_cli_profile_writes_timings_and_profiles(tmp_path: Path):
+    unsorted = tmp_path / "unsorted"
+    reports = tmp_path / "reports"
+    unsorted.mkdir()
+    (unsorted / "IMG-20210914_203344.jpg").write_text("x", encoding="utf-8")
+
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        f"""
+paths:
+  archive_root: "{(tmp_path / 'archive').as_posix()}"
+  unsorted: "{unsorted.as_posix()}"
+  report_output: "{reports.as_posix()}"
+
+behavior:
+  dry_run: true
+  move_files: false
+  normalize_month_folders: true
+
+naming:
+  month_format: "MM_Month"
+  filename_format: "YYYY-MM-DD_HH-mm-ss"
+
+duplicates:
+  detect: false
+  mode: "report-only"
+
+reporting:
+  markdown: true
+  json: true
+  verbose: false
+
+progress:
+  tty: false
+""",
+        encoding="utf-8",
+    )
+
+    assert main(["--config", str(config), "--profile"]) == 0
+
+    summary = json.loads(next(reports.glob("*.json")).read_text(encoding="utf-8"))["summary"]
+    timings = summary["timings"]
+    assert timings["fs"]["stat"]["calls"] == 1
+    assert timings["stage"]["plan"]["calls"] == 1
+    assert timings["cpu"]["to_markdown"]["calls"] == 1
+
+    profile_dir = next(reports.glob("*_profile"))
+    assert (profile_dir / "plan.pstats").is_file()
+    assert (profile_dir / "report.pstats").is_file()
+    assert "allocation sites" in (profile_dir / "plan.memory.txt").read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_cli_per_year_markdown_layout(tmp_path: Path, capsys, streaming: bool):
+    unsorted = tmp_path / "unsorted"
+    reports = tmp_path / "reports"
+    unsorted.mkdir()
+    for name in ("IMG_20210914_203344.jpg", "IMG_20200101_120000.jpg"):
+        (unsorted / name).write_text("x", encoding="utf-8")
+
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        f"""
+paths:
+  archive_root: "{(tmp_path / 'archive').as_posix()}"
+  unsorted: "{unsorted.as_posix()}"
+  report_output: "{reports.as_posix()}"
+
+behavior:
+  dry_run: true
+  move_files: false
+  normalize_month_folders: true
+
+naming:
+  month_format: "MM_Month"
+  filename_format: "YYYY-MM-DD_HH-mm-ss"
+
+duplicates:
+  detect: false
+  mode: "report-only"
+
+reporting:
+  markdown: true
+  json: false
+  verbose: false
+  streaming: {str(streaming).lower()}
+  markdown_layout: per_year
+  markdown_details: all
+
+progress:
+  tty: false
+""",
+        encoding="utf-8",
+    )
+
+    assert main(["--config", str(config)]) == 0
+
+    index = next(reports.glob("*_markdown")) / "index.md"
+    assert f"Report written to: {index}" in capsys.readouterr().out
+    assert "| [2020](2020.md) | 1 |" in index.read_text(encoding="utf-8")
+    assert "IMG_20210914_203344.jpg" in (index.parent / "2021.md").read_text(encoding="utf-8")
+    assert not list(reports.glob("*.md"))
+
+
+def test_cli_streaming_report_writes_jsonl(tmp_path: Path):
+    unsorted = tmp_path / "unsorted"
+    reports = tmp_path / "reports"
+    unsorted.mkdir()
+    for name in ("IMG_20210914_203344.jpg", "IMG_20210914_203344_1.jpg", "IMG_20200101_120000.jpg"):
+        (unsorted / name).write_text("x", encoding="utf-8")
+
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        f"""
+paths:
+  archive_root: "{(tmp_path / 'archive').as_posix()}"
+  unsorted: "{unsorted.as_posix()}"
+  report_output: "{reports.as_posix()}"
+
+behavior:
+  dry_run: true
+  move_files: false
+  normalize_month_folders: true
+
+naming:
+  month_format: "MM_Month"
+  filename_format: "YYYY-MM-DD_HH-mm-ss"
+
+duplicates:
+  detect: false
+  mode: "report-only"
+
+reporting:
+  markdown: true
+  json: true
+  verbose: false
+  streaming: true
+  spill_entries: 1
+
+progress:
+  tty: false
+""",
+        encoding="utf-8",
+    )
+
+    assert main(["--config", str(config)]) == 0
+
+    assert not list(reports.glob("*.json"))
+    lines = [
+        json.loads(line)
+        for line in next(reports.glob("*.jsonl")).read_text(encoding="utf-8").splitlines()
+    ]
+    assert lines[0]["type"] == "summary"
+    assert lines[0]["total_files"] == 3
+    assert "stage" in lines[0]["timings"]
+    targets = [line["target_path"] for line in lines if line["type"] == "entry"]
+    assert [Path(target).name for target in targets] == [
+        "2020-01-01_12-00-00.jpg",
+        "2021-09-14_20-33-44.jpg",
+        "2021-09-14_20-33-44_01.jpg",
+    ]
+    assert "## Detailed Actions" in next(reports.glob("*.md")).read_text(encoding="utf-8")
+    # No spill files are left behind.
+    assert not [path for path in reports.iterdir() if path.name.startswith(".")]
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_cli_sqlite_report_is_queryable(tmp_path: Path, capsys, streaming: bool):
+    unsorted = tmp_path / "unsorted"
+    reports = tmp_path / "reports"
+    unsorted.mkdir()
+    for name in ("IMG_20210914_203344.jpg", "IMG_20200101_120000.jpg"):
+        (unsorted / name).write_text("x", encoding="utf-8")
+    database = reports / "reports.sqlite"
+
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        f"""
+paths:
+  archive_root: "{(tmp_path / 'archive').as_posix()}"
+  unsorted: "{unsorted.as_posix()}"
+  report_output: "{reports.as_posix()}"
+
+behavior:
+  dry_run: true
+  move_files: false
+  normalize_month_folders: true
+
+naming:
+  month_format: "MM_Month"
+  filename_format: "YYYY-MM-DD_HH-mm-ss"
+
+duplicates:
+  detect: false
+  mode: "report-only"
+
+reporting:
+  markdown: false
+  json: false
+  verbose: false
+  streaming: {str(streaming).lower()}
+  sqlite: "{database.as_posix()}"
+
+progress:
+  tty: false
+""",
+        encoding="utf-8",
+    )
+
+    assert main(["--config", str(config)]) == 0
+    assert main(["--config", str(config)]) == 0
+    capsys.readouterr()
+
+    query = ["report", "query", "--config", str(config), "--name", "IMG_20200101_120000.jpg"]
+    assert main([*query, "--format", "jsonl"]) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["run_id"] for line in lines] == [2, 1]
+    assert Path(lines[0]["target_path"]).name == "2020-01-01_12-00-00.jpg"
+    assert lines[0]["action"] == "copy"
+
+    assert main(["report", "query", "--db", str(database), "--latest"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+    # The second run of the same database is compared with the first one.
+    (unsorted / "IMG_20220202_101010.jpg").write_text("x", encoding="utf-8")
+    assert main(["--config", str(config)]) == 0
+    capsys.readouterr()
+    assert main(["report", "diff", str(database), str(database), "--format", "jsonl"]) == 0
+    diffs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(diff["status"], Path(diff["source_path"]).name) for diff in diffs] == [
+        ("added", "IMG_20220202_101010.jpg")
+    ]
@@ -67,3 +67,88 @@ paths:
 
   with pytest.raises(ConfigError):
     load_config(config_file)
+
+
+_MINIMAL_CONFIG = """
+paths:
+  archive_root: "D:/Photos"
+  unsorted: "D:/Photos/_unsorted"
+  report_output: "D:/Photos/_reports"
+
+behavior:
+  dry_run: true
+  move_files: false
+  normalize_month_folders: true
+
+naming:
+  month_format: "MM_MonthName"
+  filename_format: "YYYY-MM-DD_HH-mm-ss_source"
+
+duplicates:
+  detect: true
+  mode: "report-only"
+
+reporting:
+  markdown: true
+  json: true
+  verbose: true
+"""
+
+
+def test_execution_section_is_optional(tmp_path: Path):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(_MINIMAL_CONFIG, encoding="utf-8")
+
+    config = load_config(config_file)
+
+    assert config.execution.fast_paths is False
+    assert config.execution.verify_copies is False
+    assert config.execution.directory_workers == 8
+
+
+def test_execution_rejects_invalid_worker_count(tmp_path: Path):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        _MINIMAL_CONFIG + "\nexecution:\n  directory_workers: 0\n",
+        encoding="utf-8",
+    )
+
+    with pytest.raises(ConfigError):
+        load_config(config_file)
+
+
+def test_sources_accept_paths_and_mappings(tmp_path: Path):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        _MINIMAL_CONFIG.replace(
+            '  unsorted: "D:/Photos/_unsorted"\n',
+            "  sources:\n"
+            '    - "D:/Sync/phone"\n'
+            '    - path: "D:/Sync/sdcard"\n'
+            "      priority: 5\n"
+            "      concurrency: 4\n",
+        ),
+        encoding="utf-8",
+    )
+
+    config = load_config(config_file)
+
+    assert config.paths.unsorted == Path("D:/Sync/phone")
+    assert [(s.path, s.priority, s.concurrency) for s in config.paths.sources] == [
+        (Path("D:/Sync/phone"), 0, 1),
+        (Path("D:/Sync/sdcard"), 5, 4),
+    ]
+
+
+def test_sources_reject_duplicate_paths(tmp_path: Path):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        _MINIMAL_CONFIG.replace(
+            "  report_output:",
+            '  sources: ["D:/Sync/phone", "D:/Sync/phone"]\n  report_output:',
+        ),
+        encoding="utf-8",
+    )
+
+    with pytest.raises(ConfigError):
+        load_config(config_file)
@@ -0,0 +1,233 @@
+import multiprocessing
+from dataclasses import replace
+from datetime import datetime
+from pathlib import Path
+
+from media_archiver.config import (
+    AppConfig,
+    BehaviorConfig,
+    DuplicateConfig,
+    NamingConfig,
+    PathsConfig,
+    ReportingConfig,
+)
+from media_archiver.coordination import CooperativePipeline, WorkQueue, source_directories
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _make_config(tmp_path: Path) -> AppConfig:
+    return AppConfig(
+        paths=PathsConfig(
+            archive_root=tmp_path / "archive",
+            unsorted=tmp_path / "unsorted",
+            report_output=tmp_path / "reports",
+        ),
+        behavior=BehaviorConfig(dry_run=False, move_files=True, normalize_month_folders=True),
+        naming=NamingConfig(
+            month_format="MM_Month",
+            filename_format="YYYY-MM-DD_HH-mm-ss",
+            preserve_original_filename=False,
+        ),
+        duplicates=DuplicateConfig(detect=False, mode="report-only"),
+        reporting=ReportingConfig(markdown=False, json=False, verbose=False),
+    )
+
+
+def _populate(unsorted: Path) -> None:
+    # Same timestamps in every folder, so all workers collide on names.
+    for folder in ["a", "b", "b/nested", "c", "d"]:
+        directory = unsorted / folder
+        directory.mkdir(parents=True, exist_ok=True)
+        for index in range(5):
+            (directory / f"IMG_20210914_20334{index}.jpg").write_bytes(f"{folder}{index}".encode())
+
+
+def _worker(tmp_path: str, owner: str, queue_file: str, results) -> None:
+    config = _make_config(Path(tmp_path))
+    queue = WorkQueue(Path(queue_file), owner=owner, lease_seconds=30)
+    result = CooperativePipeline(
+        config=config,
+        apply=True,
+        queue=queue,
+        current_time=datetime(2030, 1, 1),
+        poll_interval=0.05,
+    ).run([config.paths.unsorted])
+    results.put(
+        [
+            (str(item.decision.source), str(item.decision.target_path), item.performed)
+            for item in result.results
+        ]
+    )
+
+
+def test_lease_is_exclusive_until_it_expires(tmp_path: Path):
+    clock = _FakeClock()
+    first = WorkQueue(tmp_path / "queue.db", owner="first", lease_seconds=10, clock=clock)
+    second = WorkQueue(tmp_path / "queue.db", owner="second", lease_seconds=10, clock=clock)
+    first.seed([tmp_path / "a"])
+
+    assert first.lease() == tmp_path / "a"
+    assert second.lease() is None
+
+    clock.now += 5
+    first.heartbeat()
+    clock.now += 8
+    assert second.lease() is None
+
+    clock.now += 5
+    assert second.lease() == tmp_path / "a"
+    assert not first.complete(tmp_path / "a")
+    assert second.complete(tmp_path / "a")
+    assert first.remaining() == 0
+
+
+def test_reused_queue_file_starts_a_new_import_once_drained(tmp_path: Path):
+    config = _make_config(tmp_path)
+    queue_file = tmp_path / "queue.db"
+
+    def run() -> list:
+        queue = WorkQueue(queue_file, owner="only", lease_seconds=30)
+        return CooperativePipeline(
+            config=config,
+            apply=True,
+            queue=queue,
+            current_time=datetime(2030, 1, 1),
+            poll_interval=0.05,
+        ).run([config.paths.unsorted]).results
+
+    _populate(config.paths.unsorted)
+    assert len(run()) == 25
+
+    (config.paths.unsorted / "a" / "IMG_20220101_101010.jpg").write_bytes(b"later")
+    [result] = run()
+    assert result.performed
+    assert result.decision.target_path.name == "2022-01-01_10-10-10.jpg"
+
+
+def test_lost_lease_is_reported(tmp_path: Path):
+    clock = _FakeClock()
+    config = _make_config(tmp_path)
+    _populate(config.paths.unsorted)
+    queue = WorkQueue(tmp_path / "queue.db", owner="slow", lease_seconds=10, clock=clock)
+    other = WorkQueue(tmp_path / "queue.db", owner="other", lease_seconds=10, clock=clock)
+    pipeline = CooperativePipeline(
+        config=config,
+        apply=True,
+        queue=queue,
+        current_time=datetime(2030, 1, 1),
+        poll_interval=0.05,
+    )
+    process_unit = pipeline._process_unit
+
+    def stall(unit: Path):
+        results = process_unit(unit)
+        if unit.name == "a":
+            clock.now += 11
+            assert other.lease() == unit
+            assert other.complete(unit)
+        return results
+
+    pipeline._process_unit = stall
+    result = pipeline.run([config.paths.unsorted])
+
+    assert result.lost_leases == [config.paths.unsorted / "a"]
+    assert queue.holder(config.paths.unsorted / "a") == ("done", None)
+
+
+def test_unit_taken_over_after_expiry_skips_what_was_written(tmp_path: Path):
+    clock = _FakeClock()
+    config = _make_config(tmp_path)
+    config = replace(config, behavior=replace(config.behavior, move_files=False))
+    unsorted = config.paths.unsorted
+    (unsorted / "a").mkdir(parents=True)
+    for index in range(3):
+        (unsorted / "a" / f"IMG_20210914_20334{index}.jpg").write_bytes(b"%d" % index)
+
+    def pipeline(owner: str) -> CooperativePipeline:
+        queue = WorkQueue(tmp_path / "queue.db", owner=owner, lease_seconds=10, clock=clock)
+        return CooperativePipeline(
+            config=config,
+            apply=True,
+            queue=queue,
+            current_time=datetime(2030, 1, 1),
+            poll_interval=0.05,
+        )
+
+    # The first worker copies the unit and dies before completing it.
+    dead = pipeline("dead")
+    dead._queue.seed([unsorted / "a"])
+    assert dead._queue.lease() == unsorted / "a"
+    assert all(result.performed for result in dead._process_unit(unsorted / "a"))
+
+    clock.now += 11
+    results = pipeline("next").run([unsorted]).results
+
+    assert [result.decision.reason for result in results] == ["target_exists"] * 3
+    names = sorted(path.name for path in (tmp_path / "archive").rglob("*.jpg"))
+    assert names == [f"2021-09-14_20-33-4{index}.jpg" for index in range(3)]
+
+
+def test_directory_claims_are_all_or_nothing(tmp_path: Path):
+    clock = _FakeClock()
+    first = WorkQueue(tmp_path / "queue.db", owner="first", lease_seconds=10, clock=clock)
+    second = WorkQueue(tmp_path / "queue.db", owner="second", lease_seconds=10, clock=clock)
+    x, y = tmp_path / "x", tmp_path / "y"
+
+    assert first.claim_directories([x])
+    assert not second.claim_directories([y, x])
+    # The failed attempt must not have kept a partial claim on y.
+    assert first.claim_directories([y])
+
+    first.release_directories([x, y])
+    assert second.claim_directories([x, y])
+
+    clock.now += 11
+    assert first.claim_directories([x])
+
+
+def test_source_directories_lists_every_directory_once(tmp_path: Path):
+    unsorted = tmp_path / "unsorted"
+    _populate(unsorted)
+
+    assert source_directories(unsorted) == [
+        unsorted,
+        unsorted / "a",
+        unsorted / "b",
+        unsorted / "b" / "nested",
+        unsorted / "c",
+        unsorted / "d",
+    ]
+    assert source_directories(tmp_path / "missing") == []
+
+
+def test_several_processes_split_one_import_safely(tmp_path: Path):
+    _populate(tmp_path / "unsorted")
+    queue_file = tmp_path / "queue.db"
+    WorkQueue(queue_file)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [
+        context.Process(target=_worker, args=(str(tmp_path), f"w{index}", str(queue_file), results))
+        for index in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    collected = [entry for _ in workers for entry in results.get(timeout=60)]
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    sources = [source for source, _, _ in collected]
+    targets = [target for _, target, performed in collected if performed]
+    assert len(sources) == len(set(sources)) == 25
+    assert len(targets) == len(set(targets)) == 25
+    assert not list((tmp_path / "unsorted").rglob("*.jpg"))
+    assert len(list((tmp_path / "archive").rglob("*.jpg"))) == 25
@@ -3,6 +3,7 @@ from pathlib import Path
 
 from media_archiver.deduplicator import find_duplicates
 from media_archiver.scanner import FileInfo
+from media_archiver.telemetry import Telemetry
 
 
 def _make_file_info(path: Path) -> FileInfo:
@@ -76,10 +77,43 @@ def test_find_duplicates_handles_hash_errors(tmp_path: Path, monkeypatch):
         file_b: datetime(2020, 1, 2, 0, 0, 0),
     }
 
-    def fake_hash(_path):
+    def fake_hash(_path, _limiter=None):
         return None
 
-    monkeypatch.setattr("media_archiver.deduplicator._hash_file", fake_hash)
+    monkeypatch.setattr("media_archiver.deduplicator.hash_file", fake_hash)
 
     groups = find_duplicates(files=files, resolved_datetimes=resolved_datetimes)
     assert groups == []
+
+
+def test_find_duplicates_exports_computed_hashes(tmp_path: Path):
+    file_a = tmp_path / "a.jpg"
+    file_b = tmp_path / "b.jpg"
+    file_a.write_bytes(b"same")
+    file_b.write_bytes(b"same")
+
+    content_hashes: dict[Path, str] = {}
+    find_duplicates(
+        files=[_make_file_info(file_a), _make_file_info(file_b)],
+        resolved_datetimes={},
+        content_hashes=content_hashes,
+    )
+
+    assert set(content_hashes) == {file_a, file_b}
+    assert content_hashes[file_a] == content_hashes[file_b]
+
+
+def test_find_duplicates_records_hash_latency_and_duplicate_count(tmp_path: Path):
+    paths = [tmp_path / name for name in ("a.jpg", "b.jpg", "c.jpg")]
+    for path in paths:
+        path.write_bytes(b"same")
+    telemetry = Telemetry()
+
+    find_duplicates(
+        files=[_make_file_info(path) for path in paths],
+        resolved_datetimes={},
+        telemetry=telemetry,
+    )
+
+    assert sum(telemetry.histograms()["fs.hash"][0]) == 3
+    assert telemetry.counters() == {("duplicates_found", ()): 2}
@@ -1,9 +1,27 @@
+import errno
+import os
+from hashlib import sha256
 from pathlib import Path
 from unittest.mock import patch
 
 import yaml
 
-from media_archiver.executor import execute_decision
+from media_archiver import executor
+from media_archiver.executor import (
+    STRATEGY_BUFFERED,
+    STRATEGY_COPY2,
+    STRATEGY_COPY_FILE_RANGE,
+    STRATEGY_HARDLINK,
+    STRATEGY_REFLINK,
+    STRATEGY_RENAME,
+    STRATEGY_SENDFILE,
+    TEMP_SUFFIX,
+    DurabilityBatch,
+    FilesystemCapabilities,
+    TargetDirectories,
+    execute_decision,
+    perform_decision,
+)
 from media_archiver.sorter import SortDecision
 
 
@@ -40,6 +58,7 @@ def test_executor_executes_copy_and_move_from_fixtures():
             patch.object(Path, "mkdir", lambda *args, **kwargs: None),
             patch("shutil.copy2", lambda *args, **kwargs: None),
             patch("shutil.move", lambda *args, **kwargs: None),
+            patch.object(executor, "_link_into_place", lambda *args, **kwargs: None),
         ):
             performed = execute_decision(
                 decision=decision,
@@ -63,3 +82,332 @@ def test_executor_handles_io_errors():
         patch("shutil.copy2", side_effect=OSError("disk full")),
     ):
         assert execute_decision(decision=decision, apply=True) is False
+
+
+def _real_decision(tmp_path: Path, action: str) -> SortDecision:
+    source = tmp_path / "unsorted" / "IMG_0001.jpg"
+    source.parent.mkdir()
+    source.write_bytes(b"image-bytes" * 100)
+    target_dir = tmp_path / "archive" / "2021" / "08_August"
+    return SortDecision(
+        source=source,
+        target_dir=target_dir,
+        target_path=target_dir / "2021-08-03_19-11-44.jpg",
+        action=action,
+        reason=None,
+    )
+
+
+def test_fast_copy_records_kernel_strategy(tmp_path: Path):
+    decision = _real_decision(tmp_path, "copy")
+
+    outcome = perform_decision(decision=decision, apply=True, fast_paths=True)
+
+    assert outcome.performed is True
+    assert outcome.error is None
+    assert outcome.strategy in {
+        STRATEGY_REFLINK,
+        STRATEGY_COPY_FILE_RANGE,
+        STRATEGY_SENDFILE,
+        STRATEGY_BUFFERED,
+        STRATEGY_COPY2,
+    }
+    assert decision.target_path.read_bytes() == decision.source.read_bytes()
+    assert decision.target_path.stat().st_mtime == decision.source.stat().st_mtime
+
+
+def test_fast_move_on_same_filesystem_links_instead_of_copying(tmp_path: Path):
+    decision = _real_decision(tmp_path, "move")
+    payload = decision.source.read_bytes()
+
+    outcome = perform_decision(decision=decision, apply=True, fast_paths=True)
+
+    assert outcome.performed is True
+    assert outcome.strategy in {STRATEGY_HARDLINK, STRATEGY_RENAME}
+    assert not decision.source.exists()
+    assert decision.target_path.read_bytes() == payload
+
+
+def test_fast_copy_never_overwrites_existing_target(tmp_path: Path):
+    decision = _real_decision(tmp_path, "copy")
+    decision.target_dir.mkdir(parents=True)
+    decision.target_path.write_bytes(b"existing")
+
+    outcome = perform_decision(decision=decision, apply=True, fast_paths=True)
+
+    assert outcome.performed is False
+    assert outcome.error is not None
+    assert outcome.error.startswith("copy_failed")
+    assert decision.target_path.read_bytes() == b"existing"
+
+
+def test_plain_copy_and_move_never_overwrite_existing_target(tmp_path: Path):
+    for action in ("copy", "move"):
+        (tmp_path / action).mkdir()
+        decision = _real_decision(tmp_path / action, action)
+        decision.target_dir.mkdir(parents=True)
+        decision.target_path.write_bytes(b"existing")
+
+        outcome = perform_decision(decision=decision, apply=True)
+
+        assert outcome.performed is False
+        assert outcome.error.startswith(f"{action}_failed")
+        assert decision.target_path.read_bytes() == b"existing"
+        assert decision.source.exists()
+        assert sorted(p.name for p in decision.target_dir.iterdir()) == [decision.target_path.name]
+
+
+def test_unsupported_kernel_copy_falls_back_and_is_remembered(tmp_path: Path, monkeypatch):
+    calls: list[str] = []
+
+    def unsupported(strategy):
+        def _copy(source_fd, target_fd, size, limiter):
+            calls.append(strategy)
+            raise OSError(errno.EXDEV, "cross-device")
+
+        return _copy
+
+    monkeypatch.setattr(
+        executor,
+        "_COPY_FUNCTIONS",
+        {name: unsupported(name) for name in executor._COPY_FUNCTIONS},
+    )
+    monkeypatch.setattr(executor, "_kernel_copy_strategies", lambda: [STRATEGY_COPY_FILE_RANGE])
+
+    capabilities = FilesystemCapabilities()
+    first = _real_decision(tmp_path, "copy")
+    outcome = perform_decision(
+        decision=first, apply=True, fast_paths=True, capabilities=capabilities
+    )
+
+    assert outcome.strategy == STRATEGY_BUFFERED
+    assert first.target_path.read_bytes() == first.source.read_bytes()
+
+    second = SortDecision(
+        source=first.source,
+        target_dir=first.target_dir,
+        target_path=first.target_dir / "second.jpg",
+        action="copy",
+        reason=None,
+    )
+    perform_decision(decision=second, apply=True, fast_paths=True, capabilities=capabilities)
+
+    assert calls == [STRATEGY_COPY_FILE_RANGE]
+
+
+def test_short_kernel_copy_is_never_published(tmp_path: Path, monkeypatch):
+    def stalls_after(limit):
+        def copy_file_range(source_fd, target_fd, count):
+            written = os.fstat(target_fd).st_size
+            data = os.read(source_fd, max(0, min(count, limit - written)))
+            return os.write(target_fd, data) if data else 0
+
+        return copy_file_range
+
+    monkeypatch.setattr(executor, "_kernel_copy_strategies", lambda: [STRATEGY_COPY_FILE_RANGE])
+    monkeypatch.setattr(os, "copy_file_range", stalls_after(100), raising=False)
+    monkeypatch.setattr(executor, "_same_device", lambda source, target_dir: False)
+    decision = _real_decision(tmp_path, "move")
+
+    outcome = perform_decision(decision=decision, apply=True, fast_paths=True)
+
+    assert outcome.performed is False
+    assert outcome.error.startswith("move_failed")
+    assert decision.source.exists()
+    assert not decision.target_dir.exists() or not list(decision.target_dir.iterdir())
+
+    # No progress at all is still this file's failure: the primitive stays usable.
+    monkeypatch.setattr(os, "copy_file_range", stalls_after(0), raising=False)
+    capabilities = FilesystemCapabilities()
+    outcome = perform_decision(
+        decision=decision, apply=True, fast_paths=True, capabilities=capabilities
+    )
+
+    assert outcome.performed is False
+    assert outcome.error.startswith("move_failed")
+    assert decision.source.exists()
+    assert capabilities._unsupported == set()
+
+
+def test_real_kernel_copy_failures_are_not_remembered_as_unsupported(tmp_path: Path, monkeypatch):
+    def denied(source_fd, target_fd, size, limiter):
+        raise OSError(errno.EPERM, "Operation not permitted")
+
+    monkeypatch.setattr(executor, "_COPY_FUNCTIONS", {STRATEGY_COPY_FILE_RANGE: denied})
+    monkeypatch.setattr(executor, "_kernel_copy_strategies", lambda: [STRATEGY_COPY_FILE_RANGE])
+    capabilities = FilesystemCapabilities()
+    decision = _real_decision(tmp_path, "copy")
+
+    outcome = perform_decision(
+        decision=decision, apply=True, fast_paths=True, capabilities=capabilities
+    )
+
+    assert outcome.error.startswith("copy_failed")
+    assert capabilities._unsupported == set()
+
+
+def test_verified_copy_hashes_while_streaming(tmp_path: Path):
+    decision = _real_decision(tmp_path, "copy")
+
+    outcome = perform_decision(decision=decision, apply=True, fast_paths=True, verify=True)
+
+    assert outcome.performed is True
+    assert outcome.strategy == STRATEGY_BUFFERED
+    assert outcome.content_hash == sha256(decision.source.read_bytes()).hexdigest()
+    # Once while streaming, once more re-reading the target.
+    assert outcome.bytes_hashed == 2 * decision.source.stat().st_size
+
+
+def test_verified_copy_reuses_known_source_hash(tmp_path: Path):
+    decision = _real_decision(tmp_path, "copy")
+    known = sha256(decision.source.read_bytes()).hexdigest()
+
+    outcome = perform_decision(
+        decision=decision,
+        apply=True,
+        fast_paths=True,
+        verify=True,
+        source_hash=known,
+    )
+
+    assert outcome.performed is True
+    assert outcome.content_hash == known
+    size = decision.source.stat().st_size
+    # A kernel copy skips the source; only the target is read back.
+    assert outcome.bytes_hashed == (2 * size if outcome.strategy == STRATEGY_BUFFERED else size)
+
+
+def test_verified_move_mismatch_keeps_source_and_removes_target(tmp_path: Path, monkeypatch):
+    decision = _real_decision(tmp_path, "move")
+    monkeypatch.setattr(executor, "_same_device", lambda source, target_dir: False)
+    monkeypatch.setattr(executor, "_hash_uncached", lambda path: "0" * 64)
+
+    outcome = perform_decision(decision=decision, apply=True, fast_paths=True, verify=True)
+
+    assert outcome.performed is False
+    assert outcome.error is not None
+    assert outcome.error.startswith("verify_failed")
+    assert outcome.bytes_hashed == 2 * decision.source.stat().st_size
+    assert decision.source.exists()
+    assert not decision.target_path.exists()
+
+
+def test_cross_device_move_defers_source_removal_until_flush(tmp_path: Path, monkeypatch):
+    decision = _real_decision(tmp_path, "move")
+    payload = decision.source.read_bytes()
+    synced: list[Path] = []
+    monkeypatch.setattr(executor, "_same_device", lambda source, target_dir: False)
+    monkeypatch.setattr(executor, "_fsync_directory", synced.append)
+
+    durability = DurabilityBatch()
+    outcome = perform_decision(
+        decision=decision,
+        apply=True,
+        fast_paths=True,
+        durability=durability,
+    )
+
+    assert outcome.performed is True
+    assert outcome.strategy.endswith("+unlink")
+    assert decision.target_path.read_bytes() == payload
+    assert decision.source.exists()
+    assert not list(decision.target_dir.glob(f"*{TEMP_SUFFIX}"))
+
+    assert durability.flush() == {}
+    assert synced == [decision.target_dir]
+    assert not decision.source.exists()
+
+
+def test_durability_batch_syncs_each_directory_once(tmp_path: Path, monkeypatch):
+    synced: list[Path] = []
+    monkeypatch.setattr(executor, "_fsync_directory", synced.append)
+    target_dir = tmp_path / "target"
+    sources = [tmp_path / f"{index}.jpg" for index in range(3)]
+    for source in sources:
+        source.write_bytes(b"x")
+
+    durability = DurabilityBatch(max_pending=3)
+    for source in sources:
+        assert durability.should_flush() is False
+        durability.register(target_dir, source)
+
+    assert durability.should_flush() is True
+    assert durability.flush() == {}
+    assert synced == [target_dir]
+    assert not any(source.exists() for source in sources)
+
+
+def test_durability_batch_keeps_sources_when_sync_fails(tmp_path: Path, monkeypatch):
+    def broken_sync(directory):
+        raise OSError(errno.EIO, "I/O error")
+
+    monkeypatch.setattr(executor, "_fsync_directory", broken_sync)
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"x")
+
+    durability = DurabilityBatch()
+    durability.register(tmp_path / "target", source)
+    failures = durability.flush()
+
+    assert failures[source].startswith("sync_failed")
+    assert source.exists()
+
+
+def test_interrupted_copy_leaves_no_file_under_target_name(tmp_path: Path, monkeypatch):
+    decision = _real_decision(tmp_path, "copy")
+
+    def interrupted(source_fd, target_fd, hasher=None, limiter=None):
+        os.write(target_fd, b"partial")
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(executor, "_kernel_copy_strategies", lambda: [])
+    monkeypatch.setattr(executor, "_buffered_copy", interrupted)
+
+    try:
+        perform_decision(decision=decision, apply=True, fast_paths=True, verify=True)
+    except KeyboardInterrupt:
+        pass
+
+    assert not decision.target_path.exists()
+    assert list(decision.target_dir.iterdir()) == []
+
+
+def test_target_directories_materialize_once_and_skip_mkdir_afterwards(tmp_path: Path):
+    month_dirs = [tmp_path / "2021" / "08_August", tmp_path / "2021" / "09_September"]
+    directories = TargetDirectories()
+
+    failures = directories.materialize(month_dirs + month_dirs, max_workers=4)
+
+    assert failures == {}
+    assert all(directory.is_dir() for directory in month_dirs)
+    assert all(directory in directories for directory in month_dirs)
+
+    decision = _real_decision(tmp_path, "copy")
+    decision = SortDecision(
+        source=decision.source,
+        target_dir=month_dirs[0],
+        target_path=month_dirs[0] / "a.jpg",
+        action="copy",
+        reason=None,
+    )
+    with patch.object(Path, "mkdir", side_effect=AssertionError("mkdir called")):
+        outcome = perform_decision(
+            decision=decision,
+            apply=True,
+            fast_paths=True,
+            directories=directories,
+        )
+
+    assert outcome.performed is True
+
+
+def test_target_directories_report_mkdir_failures(tmp_path: Path):
+    blocker = tmp_path / "2021"
+    blocker.write_text("not a directory", encoding="utf-8")
+    directories = TargetDirectories()
+
+    failures = directories.materialize([blocker / "08_August"])
+
+    assert list(failures) == [blocker / "08_August"]
+    assert failures[blocker / "08_August"].startswith("mkdir_failed")
+    assert (blocker / "08_August") not in directories
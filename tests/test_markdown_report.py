@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from media_archiver.markdown_report import YearlyMarkdownWriter, write_yearly_markdown
+from media_archiver.reporter import Report, ReportEntry, ReportSummary
+
+
+def _entry(source: str, target: str, action: str = "copy", reason=None, size=1024):
+    return ReportEntry(
+        source_path=source,
+        target_path=target,
+        action=action,
+        performed=False,
+        reason=reason,
+        size_bytes=size,
+    )
+
+
+def _summary(**counts) -> ReportSummary:
+    values = dict(total_files=0, copied=0, moved=0, skipped=0, errors=0)
+    values.update(counts)
+    return ReportSummary(timestamp="2025-01-01T00-00-00", dry_run=True, move_files=False, **values)
+
+
+def test_yearly_pages_aggregate_and_list_exceptions(tmp_path: Path):
+    report = Report(
+        summary=_summary(total_files=4, copied=3, skipped=1, errors=1),
+        entries=[
+            _entry("/in/a.jpg", "/arc/2019/07_Juli/a.jpg", size=2048),
+            _entry("/in/b.jpg", "/arc/2019/07_Juli/b.jpg", "skip", "target_exists"),
+            _entry("/in/c.jpg", "/arc/2019/08_August/c.jpg", reason="copy_failed: disk full"),
+            _entry("/in/d|e.jpg", "/arc/2021/01_Januar/d.jpg"),
+        ],
+        errors=["copy_failed: disk full"],
+    )
+
+    index = write_yearly_markdown(report, output_dir=tmp_path, prefix="dry_run")
+
+    assert index.parent.name == "2025-01-01T00-00-00_dry_run_markdown"
+    assert sorted(path.name for path in index.parent.iterdir()) == ["2019.md", "2021.md", "index.md"]
+    text = index.read_text(encoding="utf-8")
+    assert "| [2019](2019.md) | 3 | 4.0 KB | 1 |" in text
+    assert "| copy | 3 | 4.0 KB |" in text
+    assert "| copy_failed | 1 | 1.0 KB |" in text
+    assert "- copy_failed: disk full" in text
+
+    year = (index.parent / "2019.md").read_text(encoding="utf-8")
+    assert "| 07_Juli | 2 | 3.0 KB |" in year
+    assert "| 08_August | 1 | 1.0 KB |" in year
+    assert "/in/b.jpg" in year and "/in/c.jpg" in year
+    # Plain copies are only counted, not listed.
+    assert "/in/a.jpg" not in year
+    assert "- None" in (index.parent / "2021.md").read_text(encoding="utf-8")
+
+
+def test_all_details_and_non_contiguous_years(tmp_path: Path):
+    writer = YearlyMarkdownWriter(output_dir=tmp_path, base_name="r", details="all")
+    with writer:
+        writer.add_entry(_entry("/in/a.jpg", "/arc/2020/01_Januar/a.jpg"))
+        writer.add_entry(_entry("/in/b.jpg", "/elsewhere/b.jpg"))
+        writer.add_entry(_entry("/in/c|x.jpg", "/arc/2020/02_Februar/c.jpg"))
+        index = writer.finish(_summary(total_files=3, copied=3))
+
+    page = (index.parent / "2020.md").read_text(encoding="utf-8")
+    assert "## Files" in page
+    assert "/in/a.jpg" in page and "/in/c\\|x.jpg" in page
+    assert (index.parent / "other.md").is_file()
+    assert "- None" in index.read_text(encoding="utf-8")
+    assert not [path for path in index.parent.iterdir() if path.name.startswith(".")]
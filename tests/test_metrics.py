@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from media_archiver.metrics import render_textfile, write_textfile
+from media_archiver.telemetry import Telemetry
+
+
+def test_textfile_contains_cumulative_histograms_and_counters():
+    telemetry = Telemetry()
+    telemetry.add("fs.stat", 0.0002)
+    telemetry.add("fs.stat", 0.003)
+    telemetry.add("fs.stat", 30.0)
+    # Aggregated additions do not feed the histogram.
+    telemetry.add("fs.stat", 5.0, calls=10)
+    telemetry.count("bytes_copied", 2048)
+    telemetry.count("errors", reason="copy_failed")
+    telemetry.count("errors", reason="copy_failed")
+    telemetry.count("errors", reason="stat_failed")
+
+    lines = render_textfile(telemetry, finished_at=1700000000.0).splitlines()
+
+    assert "# TYPE media_archiver_fs_duration_seconds histogram" in lines
+    assert 'media_archiver_fs_duration_seconds_bucket{name="stat",le="0.0001"} 0' in lines
+    assert 'media_archiver_fs_duration_seconds_bucket{name="stat",le="0.00025"} 1' in lines
+    assert 'media_archiver_fs_duration_seconds_bucket{name="stat",le="0.005"} 2' in lines
+    assert 'media_archiver_fs_duration_seconds_bucket{name="stat",le="10.0"} 2' in lines
+    assert 'media_archiver_fs_duration_seconds_bucket{name="stat",le="+Inf"} 3' in lines
+    assert 'media_archiver_fs_duration_seconds_count{name="stat"} 3' in lines
+    assert 'media_archiver_fs_duration_seconds_sum{name="stat"} 30.003200000' in lines
+    assert "media_archiver_bytes_copied_total 2048" in lines
+    assert 'media_archiver_errors_total{reason="copy_failed"} 2' in lines
+    assert 'media_archiver_errors_total{reason="stat_failed"} 1' in lines
+    assert "media_archiver_last_run_timestamp_seconds 1700000000.000" in lines
+
+
+def test_write_textfile_replaces_file_without_leftovers(tmp_path: Path):
+    target = tmp_path / "textfile" / "media_archiver.prom"
+    telemetry = Telemetry()
+
+    write_textfile(target, telemetry, finished_at=1.0)
+    telemetry.count("duplicates_found", 3)
+    write_textfile(target, telemetry, finished_at=2.0)
+
+    assert "media_archiver_duplicates_found_total 3" in target.read_text(encoding="utf-8")
+    assert [path.name for path in target.parent.iterdir()] == ["media_archiver.prom"]
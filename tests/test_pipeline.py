@@ -0,0 +1,206 @@
+import asyncio
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from media_archiver import pipeline
+from media_archiver.async_pipeline import AsyncPipeline
+from media_archiver.config import (
+    AppConfig,
+    BehaviorConfig,
+    DuplicateConfig,
+    NamingConfig,
+    PathsConfig,
+    PipelineConfig,
+    ReportingConfig,
+    SourceConfig,
+)
+from media_archiver.pipeline import Planner, StagedPipeline, resolve_file
+from media_archiver.scanner import FileInfo, iter_scan, scan_directories
+from media_archiver.sharding import assign_shards, run_sharded_pipeline, shard_units
+
+
+def _make_config(tmp_path: Path, *, move_files: bool = False, **pipeline_options) -> AppConfig:
+    return AppConfig(
+        paths=PathsConfig(
+            archive_root=tmp_path / "archive",
+            unsorted=tmp_path / "unsorted",
+            report_output=tmp_path / "reports",
+        ),
+        behavior=BehaviorConfig(dry_run=False, move_files=move_files, normalize_month_folders=True),
+        naming=NamingConfig(
+            month_format="MM_Month",
+            filename_format="YYYY-MM-DD_HH-mm-ss",
+            preserve_original_filename=False,
+        ),
+        duplicates=DuplicateConfig(detect=False, mode="report-only"),
+        reporting=ReportingConfig(markdown=False, json=False, verbose=False),
+        pipeline=PipelineConfig(**pipeline_options),
+    )
+
+
+def _populate(unsorted: Path) -> None:
+    # Directory names chosen so that per-directory and full-path ordering
+    # could diverge ("a b" < "a-1" < "a/" in str order).
+    for folder in ["a", "a b", "a-1", "a/nested", "z"]:
+        directory = unsorted / folder
+        directory.mkdir(parents=True, exist_ok=True)
+        for index in range(4):
+            (directory / f"IMG_20210914_20334{index}.jpg").write_bytes(f"{folder}{index}".encode())
+            (directory / f"IMG-20210914-WA000{index}.jpg").write_bytes(b"wa")
+        (directory / "notes.txt").write_text("ignored", encoding="utf-8")
+
+
+def _sequential(config: AppConfig, current_time: datetime):
+    planner = Planner(config=config, current_time=current_time)
+    decisions = []
+    for info in scan_directories([config.paths.unsorted]).supported:
+        resolved = resolve_file(info, config.paths.archive_root)
+        if resolved is not None:
+            decisions.append(planner.plan(resolved))
+    return decisions
+
+
+def test_iter_scan_matches_scan_directories_order(tmp_path: Path):
+    unsorted = tmp_path / "unsorted"
+    _populate(unsorted)
+
+    expected = scan_directories([unsorted, tmp_path / "missing"])
+    streamed = list(iter_scan([unsorted, tmp_path / "missing"]))
+
+    assert streamed[0].reason == "directory_not_found"
+    assert [item for item in streamed if isinstance(item, FileInfo)] == expected.supported
+    assert [item for item in streamed if not isinstance(item, FileInfo)] == expected.ignored
+
+
+def test_staged_pipeline_matches_sequential_planning(tmp_path: Path):
+    config = _make_config(tmp_path, queue_size=2, resolve_workers=3, execute_workers=3)
+    _populate(config.paths.unsorted)
+    current_time = datetime(2030, 1, 1)
+
+    expected = _sequential(config, current_time)
+    result = StagedPipeline(config=config, apply=False, current_time=current_time).run(
+        [config.paths.unsorted]
+    )
+
+    assert [item.decision for item in result.results] == expected
+    assert any(item.decision.target_path.name.endswith("_01.jpg") for item in result.results)
+
+
+def test_staged_pipeline_apply_moves_every_file_once(tmp_path: Path):
+    config = _make_config(tmp_path, move_files=True, queue_size=1, execute_workers=4)
+    _populate(config.paths.unsorted)
+
+    result = StagedPipeline(config=config, apply=True).run([config.paths.unsorted])
+
+    assert all(item.performed for item in result.results)
+    assert all(item.error is None for item in result.results)
+    archived = list(config.paths.archive_root.rglob("*.jpg"))
+    assert len(archived) == len(result.results) == 40
+    assert not list(config.paths.unsorted.rglob("*.jpg"))
+
+
+def test_staged_pipeline_propagates_stage_failures(tmp_path: Path, monkeypatch):
+    config = _make_config(tmp_path, queue_size=1)
+    _populate(config.paths.unsorted)
+
+    def broken_resolve(info, archive_root, telemetry=None):
+        raise RuntimeError("resolver crashed")
+
+    monkeypatch.setattr(pipeline, "resolve_file", broken_resolve)
+
+    with pytest.raises(RuntimeError, match="resolver crashed"):
+        StagedPipeline(config=config, apply=False).run([config.paths.unsorted])
+
+
+def test_async_driver_matches_threaded_driver(tmp_path: Path):
+    config = _make_config(tmp_path, driver="asyncio", queue_size=3, resolve_workers=2)
+    _populate(config.paths.unsorted)
+    current_time = datetime(2030, 1, 1)
+
+    expected = _sequential(config, current_time)
+    result = asyncio.run(
+        AsyncPipeline(config=config, apply=False, current_time=current_time).run(
+            [config.paths.unsorted]
+        )
+    )
+
+    assert result.interrupted is False
+    assert [item.decision for item in result.results] == expected
+
+
+def test_async_driver_stops_cooperatively_and_keeps_completed_work(tmp_path: Path):
+    config = _make_config(tmp_path, move_files=True, driver="asyncio", queue_size=1)
+    _populate(config.paths.unsorted)
+    async_pipeline = AsyncPipeline(config=config, apply=True)
+    original_execute = async_pipeline._executor.execute
+
+    def execute_then_stop(decision, size_bytes=0):
+        result = original_execute(decision, size_bytes)
+        async_pipeline._loop.call_soon_threadsafe(async_pipeline.request_stop)
+        return result
+
+    async_pipeline._executor.execute = execute_then_stop
+
+    async def run():
+        async_pipeline._loop = asyncio.get_running_loop()
+        return await async_pipeline.run([config.paths.unsorted])
+
+    result = asyncio.run(run())
+
+    assert result.interrupted is True
+    assert 0 < len(result.results) < 40
+    # Every reported move really happened, and nothing else was moved.
+    archived = sorted(config.paths.archive_root.rglob("*.jpg"))
+    assert sorted(item.decision.target_path for item in result.results) == archived
+    assert all(item.performed for item in result.results)
+
+
+@pytest.mark.parametrize("shard_by", ["top_level", "hash"])
+def test_sharded_driver_matches_single_process_planning(tmp_path: Path, shard_by: str):
+    config = _make_config(tmp_path, processes=2, shard_by=shard_by, execute_workers=2)
+    # Every folder plans the same names, so shards collide in one month folder.
+    _populate(config.paths.unsorted)
+    archived = config.paths.archive_root / "2021" / "09_September" / "2021-09-14_20-33-41.jpg"
+    archived.parent.mkdir(parents=True)
+    archived.write_bytes(b"archived")
+    current_time = datetime(2030, 1, 1)
+
+    expected = _sequential(config, current_time)
+    result = run_sharded_pipeline(config=config, apply=False, current_time=current_time)
+
+    assert [item.decision for item in result.results] == expected
+    assert sum(item.decision.reason == "target_exists" for item in result.results) == 1
+    [state] = result.sources
+    assert (state.scanned, state.ignored, state.finished) == (40, 5, True)
+
+
+def test_shard_units_cover_every_directory_once(tmp_path: Path):
+    unsorted = tmp_path / "unsorted"
+    _populate(unsorted)
+    sources = [SourceConfig(path=unsorted)]
+
+    top_level = list(shard_units(sources, "top_level"))
+    hashed = list(shard_units(sources, "hash"))
+
+    assert [(unit.directory, unit.recursive) for unit in top_level] == [
+        (unsorted, False),
+        (unsorted / "a", True),
+        (unsorted / "a b", True),
+        (unsorted / "a-1", True),
+        (unsorted / "z", True),
+    ]
+    assert [(unit.directory, unit.recursive) for unit in hashed] == [
+        (unsorted, False),
+        (unsorted / "a", False),
+        (unsorted / "a" / "nested", False),
+        (unsorted / "a b", False),
+        (unsorted / "a-1", False),
+        (unsorted / "z", False),
+    ]
+    shards = assign_shards(hashed, shard_count=3)
+    assert sorted(unit.directory for shard in shards for unit in shard) == sorted(
+        unit.directory for unit in hashed
+    )
+    assert assign_shards(hashed, shard_count=3) == shards
@@ -0,0 +1,49 @@
+import pstats
+import threading
+import time
+from pathlib import Path
+
+from media_archiver.profiling import StageProfiler
+
+
+def _busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_concurrent_stages_are_profiled_separately(tmp_path: Path):
+    with StageProfiler(tmp_path) as profiler:
+
+        def stage(name: str) -> None:
+            with profiler.stage(name):
+                _busy(0.1)
+
+        threads = [threading.Thread(target=stage, args=(f"execute-{i}",)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with profiler.stage("instant"):
+            pass
+
+    for name in ("execute-0", "execute-1", "execute-2", "instant"):
+        assert (tmp_path / f"{name}.memory.txt").is_file()
+        stats = pstats.Stats(str(tmp_path / f"{name}.pstats")).stats
+        assert stats
+    busy = [
+        key for key in pstats.Stats(str(tmp_path / "execute-0.pstats")).stats if key[2] == "_busy"
+    ]
+    assert busy
+
+
+def test_all_threads_stage_samples_pool_workers(tmp_path: Path):
+    with StageProfiler(tmp_path) as profiler:
+        with profiler.stage("pipeline", all_threads=True):
+            worker = threading.Thread(target=_busy, args=(0.1,))
+            worker.start()
+            worker.join()
+
+    functions = {key[2] for key in pstats.Stats(str(tmp_path / "pipeline.pstats")).stats}
+    assert "_busy" in functions
+    assert "_sample" not in functions
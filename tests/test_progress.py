@@ -0,0 +1,124 @@
+import io
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from media_archiver.config import (
+    AppConfig,
+    BehaviorConfig,
+    DuplicateConfig,
+    NamingConfig,
+    PathsConfig,
+    ReportingConfig,
+)
+from media_archiver.pipeline import StagedPipeline
+from media_archiver.progress import Progress, ProgressMonitor, render_line
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Terminal(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+def test_snapshot_reports_rates_and_eta_once_scan_is_done():
+    clock = _FakeClock()
+    progress = Progress(clock=clock)
+    progress.count("scan", "files", 100)
+    progress.count("execute", "files", 20)
+    progress.count("execute", "bytes_copied", 2000)
+    progress.watch_queue("planned", lambda: 7)
+    clock.now += 10
+
+    assert progress.snapshot()["eta_seconds"] is None
+
+    progress.finish_stage("scan")
+    snapshot = progress.snapshot()
+
+    assert snapshot["files_per_second"] == 2.0
+    assert snapshot["bytes_copied_per_second"] == 200.0
+    assert snapshot["eta_seconds"] == 40.0
+    assert snapshot["queues"] == {"planned": 7}
+    assert "ETA 00:00:40" in render_line(snapshot)
+
+
+def test_monitor_writes_status_file_and_final_line(tmp_path: Path):
+    progress = Progress()
+    progress.count("execute", "errors")
+    terminal = _Terminal()
+    status_file = tmp_path / "status" / "progress.json"
+
+    with ProgressMonitor(progress, stream=terminal, status_file=status_file, interval=60):
+        pass
+
+    status = json.loads(status_file.read_text(encoding="utf-8"))
+    assert status["state"] == "finished"
+    assert status["stages"]["execute"]["errors"] == 1
+    assert terminal.getvalue().startswith("\r")
+    assert terminal.getvalue().endswith("\n")
+
+
+def test_monitor_reports_a_failed_run(tmp_path: Path):
+    status_file = tmp_path / "progress.json"
+
+    with pytest.raises(RuntimeError):
+        with ProgressMonitor(Progress(), status_file=status_file, interval=60):
+            raise RuntimeError("disk gone")
+
+    assert json.loads(status_file.read_text(encoding="utf-8"))["state"] == "failed"
+
+
+def test_monitor_stays_silent_without_terminal_or_status_file():
+    stream = io.StringIO()
+
+    with ProgressMonitor(Progress(), stream=stream, interval=0.01) as monitor:
+        assert not monitor.active
+
+    assert stream.getvalue() == ""
+
+
+def test_pipeline_updates_stage_counters(tmp_path: Path):
+    unsorted = tmp_path / "unsorted"
+    unsorted.mkdir()
+    for index in range(5):
+        (unsorted / f"IMG_20210914_20334{index}.jpg").write_bytes(b"12345")
+    (unsorted / "notes.txt").write_text("ignored", encoding="utf-8")
+    config = AppConfig(
+        paths=PathsConfig(
+            archive_root=tmp_path / "archive",
+            unsorted=unsorted,
+            report_output=tmp_path / "reports",
+        ),
+        behavior=BehaviorConfig(dry_run=False, move_files=False, normalize_month_folders=True),
+        naming=NamingConfig(
+            month_format="MM_Month",
+            filename_format="YYYY-MM-DD_HH-mm-ss",
+            preserve_original_filename=False,
+        ),
+        duplicates=DuplicateConfig(detect=False, mode="report-only"),
+        reporting=ReportingConfig(markdown=False, json=False, verbose=False),
+    )
+    progress = Progress()
+
+    StagedPipeline(
+        config=config,
+        apply=True,
+        current_time=datetime(2030, 1, 1),
+        progress=progress,
+    ).run([unsorted])
+
+    stages = progress.snapshot()["stages"]
+    assert stages["scan"] == {"files": 5, "bytes": 25, "ignored": 1}
+    assert stages["resolve"] == {"files": 5}
+    assert stages["plan"] == {"files": 5}
+    assert stages["execute"]["files"] == 5
+    assert stages["execute"]["bytes_copied"] == 25
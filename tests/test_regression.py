@@ -0,0 +1,52 @@
+from media_archiver.regression import (
+    STATUS_IMPROVED,
+    STATUS_MISSING,
+    STATUS_NEW,
+    STATUS_OK,
+    STATUS_REGRESSED,
+    compare_results,
+    compare_stage,
+    regressions,
+)
+
+
+def _result(**stages: list[float]) -> dict:
+    return {
+        "stages": {
+            name: {"seconds": seconds, "median_seconds": sorted(seconds)[len(seconds) // 2]}
+            for name, seconds in stages.items()
+        }
+    }
+
+
+def test_regression_needs_percentage_and_noise_to_be_exceeded():
+    options = {"max_regression_percent": 10.0, "noise_floor_seconds": 0.01}
+
+    slower = compare_stage("plan", [1.0, 1.01, 0.99], [1.2, 1.21, 1.19], **options)
+    within_percent = compare_stage("plan", [1.0, 1.0, 1.0], [1.05, 1.05, 1.05], **options)
+    within_floor = compare_stage("scan", [0.01, 0.01], [0.015, 0.015], **options)
+    within_spread = compare_stage("copy", [1.0, 1.5, 0.5], [1.2, 1.7, 0.7], **options)
+    faster = compare_stage("report", [1.0, 1.0, 1.0], [0.5, 0.5, 0.5], **options)
+
+    assert slower.status == STATUS_REGRESSED
+    assert round(slower.change_percent) == 20
+    assert within_percent.status == STATUS_OK
+    assert within_floor.status == STATUS_OK
+    assert within_spread.status == STATUS_OK
+    assert faster.status == STATUS_IMPROVED
+
+
+def test_compare_results_reports_each_stage():
+    baseline = _result(renamer=[0.5, 0.5, 0.5], reporter=[0.5, 0.5, 0.5], old=[0.1])
+    current = _result(renamer=[0.5, 0.5, 0.5], reporter=[0.9, 0.9, 0.9], fresh=[0.1])
+
+    comparisons = compare_results(baseline, current, max_regression_percent=10.0)
+
+    statuses = {item.stage: item.status for item in comparisons}
+    assert statuses == {
+        "renamer": STATUS_OK,
+        "reporter": STATUS_REGRESSED,
+        "fresh": STATUS_NEW,
+        "old": STATUS_MISSING,
+    }
+    assert [item.stage for item in regressions(comparisons)] == ["reporter"]
@@ -0,0 +1,131 @@
+from pathlib import Path
+
+import pytest
+
+from media_archiver.report_diff import diff_entries, diff_inputs, report_entries
+from media_archiver.report_store import write_sqlite_report
+from media_archiver.reporter import (
+    ExecutionResult,
+    Report,
+    ReportConfig,
+    ReportEntry,
+    build_report,
+    write_reports,
+)
+from media_archiver.sorter import SortDecision
+
+
+def _result(source: str, target: str, action: str = "copy", error: str | None = None):
+    return ExecutionResult(
+        decision=SortDecision(
+            source=Path(source),
+            target_dir=Path(target).parent,
+            target_path=Path(target),
+            action=action,
+            reason="target_exists" if action == "skip" else None,
+        ),
+        performed=False,
+        error=error,
+    )
+
+
+def _report(results: list[ExecutionResult]) -> Report:
+    return build_report(
+        results=results,
+        config=ReportConfig(dry_run=True, move_files=False),
+        timestamp="2025-01-01T00-00-00",
+    )
+
+
+def test_diff_classifies_changes():
+    old = _report(
+        [
+            _result("/in/same.jpg", "/arc/2020/01/same.jpg"),
+            _result("/in/moved.jpg", "/arc/2020/01/moved.jpg"),
+            _result("/in/breaks.jpg", "/arc/2020/02/breaks.jpg"),
+            _result("/in/fixed.jpg", "/arc/2020/02/fixed.jpg", error="copy_failed: busy"),
+            _result("/in/gone.jpg", "/arc/2020/03/gone.jpg"),
+            _result("/in/skip.jpg", "/arc/2020/03/skip.jpg"),
+        ]
+    )
+    new = _report(
+        [
+            _result("/in/same.jpg", "/arc/2020/01/same.jpg"),
+            _result("/in/moved.jpg", "/arc/2021/05/moved.jpg"),
+            _result("/in/breaks.jpg", "/arc/2020/02/breaks.jpg", error="copy_failed: full"),
+            _result("/in/fixed.jpg", "/arc/2020/02/fixed.jpg"),
+            _result("/in/skip.jpg", "/arc/2020/03/skip.jpg", action="skip"),
+            _result("/in/new.jpg", "/arc/2019/01/new.jpg"),
+        ]
+    )
+
+    diffs = {diff.source_path: diff.status for diff in diff_entries(old.entries, new.entries)}
+
+    assert diffs == {
+        "/in/moved.jpg": "target_changed",
+        "/in/breaks.jpg": "newly_failing",
+        "/in/fixed.jpg": "fixed",
+        "/in/skip.jpg": "changed",
+        "/in/new.jpg": "added",
+        "/in/gone.jpg": "removed",
+    }
+
+
+def test_diff_reads_json_jsonl_and_sqlite_and_checks_order(tmp_path: Path):
+    def numbered(indexes) -> Report:
+        return _report([_result(f"/in/{i}.jpg", f"/arc/2020/01/{i:03d}.jpg") for i in indexes])
+
+    old = numbered(range(50))
+    new = numbered(range(1, 51))
+    _, json_path = write_reports(
+        report=old, output_dir=tmp_path, write_markdown=False, compression="gzip"
+    )
+    database = tmp_path / "reports.sqlite"
+    write_sqlite_report(database, old)
+    write_sqlite_report(database, new)
+
+    from_json = list(diff_entries(report_entries(json_path), report_entries(database)))
+    from_runs = list(
+        diff_entries(report_entries(database, run_id=1), report_entries(database, run_id=2))
+    )
+    assert [(diff.status, diff.source_path) for diff in from_json] == [
+        ("added", "/in/50.jpg"),
+        ("removed", "/in/0.jpg"),
+    ]
+    assert from_runs == from_json
+
+    unordered = [
+        ReportEntry("/in/b.jpg", "/arc/b.jpg", "copy", False, None),
+        ReportEntry("/in/a.jpg", "/arc/a.jpg", "copy", False, None),
+    ]
+    with pytest.raises(ValueError):
+        list(diff_entries(unordered, []))
+
+
+def test_diff_inputs_compare_a_database_run_with_the_one_before(tmp_path: Path):
+    database = tmp_path / "reports.sqlite"
+    for count in (1, 2, 3):
+        write_sqlite_report(
+            database,
+            _report([_result(f"/in/{i}.jpg", f"/arc/{i}.jpg") for i in range(count)]),
+        )
+
+    old, new = diff_inputs(database, database)
+    assert [diff.source_path for diff in diff_entries(old, new)] == ["/in/2.jpg"]
+
+    old, new = diff_inputs(database, database, new_run=2)
+    assert [diff.source_path for diff in diff_entries(old, new)] == ["/in/1.jpg"]
+
+    with pytest.raises(ValueError):
+        diff_inputs(database, database, new_run=1)
+
+
+def test_diff_orders_windows_reports_on_any_host():
+    # Written on Windows: case-insensitive order, backslash separators.
+    entries = [
+        ReportEntry("C:\\in\\a.jpg", "D:\\arc\\a\\a.jpg", "copy", False, None),
+        ReportEntry("C:\\in\\b.jpg", "D:\\arc\\B\\b.jpg", "copy", False, None),
+        ReportEntry("C:\\in\\c.jpg", "D:\\arc\\c\\c.jpg", "copy", False, None),
+    ]
+
+    assert list(diff_entries(entries, entries)) == []
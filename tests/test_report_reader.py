@@ -0,0 +1,96 @@
+import gzip
+import lzma
+from pathlib import Path
+
+import pytest
+
+import media_archiver.report_reader as report_reader
+from media_archiver.report_reader import ReportReader
+from media_archiver.reporter import (
+    ExecutionResult,
+    ReportConfig,
+    StreamingReportWriter,
+    build_report,
+    write_reports,
+)
+from media_archiver.sorter import SortDecision
+
+
+def _results(count: int) -> list[ExecutionResult]:
+    results = []
+    for index in range(count):
+        error = "copy_failed: disk full" if index % 4 == 0 else None
+        results.append(
+            ExecutionResult(
+                decision=SortDecision(
+                    source=Path(f"D:/in/IMG_{index:04d}.jpg"),
+                    target_dir=Path("D:/Photos/2021/08_August"),
+                    target_path=Path(f"D:/Photos/2021/08_August/{index:04d}.jpg"),
+                    action="copy",
+                    reason=None,
+                ),
+                performed=error is None,
+                error=error,
+            )
+        )
+    return results
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "xz"])
+def test_reader_streams_json_reports(tmp_path: Path, monkeypatch, compression):
+    # Tiny chunks put values across chunk boundaries.
+    monkeypatch.setattr(report_reader, "_CHUNK_CHARS", 7)
+    report = build_report(
+        results=_results(25),
+        config=ReportConfig(dry_run=True, move_files=False),
+        timestamp="2025-01-01T00-00-00",
+    )
+    _, json_path = write_reports(
+        report=report,
+        output_dir=tmp_path,
+        write_markdown=False,
+        compression=compression,
+    )
+
+    suffix = {None: ".json", "gzip": ".json.gz", "xz": ".json.xz"}[compression]
+    assert json_path.name.endswith(suffix)
+    reader = ReportReader(json_path)
+    assert list(reader.entries()) == report.entries
+    assert list(reader.errors()) == report.errors
+    assert reader.summary() == report.summary
+
+
+def test_reader_streams_compressed_jsonl(tmp_path: Path):
+    results = _results(10)
+    with StreamingReportWriter(
+        output_dir=tmp_path,
+        prefix="dry_run",
+        timestamp="2025-01-01T00-00-00",
+        config=ReportConfig(dry_run=True, move_files=False),
+        write_markdown=False,
+        spill_entries=3,
+        compression="xz",
+    ) as writer:
+        for result in results:
+            writer.add(result)
+        _, jsonl_path = writer.finish()
+
+    assert jsonl_path.name.endswith(".jsonl.xz")
+    with lzma.open(jsonl_path, "rt", encoding="utf-8") as handle:
+        assert '"type": "summary"' in handle.readline()
+    reader = ReportReader(jsonl_path)
+    assert reader.summary().errors == 3
+    assert [entry.source_path for entry in reader.entries()] == [
+        str(result.decision.source) for result in results
+    ]
+    assert len(list(reader.errors())) == 3
+
+
+def test_reader_rejects_truncated_and_unknown_files(tmp_path: Path):
+    truncated = tmp_path / "report.json.gz"
+    with gzip.open(truncated, "wt", encoding="utf-8") as handle:
+        handle.write('{"entries": [{"action": "copy"')
+    with pytest.raises(ValueError):
+        list(ReportReader(truncated).entries())
+    with pytest.raises(ValueError):
+        ReportReader(tmp_path / "report.md")
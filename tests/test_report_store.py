@@ -0,0 +1,87 @@
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from media_archiver.report_store import (
+    EntryQuery,
+    SqliteReportWriter,
+    iter_runs,
+    query_entries,
+    write_sqlite_report,
+)
+from media_archiver.reporter import Report, ReportEntry, ReportSummary
+
+
+def _report(timestamp: str, entries: list[ReportEntry], errors: list[str] | None = None) -> Report:
+    return Report(
+        summary=ReportSummary(
+            timestamp=timestamp,
+            dry_run=True,
+            move_files=False,
+            total_files=len(entries),
+            copied=sum(entry.action == "copy" for entry in entries),
+            moved=0,
+            skipped=sum(entry.action == "skip" for entry in entries),
+            errors=len(errors or []),
+            timings={"stage": {"plan": {"calls": 1}}},
+        ),
+        entries=entries,
+        errors=errors or [],
+    )
+
+
+def test_runs_accumulate_and_queries_use_indexes(tmp_path: Path):
+    database = tmp_path / "reports.sqlite"
+    first = _report(
+        "2024-01-01T00-00-00",
+        [
+            ReportEntry("/in/a/IMG_1234.jpg", "/arc/2021/01/x.jpg", "copy", False, None),
+            ReportEntry("/in/b.jpg", "/arc/2021/01/b.jpg", "skip", False, "target_exists"),
+        ],
+    )
+    second = _report(
+        "2024-01-02T00-00-00",
+        [
+            ReportEntry(
+                "C:\\in\\IMG_1234.jpg", "/arc/2021/01/x.jpg", "copy", False, "copy_failed: denied"
+            ),
+        ],
+        errors=["copy_failed: denied"],
+    )
+    assert write_sqlite_report(database, first, batch_rows=1) == 1
+    assert write_sqlite_report(database, second) == 2
+
+    by_name = list(query_entries(database, EntryQuery(source_name="IMG_1234.jpg")))
+    assert [item.run_id for item in by_name] == [2, 1]
+    assert by_name[1].entry == first.entries[0]
+
+    failed = list(query_entries(database, EntryQuery(reason="copy_failed")))
+    assert [item.entry.source_path for item in failed] == ["C:\\in\\IMG_1234.jpg"]
+    assert [item.run_id for item in query_entries(database, EntryQuery(latest_run=True))] == [2]
+    assert len(list(query_entries(database, EntryQuery(action="skip", run_id=1)))) == 1
+
+    runs = list(iter_runs(database))
+    assert [run["timestamp"] for run in runs] == ["2024-01-01T00-00-00", "2024-01-02T00-00-00"]
+    assert runs[1]["errors"] == 1
+    assert runs[0]["timings"]["stage"]["plan"]["calls"] == 1
+
+    with sqlite3.connect(database) as connection:
+        plan = connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM entries WHERE source_name = ?", ("x",)
+        ).fetchall()
+    assert "entries_source_name" in json.dumps(plan)
+
+
+def test_unfinished_run_is_rolled_back(tmp_path: Path):
+    database = tmp_path / "reports.sqlite"
+    with pytest.raises(RuntimeError):
+        with SqliteReportWriter(
+            database, timestamp="t", dry_run=True, move_files=False, batch_rows=1
+        ) as writer:
+            writer.add_entry(ReportEntry("/in/a.jpg", "/arc/a.jpg", "copy", False, None))
+            raise RuntimeError("crash")
+
+    assert list(iter_runs(database)) == []
+    assert list(query_entries(database, EntryQuery())) == []
@@ -1,9 +1,14 @@
 from datetime import datetime
+import io
+import json
 from pathlib import Path
+import random
 
+import media_archiver.reporter as reporter
 from media_archiver.reporter import (
     ExecutionResult,
     ReportConfig,
+    StreamingReportWriter,
     build_report,
     _ensure_unique_path,
     to_json,
@@ -180,3 +185,151 @@ def test_write_reports_respects_format_flags(tmp_path: Path):
     assert json_path is not None
     assert json_path.exists()
     assert not (tmp_path / "2025-01-01T00-00-00_apply.md").exists()
+
+
+def test_report_records_execution_strategy():
+    decision = _make_decision(
+        "D:/Photos/_unsorted/A.jpg",
+        "D:/Photos/2019/12_Dezember/A.jpg",
+        "move",
+        None,
+    )
+    report = build_report(
+        results=[ExecutionResult(decision=decision, performed=True, strategy="hardlink")],
+        config=ReportConfig(dry_run=False, move_files=True),
+        timestamp="2025-01-01T00-00-00",
+    )
+
+    assert report.entries[0].strategy == "hardlink"
+    assert "\"strategy\": \"hardlink\"" in to_json(report)
+    assert "Strategy: hardlink" in to_markdown(report)
+
+
+def _many_results(count: int) -> list[ExecutionResult]:
+    rng = random.Random(5)
+    results = []
+    for index in range(count):
+        action = ["copy", "move", "skip"][index % 3]
+        error = "copy_failed: disk full" if index % 7 == 0 and action != "skip" else None
+        results.append(
+            ExecutionResult(
+                decision=_make_decision(
+                    f"D:/in/{rng.randrange(1000):03d}_{index}.jpg",
+                    f"D:/Photos/20{rng.randrange(10, 30)}/0{rng.randrange(1, 10)}_M/"
+                    f"x{index % 5}.jpg",
+                    action,
+                    "target_exists" if action == "skip" else None,
+                ),
+                performed=action != "skip" and error is None,
+                error=error,
+            )
+        )
+    rng.shuffle(results)
+    return results
+
+
+def test_streaming_writer_matches_build_report(tmp_path: Path, monkeypatch):
+    # Force several merge passes with tiny spills.
+    monkeypatch.setattr(reporter, "_MERGE_FAN_IN", 3)
+    results = _many_results(200)
+    config = ReportConfig(dry_run=False, move_files=True)
+    report = build_report(results=results, config=config, timestamp="2025-01-01T00-00-00")
+
+    with StreamingReportWriter(
+        output_dir=tmp_path,
+        prefix="apply",
+        timestamp="2025-01-01T00-00-00",
+        config=config,
+        spill_entries=7,
+    ) as writer:
+        for result in results:
+            writer.add(result)
+        markdown_path, jsonl_path = writer.finish()
+
+    lines = [json.loads(line) for line in jsonl_path.read_text(encoding="utf-8").splitlines()]
+    assert lines[0] == {"type": "summary", **reporter._summary_to_dict(report.summary)}
+    entries = [line for line in lines if line["type"] == "entry"]
+    assert entries == [{"type": "entry", **reporter._entry_to_dict(e)} for e in report.entries]
+    errors = [line["message"] for line in lines if line["type"] == "error"]
+    assert sorted(errors) == sorted(report.errors)
+
+    # Same Markdown apart from the order of the error list.
+    markdown = markdown_path.read_text(encoding="utf-8")
+    expected = to_markdown(report)
+    assert markdown.split("## Errors")[0] == expected.split("## Errors")[0]
+    assert sorted(markdown.split("## Errors")[1].splitlines()) == sorted(
+        expected.split("## Errors")[1].splitlines()
+    )
+    # Spill files are gone.
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        [markdown_path.name, jsonl_path.name]
+    )
+
+
+def test_streaming_writer_applies_deferred_errors(tmp_path: Path):
+    decision = _make_decision(
+        "D:/Photos/_unsorted/A.jpg",
+        "D:/Photos/2019/12_Dezember/A.jpg",
+        "move",
+        None,
+    )
+    writer = StreamingReportWriter(
+        output_dir=tmp_path,
+        prefix="apply",
+        timestamp="2025-01-01T00-00-00",
+        config=ReportConfig(dry_run=False, move_files=True),
+        write_markdown=False,
+    )
+    writer.add(ExecutionResult(decision=decision, performed=True))
+    assert writer.summary().errors == 0
+
+    markdown_path, jsonl_path = writer.finish(
+        deferred_errors={decision.source: "unlink_failed: busy"}
+    )
+
+    lines = [json.loads(line) for line in jsonl_path.read_text(encoding="utf-8").splitlines()]
+    assert markdown_path is None
+    assert lines[0]["errors"] == 1
+    assert lines[0]["moved"] == 1
+    assert lines[1]["reason"] == "unlink_failed: busy"
+    assert lines[2] == {"type": "error", "message": "unlink_failed: busy"}
+
+
+def test_build_report_order_and_counts_match_path_sorting():
+    results = _many_results(300)
+
+    report = build_report(
+        results=results,
+        config=ReportConfig(dry_run=False, move_files=True),
+        timestamp="2025-01-01T00-00-00",
+    )
+
+    entries = sorted(
+        (reporter.entry_from_result(result) for result in results),
+        key=lambda entry: (
+            Path(entry.target_path).parent,
+            Path(entry.target_path).name,
+            entry.source_path,
+        ),
+    )
+    assert report.entries == entries
+    assert report.summary.copied == sum(
+        1 for e in entries if e.action == "copy" and e.performed
+    )
+    assert report.summary.moved == sum(1 for e in entries if e.action == "move" and e.performed)
+    assert report.summary.skipped == sum(1 for e in entries if e.action == "skip")
+    assert report.summary.errors == len([result for result in results if result.error])
+
+
+def test_dump_json_matches_to_json():
+    config = ReportConfig(dry_run=True, move_files=False)
+    for results in ([], _many_results(20)):
+        report = build_report(results=results, config=config, timestamp="2025-01-01T00-00-00")
+        handle = io.StringIO()
+        reporter.dump_json(report, handle)
+        assert handle.getvalue() == to_json(report)
+
+
+def test_ensure_unique_path_keeps_compressed_suffix(tmp_path: Path):
+    (tmp_path / "report.json.gz").write_text("x", encoding="utf-8")
+    assert _ensure_unique_path(tmp_path / "report.json.gz").name == "report_01.json.gz"
@@ -123,3 +123,23 @@ def test_scan_reports_missing_directories():
     assert len(result.supported) == 0
     assert len(result.ignored) == 1
     assert result.ignored[0].reason == "directory_not_found"
+
+
+def test_scan_charges_one_operation_per_stat():
+    dirs = [Path("C:/Photos/A")]
+    candidates = [Path("C:/Photos/A/a.jpg"), Path("C:/Photos/A/b.txt"), Path("C:/Photos/A/c.mp4")]
+    charged: list[int] = []
+
+    class _RecordingLimiter:
+        def acquire(self, *, nbytes: int = 0, ops: int = 0) -> None:
+            charged.append(ops)
+
+    with (
+        patch.object(Path, "rglob", lambda self, pattern: candidates),
+        patch.object(Path, "is_file", lambda self: True),
+        patch.object(Path, "stat", lambda self: _FakeStat(size=1, mtime=2.0)),
+        patch.object(Path, "exists", lambda self: True),
+    ):
+        scan_directories(dirs, _RecordingLimiter())
+
+    assert charged == [1, 1]
@@ -0,0 +1,138 @@
+import json
+import os
+from pathlib import Path
+
+from media_archiver.catalog import open_catalog
+from media_archiver.cli import main
+from media_archiver.scrub import ScrubCheckpoint, scrub_archive
+
+
+def _archive(tmp_path: Path, count: int) -> Path:
+    archive = tmp_path / "archive"
+    month = archive / "2021" / "09_September"
+    month.mkdir(parents=True)
+    for index in range(count):
+        (month / f"2021-09-14_20-33-{index:02d}.jpg").write_bytes(b"x" * (10 + index))
+    return archive
+
+
+def _scrub(catalog, checkpoint, **options):
+    results = []
+    summary = scrub_archive(catalog, checkpoint, sink=results.append, workers=2, **options)
+    return summary, {result.decision.target_path.name: result for result in results}
+
+
+def test_scrub_detects_bit_rot_and_accepts_rewrites(tmp_path: Path):
+    archive = _archive(tmp_path, 3)
+    month = archive / "2021" / "09_September"
+    rotten, rewritten, missing = sorted(month.iterdir())
+
+    with (
+        open_catalog(tmp_path / "catalog.sqlite", archive) as catalog,
+        ScrubCheckpoint(tmp_path / "scrub.sqlite") as checkpoint,
+    ):
+        summary, results = _scrub(catalog, checkpoint)
+        assert (summary.files, summary.failed, summary.remaining) == (3, 0, 0)
+        assert {result.strategy for result in results.values()} == {"recorded"}
+
+        stat = rotten.stat()
+        rotten.write_bytes(b"y" * stat.st_size)
+        os.utime(rotten, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        rewritten.write_bytes(b"rewritten")
+        missing.unlink()
+
+        summary, results = _scrub(catalog, checkpoint)
+        assert (summary.files, summary.failed) == (3, 2)
+        assert results[rotten.name].error.startswith("hash_mismatch: expected ")
+        assert results[rewritten.name].strategy == "updated"
+        assert results[missing.name].error.startswith("verify_failed: ")
+        # The stored hash is kept, so the damage is reported again next time.
+        _, results = _scrub(catalog, checkpoint)
+        assert results[rotten.name].error.startswith("hash_mismatch")
+        assert results[rewritten.name].strategy == "verified"
+
+
+def test_scrub_resumes_within_budget_in_verification_order(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr("media_archiver.scrub.PAGE_FILES", 2)
+    archive = _archive(tmp_path, 5)
+    names = sorted(path.name for path in (archive / "2021" / "09_September").iterdir())
+
+    with (
+        open_catalog(tmp_path / "catalog.sqlite", archive) as catalog,
+        ScrubCheckpoint(tmp_path / "scrub.sqlite") as checkpoint,
+    ):
+        # Hash the last file first: never-hashed files come before it.
+        entry = catalog.get(f"2021/09_September/{names[-1]}")
+        catalog.content_hash(entry)
+
+        seen = []
+        while True:
+            summary, results = _scrub(catalog, checkpoint, max_bytes=1)
+            seen.extend(sorted(results, key=names.index))
+            if summary.remaining == 0:
+                break
+            assert summary.files == 2
+
+    assert seen == names[:-1] + names[-1:]
+
+
+def test_cli_scrub_writes_report_and_fails_on_mismatch(tmp_path: Path, capsys):
+    archive = _archive(tmp_path, 2)
+    reports = tmp_path / "reports"
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        f"""
+paths:
+  archive_root: "{archive.as_posix()}"
+  unsorted: "{(tmp_path / 'unsorted').as_posix()}"
+  report_output: "{reports.as_posix()}"
+
+behavior:
+  dry_run: true
+  move_files: false
+  normalize_month_folders: true
+
+naming:
+  month_format: "MM_Month"
+  filename_format: "YYYY-MM-DD_HH-mm-ss"
+
+duplicates:
+  detect: true
+  mode: "report-only"
+
+reporting:
+  markdown: false
+  json: true
+  verbose: false
+
+catalog:
+  enabled: true
+""",
+        encoding="utf-8",
+    )
+
+    # Never builds a catalog of its own.
+    assert main(["scrub", "--config", str(config)]) == 1
+    assert "no catalog at" in capsys.readouterr().err
+    assert not (archive / ".media-archiver").exists()
+
+    open_catalog(archive / ".media-archiver" / "catalog.sqlite", archive).close()
+    assert main(["scrub", "--config", str(config)]) == 0
+    assert "Scrubbed 2 files (21 bytes): 0 failed, 0 left in this pass" in capsys.readouterr().out
+    assert (archive / ".media-archiver" / "scrub.sqlite").exists()
+
+    target = sorted((archive / "2021" / "09_September").iterdir())[0]
+    stat = target.stat()
+    target.write_bytes(b"z" * stat.st_size)
+    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert main(["scrub", "--config", str(config)]) == 1
+    runs = [
+        [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        for path in reports.glob("*_scrub*.jsonl")
+    ]
+    assert sorted(lines[0]["errors"] for lines in runs) == [0, 1]
+    [lines] = [lines for lines in runs if lines[0]["errors"] == 1]
+    entries = [line for line in lines if line["type"] == "entry"]
+    assert [entry["action"] for entry in entries] == ["verify", "verify"]
+    assert entries[0]["reason"].startswith("hash_mismatch")
@@ -1,9 +1,10 @@
+from dataclasses import replace
 from datetime import datetime
-from pathlib import Path
+from pathlib import Path, PureWindowsPath
 
 import yaml
 
-from media_archiver.sorter import build_sort_decision
+from media_archiver.sorter import SortDecision, build_sort_decision, path_order
 
 
 def test_sort_execution_cases():
@@ -34,3 +35,45 @@ def test_sort_execution_cases():
             assert decision.target_path.as_posix() == case["expected"]["target_path"]
         assert decision.action == case["expected"]["action"]
         assert decision.reason == case["expected"].get("reason")
+
+
+def test_sort_key_orders_like_path_objects():
+    targets = [
+        "/a/b/x.jpg",
+        "/a-c/x.jpg",
+        "/a/x.jpg",
+        "/a/b c/x.jpg",
+        "/A/b/x.jpg",
+        "/a/b/X.jpg",
+        "/a.b/x.jpg",
+    ]
+    decisions = [
+        SortDecision(
+            source=Path(f"/in/{index}.jpg"),
+            target_dir=Path(target).parent,
+            target_path=Path(target),
+            action="copy",
+        )
+        for index, target in enumerate(targets)
+    ]
+
+    by_key = sorted(decisions, key=lambda decision: decision.sort_key)
+    by_path = sorted(
+        decisions,
+        key=lambda decision: (
+            decision.target_path.parent,
+            decision.target_path.name,
+            str(decision.source),
+        ),
+    )
+
+    assert by_key == by_path
+    # Recomputed when a decision is derived from another one.
+    moved = replace(decisions[0], target_path=Path("/z/x.jpg"))
+    assert moved.sort_key[0] == path_order(Path("/z"))
+
+
+def test_path_order_is_case_insensitive_on_windows():
+    assert path_order(PureWindowsPath("D:/Photos/2021")) == path_order(
+        PureWindowsPath("d:/photos/2021")
+    )
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from media_archiver.config import SourceConfig
+from media_archiver.scanner import FileInfo, iter_scan
+from media_archiver.sources import SourceScanner, planning_order
+
+
+def _populate(root: Path, count: int) -> None:
+    for folder in ["x", "y"]:
+        directory = root / folder
+        directory.mkdir(parents=True, exist_ok=True)
+        for index in range(count):
+            (directory / f"IMG_20210914_2033{index:02d}.jpg").write_bytes(b"data")
+    (root / "notes.txt").write_text("ignored", encoding="utf-8")
+
+
+def test_planning_order_is_priority_then_path(tmp_path: Path):
+    sources = [
+        SourceConfig(path=tmp_path / "b"),
+        SourceConfig(path=tmp_path / "c", priority=2),
+        tmp_path / "a",
+    ]
+
+    assert [source.path.name for source in planning_order(sources)] == ["c", "a", "b"]
+
+
+def test_source_scanner_yields_sources_in_planning_order(tmp_path: Path):
+    phone, sdcard = tmp_path / "phone", tmp_path / "sdcard"
+    _populate(phone, 30)
+    _populate(sdcard, 30)
+
+    scanner = SourceScanner(
+        [
+            SourceConfig(path=phone, concurrency=4),
+            SourceConfig(path=sdcard, priority=1, concurrency=2),
+        ],
+        buffer_size=2,
+    )
+    files = list(scanner)
+
+    expected = [item for item in iter_scan([sdcard]) if isinstance(item, FileInfo)]
+    expected += [item for item in iter_scan([phone]) if isinstance(item, FileInfo)]
+    assert files == expected
+    assert [(state.source, state.scanned, state.ignored, state.finished) for state in scanner.states] == [
+        (sdcard, 60, 1, True),
+        (phone, 60, 1, True),
+    ]
+
+
+def test_source_scanner_stops_threads_when_closed_early(tmp_path: Path):
+    _populate(tmp_path / "a", 50)
+    _populate(tmp_path / "b", 50)
+    scanner = SourceScanner([tmp_path / "a", tmp_path / "b"], buffer_size=1)
+
+    files = iter(scanner)
+    next(files)
+    files.close()
+
+    assert not any(state.finished for state in scanner.states)
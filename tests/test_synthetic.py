@@ -0,0 +1,53 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from media_archiver.scanner import scan_directories
+from media_archiver.synthetic import SyntheticSpec, generate_tree, plan_files
+
+
+def _digest_tree(root: Path) -> dict[str, tuple[str, int]]:
+    return {
+        path.relative_to(root).as_posix(): (
+            hashlib.sha256(path.read_bytes()).hexdigest(),
+            int(path.stat().st_mtime),
+        )
+        for path in sorted(root.rglob("*"))
+        if path.is_file()
+    }
+
+
+def test_same_spec_generates_identical_trees(tmp_path: Path):
+    spec = SyntheticSpec(files=60, seed=7, archive_files=5, archived_ratio=0.2)
+
+    first = generate_tree(spec, tmp_path / "a")
+    second = generate_tree(spec, tmp_path / "b")
+
+    assert _digest_tree(first.inbox) == _digest_tree(second.inbox)
+    assert _digest_tree(first.archive) == _digest_tree(second.archive)
+    assert first.archive_files > 0
+    assert plan_files(spec) != plan_files(SyntheticSpec(files=60, seed=8))
+
+
+def test_duplicates_and_bursts(tmp_path: Path):
+    spec = SyntheticSpec(files=200, seed=1, duplicate_ratio=0.2, burst_ratio=0.3, burst_size=4)
+    tree = generate_tree(spec, tmp_path)
+
+    duplicates = [item for item in tree.files if item.duplicate_of]
+    assert duplicates
+    for item in duplicates:
+        assert (tree.inbox / item.relative_path).read_bytes() == (
+            tree.inbox / item.duplicate_of
+        ).read_bytes()
+
+    timestamps = [item.timestamp for item in tree.files]
+    assert any(timestamps.count(moment) >= 4 for moment in timestamps)
+    assert len(scan_directories([tree.inbox]).supported) == 200
+
+
+def test_invalid_spec_is_rejected():
+    with pytest.raises(ValueError):
+        SyntheticSpec(pattern_mix=(("polaroid", 1),))
+    with pytest.raises(ValueError):
+        SyntheticSpec(duplicate_ratio=1.5)
@@ -0,0 +1,40 @@
+from media_archiver.telemetry import Telemetry, measure
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_summary_groups_categories_and_counts_calls():
+    clock = _FakeClock()
+    telemetry = Telemetry(clock=clock)
+
+    for _ in range(3):
+        with telemetry.measure("fs.stat"):
+            clock.now += 0.5
+    telemetry.add("stage.scan", 2.0)
+
+    assert telemetry.summary() == {
+        "fs": {"stat": {"calls": 3, "seconds": 1.5}},
+        "stage": {"scan": {"calls": 1, "seconds": 2.0}},
+    }
+
+
+def test_measure_records_failed_calls_and_is_a_noop_without_telemetry():
+    clock = _FakeClock()
+    telemetry = Telemetry(clock=clock)
+
+    try:
+        with measure(telemetry, "fs.copy"):
+            clock.now += 1.0
+            raise OSError("disk full")
+    except OSError:
+        pass
+    with measure(None, "fs.copy"):
+        pass
+
+    assert telemetry.summary()["fs"]["copy"] == {"calls": 1, "seconds": 1.0}
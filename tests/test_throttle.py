@@ -0,0 +1,131 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from media_archiver.catalog import hash_file
+from media_archiver.executor import perform_decision
+from media_archiver.sorter import SortDecision
+from media_archiver.throttle import RateLimiter
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _limiter(clock: _FakeClock, **kwargs) -> RateLimiter:
+    return RateLimiter(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_unlimited_limiter_never_sleeps():
+    clock = _FakeClock()
+    limiter = _limiter(clock)
+
+    limiter.acquire(nbytes=10**12, ops=10**6)
+
+    assert clock.sleeps == []
+    assert limiter.enabled is False
+
+
+def test_byte_budget_allows_one_second_burst_then_paces():
+    clock = _FakeClock()
+    limiter = _limiter(clock, bytes_per_second=100)
+
+    limiter.acquire(nbytes=100)
+    assert clock.sleeps == []
+
+    limiter.acquire(nbytes=50)
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_ops_and_bytes_budgets_are_independent():
+    clock = _FakeClock()
+    limiter = _limiter(clock, bytes_per_second=1000, ops_per_second=2)
+
+    for _ in range(4):
+        limiter.acquire(nbytes=1, ops=1)
+
+    assert sum(clock.sleeps) == pytest.approx(1.0)
+
+
+def test_oversized_request_is_paid_back_by_sleeping():
+    clock = _FakeClock()
+    limiter = _limiter(clock, bytes_per_second=100)
+
+    limiter.acquire(nbytes=400)
+
+    assert clock.sleeps == [pytest.approx(3.0)]
+
+
+def test_set_rates_adjusts_budget_at_runtime():
+    clock = _FakeClock()
+    limiter = _limiter(clock, bytes_per_second=100)
+    limiter.acquire(nbytes=100)
+
+    limiter.set_rates(bytes_per_second=0, ops_per_second=0)
+    limiter.acquire(nbytes=10**9)
+
+    assert clock.sleeps == []
+
+
+def test_control_file_changes_are_picked_up(tmp_path: Path):
+    control = tmp_path / "throttle.json"
+    control.write_text('{"bytes_per_second": 100}', encoding="utf-8")
+    clock = _FakeClock()
+    limiter = _limiter(clock, control_file=control, reload_interval=0)
+
+    limiter.acquire(nbytes=1)
+    assert limiter.rates == (100.0, 0.0)
+
+    control.write_text('{"bytes_per_second": 0, "ops_per_second": 5}', encoding="utf-8")
+    stat = control.stat()
+    os.utime(control, (stat.st_atime, stat.st_mtime + 10))
+    limiter.acquire(nbytes=1)
+
+    assert limiter.rates == (0.0, 5.0)
+
+
+def test_invalid_control_file_keeps_current_rates(tmp_path: Path):
+    control = tmp_path / "throttle.yaml"
+    control.write_text("bytes_per_second: -1\n", encoding="utf-8")
+    clock = _FakeClock()
+    limiter = _limiter(clock, bytes_per_second=50, control_file=control, reload_interval=0)
+
+    limiter.acquire(nbytes=1)
+
+    assert limiter.rates == (50.0, 0.0)
+
+
+def test_readers_charge_only_the_bytes_they_read(tmp_path: Path):
+    source = tmp_path / "small.jpg"
+    source.write_bytes(b"x" * 1000)
+    clock = _FakeClock()
+    # A one-second burst of exactly the file's size: any overcharge sleeps.
+    limiter = _limiter(clock, bytes_per_second=1000)
+
+    assert hash_file(source, limiter) is not None
+    assert clock.sleeps == []
+
+    clock.now += 1.0
+    decision = SortDecision(
+        source=source,
+        target_dir=tmp_path / "archive",
+        target_path=tmp_path / "archive" / "copy.jpg",
+        action="copy",
+        reason=None,
+    )
+    outcome = perform_decision(
+        decision=decision, apply=True, fast_paths=True, verify=True, limiter=limiter
+    )
+
+    assert outcome.performed
+    assert clock.sleeps == []